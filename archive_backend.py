@@ -0,0 +1,192 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import List, Dict, Any, Mapping, Set, Optional, Tuple
+
+from fileutil import file_signature
+from journal import NoteJournal
+
+
+class ArchiveBackend:
+    """
+    Storage backend keeping notes in a memory-mapped binary archive.
+
+    Layout: a fixed HEADER (magic, version, table offset, entry count, dead
+    bytes), then data records, then an offset table with one ENTRY per note
+    giving the byte range of its metadata JSON and of its UTF-8 content.
+    load() only decodes the small metadata records; load_content() slices one
+    body out of the mapping when a window needs it.
+
+    Writes append the changed records and a new table at the end of the file,
+    then rewrite the header, so a crash mid-write leaves the previous table
+    in place. Superseded records are counted as dead bytes and reclaimed by
+    rewriting the archive once they outweigh the live ones.
+    """
+    LAZY_CONTENT = True
+    MAGIC = b"FNA1"
+    VERSION = 1
+    HEADER = struct.Struct("<4sIQQQ")
+    ENTRY = struct.Struct("<QIQI")
+    # Dead bytes tolerated before compaction, on top of the live size
+    COMPACT_SLACK = 1024 * 1024
+
+    def __init__(self, path: str, migrate_from: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        # note id -> (meta offset, meta length, content offset, content length)
+        self._entries: Dict[str, Tuple[int, int, int, int]] = {}
+        self._dead = 0
+        self._signature = None
+        if not os.path.exists(path):
+            notes = NoteJournal(migrate_from).load() if migrate_from and os.path.exists(migrate_from) else []
+            os.replace(self._build({n['id']: n for n in notes if n.get('id') is not None}), self.path)
+        self._open()
+
+    def paths(self) -> List[str]:
+        return [self.path]
+
+    def changed_externally(self) -> bool:
+        return file_signature(self.path) != self._signature
+
+    # Mapping
+    def _open(self):
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _remap(self):
+        self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _slice(self, offset: int, length: int) -> str:
+        with memoryview(self._map) as view, view[offset:offset + length] as data:
+            return str(data, 'utf-8')
+
+    # Reads
+    def load(self) -> List[Dict[str, Any]]:
+        """Metadata of every note, in archive order, without content."""
+        with self._lock:
+            self._close_map()
+            self._open()
+            notes = self._read_table()
+            self._signature = file_signature(self.path)
+        return notes
+
+    def _read_table(self) -> List[Dict[str, Any]]:
+        magic, version, table_offset, count, self._dead = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError(f"{self.path} is not a note archive")
+        self._entries = {}
+        notes = []
+        for i in range(count):
+            entry = self.ENTRY.unpack_from(self._map, table_offset + i * self.ENTRY.size)
+            meta = json.loads(self._slice(entry[0], entry[1]))
+            self._entries[meta['id']] = entry
+            notes.append(meta)
+        return notes
+
+    def load_content(self, note_id: str) -> str:
+        with self._lock:
+            entry = self._entries.get(note_id)
+            return self._slice(entry[2], entry[3]) if entry else ""
+
+    # Writes
+    @staticmethod
+    def _encode(note: Dict[str, Any]) -> Tuple[bytes, Optional[bytes]]:
+        meta = {k: v for k, v in note.items() if k != 'content'}
+        content = note['content'].encode('utf-8') if 'content' in note else None
+        return json.dumps(meta, separators=(',', ':')).encode('utf-8'), content
+
+    def write(self, notes: Mapping[str, Dict[str, Any]], changed: Set[str], deleted: Set[str]):
+        with self._lock:
+            f = self._file
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            count = self.HEADER.unpack_from(self._map, 0)[3]
+            dead = self._dead + count * self.ENTRY.size
+            for note_id in deleted:
+                entry = self._entries.pop(note_id, None)
+                if entry:
+                    dead += entry[1] + entry[3]
+            for note_id in changed:
+                note = notes.get(note_id)
+                if note is None:
+                    continue
+                meta, content = self._encode(note)
+                old = self._entries.get(note_id)
+                meta_offset = offset
+                f.write(meta)
+                offset += len(meta)
+                if content is None and old is not None:
+                    # Metadata-only change: keep pointing at the stored body.
+                    content_offset, content_length = old[2], old[3]
+                else:
+                    content = content or b""
+                    content_offset, content_length = offset, len(content)
+                    f.write(content)
+                    offset += len(content)
+                if old is not None:
+                    dead += old[1] + (old[3] if content_offset != old[2] else 0)
+                self._entries[note_id] = (meta_offset, len(meta), content_offset, content_length)
+            for entry in self._entries.values():
+                f.write(self.ENTRY.pack(*entry))
+            f.flush()
+            os.fsync(f.fileno())
+            # The header goes last: until it lands, readers see the old table.
+            f.seek(0)
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, offset, len(self._entries), dead))
+            f.flush()
+            os.fsync(f.fileno())
+            self._dead = dead
+            self._remap()
+            if dead > offset - dead + self.COMPACT_SLACK:
+                self._compact()
+            self._signature = file_signature(self.path)
+
+    def _build(self, notes: Mapping[str, Dict[str, Any]], source=None) -> str:
+        """Write a fresh archive next to path and return its name; source supplies lazy bodies."""
+        tmp_path = self.path + ".tmp"
+        entries = []
+        with open(tmp_path, 'wb') as f:
+            f.write(b"\0" * self.HEADER.size)
+            offset = self.HEADER.size
+            for note_id, note in notes.items():
+                meta, content = self._encode(note)
+                if content is None:
+                    content = source(note_id).encode('utf-8') if source else b""
+                f.write(meta)
+                f.write(content)
+                entries.append((offset, len(meta), offset + len(meta), len(content)))
+                offset += len(meta) + len(content)
+            for entry in entries:
+                f.write(self.ENTRY.pack(*entry))
+            f.seek(0)
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, offset, len(entries), 0))
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path
+
+    def _compact(self):
+        metas = {note_id: json.loads(self._slice(entry[0], entry[1]))
+                 for note_id, entry in self._entries.items()}
+        tmp_path = self._build(metas, source=lambda note_id: self._slice(*self._entries[note_id][2:]))
+        # Windows cannot replace a file that is still mapped.
+        self._close_map()
+        os.replace(tmp_path, self.path)
+        self._open()
+        self._read_table()
+
+    def close(self):
+        with self._lock:
+            self._close_map()
@@ -0,0 +1,7 @@
+"""
+Headless benchmarks for FloatNote.
+
+Run with ``python -m benchmarks`` from the repository root. Everything runs
+under the offscreen Qt platform against a synthetic note store generated in a
+temporary directory; see ``python -m benchmarks --help``.
+"""
@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from benchmarks import runner
+from benchmarks.compare import compare, format_report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Headless FloatNote benchmarks on a synthetic note store.")
+    parser.add_argument("--notes", type=int, default=200, help="notes in the corpus")
+    parser.add_argument("--size", type=int, default=2000, help="approximate characters per note")
+    parser.add_argument("--images", type=float, default=0.1,
+                        help="fraction of notes embedding an image")
+    parser.add_argument("--inline-images", action="store_true",
+                        help="embed images as base64 data URIs (legacy format)")
+    parser.add_argument("--backend", choices=("journal", "json", "sqlite", "archive"),
+                        help="storage backend for the app under test (default: its setting)")
+    parser.add_argument("--iterations", type=int, default=50,
+                        help="samples per in-process latency benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="cold-start runs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="+", choices=list(runner.BENCHMARKS),
+                        help="run only these benchmarks")
+    parser.add_argument("--output", default="bench_results.json",
+                        help="machine-readable results file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="flag regressions against a stored results file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown counted as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    options = parse_args(argv)
+    if options.backend:
+        # Read by Config in this process and in the startup probes.
+        os.environ["FLOATNOTE_STORAGE_BACKEND"] = options.backend
+    baseline = None
+    if options.compare:
+        with open(options.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = runner.run(options)
+    with open(options.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=4)
+
+    print(format_report(results, baseline))
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, options.threshold)
+    for name, old, new, change in regressions:
+        print(f"REGRESSION {name}: {old:.3f} -> {new:.3f} ({change:+.1%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+from typing import Dict, Any, List, Tuple
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = 0.2) -> List[Tuple[str, float, float, float]]:
+    """
+    Metrics that got worse than baseline by more than threshold (0.2 = 20%).
+
+    Returns (name, baseline value, current value, relative change) tuples.
+    Metrics missing from either side are ignored.
+    """
+    regressions = []
+    base_metrics = baseline.get('metrics', {})
+    for name, entry in current.get('metrics', {}).items():
+        base = base_metrics.get(name)
+        if base is None or not isinstance(entry.get('value'), (int, float)):
+            continue
+        old, new = base['value'], entry['value']
+        if not old:
+            continue
+        change = (new - old) / abs(old)
+        if not entry.get('lower_is_better', True):
+            change = -change
+        if change > threshold:
+            regressions.append((name, old, new, change))
+    return regressions
+
+
+def format_report(current: Dict[str, Any], baseline: Dict[str, Any] = None) -> str:
+    lines = []
+    base_metrics = (baseline or {}).get('metrics', {})
+    for name, entry in current.get('metrics', {}).items():
+        value = entry['value']
+        text = f"{name:32s} {value:12.3f} {entry['unit']}" if isinstance(value, float) \
+            else f"{name:32s} {value!s:>12} {entry['unit']}"
+        base = base_metrics.get(name)
+        if base and base['value']:
+            text += f"   (baseline {base['value']:.3f}, {(value - base['value']) / abs(base['value']):+.1%})"
+        lines.append(text)
+    return "\n".join(lines)
@@ -0,0 +1,100 @@
+import base64
+import hashlib
+import json
+import os
+import random
+import struct
+import zlib
+from typing import List, Dict, Any
+
+WORDS = ("note meeting idea todo remember call buy project draft review deadline "
+         "sprint bug fix release coffee lunch plan design sketch write read book "
+         "travel ticket budget invoice email reply schedule weekly daily").split()
+
+COLORS = ["#FFF7D1", "#E2F0FB", "#E2FBE2", "#FBE2E2"]
+
+
+def make_png(width: int, height: int, seed: int) -> bytes:
+    """Small valid RGB PNG without needing Qt."""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(height):
+        row = bytes(rng.randrange(256) for _ in range(width * 3))
+        rows.append(b"\x00" + row)
+    raw = zlib.compress(b"".join(rows))
+
+    def chunk(tag, data):
+        return (struct.pack(">I", len(data)) + tag + data +
+                struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+            chunk(b"IDAT", raw) + chunk(b"IEND", b""))
+
+
+def make_html(rng: random.Random, size: int, image_src: str = None) -> str:
+    """QTextEdit-flavoured HTML body of roughly size characters of text."""
+    style = ('<p style=" margin-top:0px; margin-bottom:0px; margin-left:0px; '
+             'margin-right:0px; -qt-block-indent:0; text-indent:0px;">')
+    paragraphs = []
+    remaining = size
+    while remaining > 0:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 40))]
+        text = " ".join(words)
+        if rng.random() < 0.2:
+            text = f'<span style=" font-weight:700;">{text}</span>'
+        paragraphs.append(f'{style}{text}</p>')
+        remaining -= len(text)
+    if image_src:
+        paragraphs.insert(1, f'{style}<img src="{image_src}" /></p>')
+    return ('<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0//EN" '
+            '"http://www.w3.org/TR/REC-html40/strict.dtd">\n'
+            '<html><head><meta name="qrichtext" content="1" />'
+            '<style type="text/css">\np, li { white-space: pre-wrap; }\n</style></head>'
+            '<body style=" font-family:\'Segoe UI\'; font-size:9pt; font-weight:400; '
+            'font-style:normal;">\n' + "\n".join(paragraphs) + '</body></html>')
+
+
+def generate(directory: str, notes: int = 200, size: int = 2000, image_ratio: float = 0.1,
+             image_size: int = 64, inline_images: bool = False, pinned_ratio: float = 0.05,
+             seed: int = 1) -> List[Dict[str, Any]]:
+    """
+    Write a synthetic notes.json (and blobs/ for images) into directory.
+
+    image_ratio of the notes embed one of a small pool of images, either as
+    blob references or, with inline_images, as legacy base64 data URIs.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    blob_dir = os.path.join(directory, "blobs")
+
+    pool = []
+    for i in range(max(1, notes // 20)):
+        data = make_png(image_size, image_size, seed + i)
+        digest = hashlib.sha256(data).hexdigest()
+        if inline_images:
+            pool.append(("data:image/png;base64," + base64.b64encode(data).decode(), None))
+        else:
+            os.makedirs(blob_dir, exist_ok=True)
+            with open(os.path.join(blob_dir, digest), 'wb') as f:
+                f.write(data)
+            pool.append((f"blob:{digest}", digest))
+
+    records = []
+    for i in range(notes):
+        src, digest = rng.choice(pool) if rng.random() < image_ratio else (None, None)
+        content = make_html(rng, size, src)
+        records.append({
+            'id': f"bench-{i:06d}",
+            'content': content,
+            'color': rng.choice(COLORS),
+            'pinned': rng.random() < pinned_ratio,
+            'geometry': [rng.randint(0, 1600), rng.randint(0, 900), 300, 350],
+            'blobs': [digest] if digest else [],
+            'title': " ".join(rng.choice(WORDS) for _ in range(4)),
+            'modified': 1700000000 + i,
+        })
+
+    with open(os.path.join(directory, "notes.json"), 'w', encoding='utf-8') as f:
+        json.dump(records, f, indent=4)
+    return records
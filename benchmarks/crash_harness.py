@@ -0,0 +1,379 @@
+"""
+Fault-injection harness for the note store.
+
+Runs a deterministic workload of note edits in a child process and kills it
+with os._exit() after a random number of bytes has been written to the store
+files, then reopens the store and checks that every note is in the state of
+the last completed flush, or of the flush that was interrupted. Nothing
+acknowledged by Storage.flush() may be lost.
+
+    python -m benchmarks.crash_harness --backend journal --runs 200
+
+With --damage the writer runs to completion instead, and the live snapshot
+(notes.json, plain or a compressed container) is truncated or has bytes
+flipped, sometimes along with the newest checkpoint. Reopening must report
+the damage, restore the newest checkpoint that still decodes, and do so
+within --max-recovery-ms.
+
+    python -m benchmarks.crash_harness --backend json --damage truncate
+    python -m benchmarks.crash_harness --compression zlib --damage flip
+
+SQLite writes from C and cannot be cut at a byte offset, so the sqlite backend
+is left to SQLite's own journaling and is not covered here.
+"""
+import argparse
+import builtins
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from benchmarks.corpus import WORDS, COLORS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Exit status of a child that hit its byte budget
+KILLED = 77
+COMPARED = ('content', 'color', 'pinned', 'geometry')
+
+
+def workload(seed: int, steps: int) -> List[List[tuple]]:
+    """Per flush, the list of ('put', note) / ('del', note_id) operations."""
+    rng = random.Random(seed)
+    live: Dict[str, Dict[str, Any]] = {}
+    plan = []
+    counter = 0
+    for _ in range(steps):
+        ops = []
+        for _ in range(rng.randint(1, 4)):
+            roll = rng.random()
+            if not live or roll < 0.3:
+                counter += 1
+                note = {'id': f"note-{counter}", 'content': "", 'color': rng.choice(COLORS),
+                        'pinned': False, 'geometry': [100, 100, 300, 300], 'rev': 0}
+            else:
+                note = dict(live[rng.choice(sorted(live))])
+                if roll > 0.9:
+                    del live[note['id']]
+                    ops.append(('del', note['id']))
+                    continue
+            if roll < 0.7:
+                words = rng.randint(20, 600)
+                note['content'] = " ".join(rng.choice(WORDS) for _ in range(words))
+                note['rev'] += 1
+            else:
+                note['geometry'] = [rng.randint(0, 1500), rng.randint(0, 900), 300, 300]
+                note['pinned'] = rng.random() < 0.2
+            live[note['id']] = note
+            ops.append(('put', note))
+        plan.append(ops)
+    return plan
+
+
+def expected_states(plan) -> List[Dict[str, Dict[str, Any]]]:
+    """states[i + 1] is the store after flush i; states[0] is empty."""
+    state: Dict[str, Dict[str, Any]] = {}
+    states = [dict(state)]
+    for ops in plan:
+        for op, arg in ops:
+            if op == 'put':
+                state[arg['id']] = arg
+            else:
+                state.pop(arg, None)
+        states.append(dict(state))
+    return states
+
+
+# Child side
+class BudgetFile:
+    """File wrapper that dies once the process-wide write budget is spent."""
+    remaining = None
+    written = 0
+
+    def __init__(self, f):
+        self._f = f
+
+    def write(self, data):
+        budget = BudgetFile.remaining
+        if budget is not None and len(data) >= budget:
+            # Land a torn prefix, as a crash mid-write would.
+            self._f.write(data[:budget])
+            self._f.flush()
+            os._exit(KILLED)
+        if budget is not None:
+            BudgetFile.remaining -= len(data)
+        BudgetFile.written += len(data)
+        return self._f.write(data)
+
+    def __enter__(self):
+        self._f.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._f.__exit__(*exc)
+
+    def __iter__(self):
+        return iter(self._f)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def install_budget(budget: Optional[int]):
+    real_open = builtins.open
+    BudgetFile.remaining = budget
+
+    def budget_open(file, mode='r', *args, **kwargs):
+        f = real_open(file, mode, *args, **kwargs)
+        return BudgetFile(f) if any(c in mode for c in 'wa+') else f
+
+    builtins.open = budget_open
+
+
+def run_child(directory: str, backend: str, seed: int, steps: int, budget: Optional[int]):
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(directory)
+    # Checkpoint every snapshot and compact often, so both paths get cut.
+    os.environ["FLOATNOTE_CHECKPOINT_INTERVAL_MINUTES"] = "0"
+    from journal import NoteJournal
+    from storage import Storage
+    NoteJournal.COMPACT_THRESHOLD = 8 * 1024
+    Storage.MODE = backend
+    install_budget(budget)
+
+    storage = Storage()
+    for step, ops in enumerate(workload(seed, steps)):
+        for op, arg in ops:
+            if op == 'put':
+                storage.put_note(dict(arg))
+            else:
+                storage.remove_note(arg)
+        storage.flush()
+        print(f"FLUSHED {step}", flush=True)
+    storage.close()
+    print(f"BYTES {BudgetFile.written}", flush=True)
+
+
+# Parent side
+def spawn(directory, options, seed, budget=None):
+    command = [sys.executable, "-m", "benchmarks.crash_harness", "--child", directory,
+               "--backend", options.backend, "--steps", str(options.steps), "--seed", str(seed)]
+    if budget is not None:
+        command += ["--budget", str(budget)]
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen",
+               FLOATNOTE_STORAGE_COMPRESSION=options.compression)
+    proc = subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode not in (0, KILLED):
+        raise RuntimeError(f"writer failed:\n{proc.stderr}")
+    flushed, written = -1, None
+    for line in proc.stdout.splitlines():
+        if line.startswith("FLUSHED "):
+            flushed = int(line.split()[1])
+        elif line.startswith("BYTES "):
+            written = int(line.split()[1])
+    return flushed, written
+
+
+def reopen(directory: str, backend: str):
+    """(notes by id, RecoveryReport or None) as a fresh Storage sees them."""
+    from storage import Storage
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        Storage._instance = None
+        Storage.MODE = backend
+        storage = Storage()
+        notes = {note_id: storage.get_note(note_id) for note_id in list(storage._notes)}
+        recovery = storage.recovery
+        storage.backend.close()
+        Storage._instance = None
+    finally:
+        os.chdir(cwd)
+    return notes, recovery
+
+
+def view(note):
+    return None if note is None else {key: note.get(key) for key in COMPARED}
+
+
+def check(notes, before, after) -> List[str]:
+    """Problems with notes, which must match before or after note by note."""
+    problems = []
+    for note_id in set(notes) | set(before) | set(after):
+        got = view(notes.get(note_id))
+        if got != view(before.get(note_id)) and got != view(after.get(note_id)):
+            state = "missing" if got is None else "stale or corrupt"
+            problems.append(f"{note_id}: {state}")
+    return problems
+
+
+# Damage mode
+def damage(path: str, kind: str, rng: random.Random):
+    """Truncate path at a random offset or flip a few of its bytes, in a new inode."""
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    if kind == "truncate":
+        data = data[:rng.randrange(len(data))]
+    else:
+        for offset in rng.sample(range(len(data)), min(len(data), rng.randint(1, 8))):
+            data[offset] ^= 1 << rng.randrange(8)
+    # Checkpoints may be hard links to each other; leave the other names alone.
+    os.remove(path)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def decoded(path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Notes by id if path decodes as a snapshot, else None."""
+    from snapshot_codec import SnapshotCodec, CorruptSnapshot
+    if not os.path.exists(path):
+        return None
+    try:
+        return {note['id']: view(note) for note in SnapshotCodec().read(path)}
+    except CorruptSnapshot:
+        return None
+
+
+def damage_run(directory: str, options, rng: random.Random) -> Tuple[List[str], Optional[float]]:
+    """Damage a finished store, reopen it and return (problems, recovery ms)."""
+    from checkpoints import Checkpoints
+    snapshot = os.path.join(directory, "notes.json")
+    checkpoints = [path for path in Checkpoints(snapshot).paths()
+                   if os.path.exists(path)]
+    if not checkpoints:
+        return ["no checkpoint was taken"], None
+    damage(snapshot, options.damage, rng)
+    if len(checkpoints) > 1 and rng.random() < 0.25:
+        damage(checkpoints[0], options.damage, rng)
+    expected_source = next((path for path in checkpoints if decoded(path) is not None), None)
+    expected = decoded(expected_source) if expected_source else None
+
+    started = time.perf_counter()
+    notes, recovery = reopen(directory, options.backend)
+    opened_ms = (time.perf_counter() - started) * 1000
+    if recovery is None:
+        return ["damaged snapshot loaded without recovery"], None
+    problems = []
+    source = recovery.source and os.path.basename(recovery.source)
+    if source != (expected_source and os.path.basename(expected_source)):
+        problems.append(f"restored {recovery.source}, expected {expected_source}")
+    elif expected is not None:
+        if decoded(snapshot) != expected:
+            problems.append("snapshot was not put back from the checkpoint")
+        # The journal backend replays its log on top, and both replay the
+        # layout journal, so only the json backend's bodies are the checkpoint's.
+        contents = {note_id: note['content'] for note_id, note in expected.items()}
+        if options.backend == "json" and {i: n.get('content') for i, n in notes.items()} != contents:
+            problems.append("loaded notes differ from the checkpoint")
+    if recovery.elapsed_ms > min(opened_ms, options.max_recovery_ms):
+        problems.append(f"recovery took {recovery.elapsed_ms:.1f} ms "
+                        f"(open {opened_ms:.1f} ms, limit {options.max_recovery_ms} ms)")
+    return problems, recovery.elapsed_ms
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.crash_harness",
+        description="Kill the note writer at random byte offsets and verify recovery.")
+    parser.add_argument("--backend", choices=("journal", "json", "archive"), default="journal")
+    parser.add_argument("--runs", type=int, default=100, help="crashes to inject")
+    parser.add_argument("--steps", type=int, default=40, help="flushes in the workload")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--compression", choices=("none", "zlib", "lzma"), default="none",
+                        help="snapshot format of notes.json")
+    parser.add_argument("--damage", choices=("truncate", "flip"),
+                        help="damage the finished snapshot instead of killing the writer")
+    parser.add_argument("--max-recovery-ms", type=float, default=1000,
+                        help="longest acceptable recovery in --damage runs")
+    parser.add_argument("--keep", action="store_true", help="keep failing store directories")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--budget", type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+    if options.damage and options.backend == "archive":
+        parser.error("the archive backend keeps no snapshot checkpoints to recover from")
+    if options.damage == "flip" and options.compression == "none":
+        # A flipped byte inside a JSON string still parses; only the
+        # container's per-record checksums can notice it.
+        parser.error("--damage flip needs --compression zlib or lzma")
+
+    if options.child:
+        run_child(options.child, options.backend, options.seed, options.steps, options.budget)
+        return 0
+
+    sys.path.insert(0, REPO_ROOT)
+    os.environ["FLOATNOTE_STORAGE_COMPRESSION"] = options.compression
+    if options.damage:
+        return damage_main(options)
+    states = expected_states(workload(options.seed, options.steps))
+    with tempfile.TemporaryDirectory(prefix="floatnote-crash-") as directory:
+        _, total = spawn(directory, options, options.seed)
+    rng = random.Random(options.seed)
+    failures, recoveries, slowest = 0, 0, 0.0
+    for run in range(options.runs):
+        budget = rng.randrange(total)
+        directory = tempfile.mkdtemp(prefix="floatnote-crash-")
+        flushed, _ = spawn(directory, options, options.seed, budget)
+        notes, recovery = reopen(directory, options.backend)
+        before = states[flushed + 1]
+        after = states[min(flushed + 2, len(states) - 1)]
+        problems = check(notes, before, after)
+        if recovery is not None:
+            recoveries += 1
+            slowest = max(slowest, recovery.elapsed_ms)
+        if problems:
+            failures += 1
+            print(f"run {run}: killed after {budget} bytes, {flushed + 1} flushes done: "
+                  + "; ".join(problems[:5]), file=sys.stderr)
+        if problems and options.keep:
+            print(f"  store kept in {directory}", file=sys.stderr)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print(json.dumps({
+        'backend': options.backend,
+        'runs': options.runs,
+        'bytes_per_run': total,
+        'failures': failures,
+        'recoveries': recoveries,
+        'slowest_recovery_ms': round(slowest, 2),
+    }, indent=4))
+    return 1 if failures else 0
+
+
+
+def damage_main(options) -> int:
+    rng = random.Random(options.seed)
+    failures, recoveries, slowest = 0, 0, 0.0
+    for run in range(options.runs):
+        directory = tempfile.mkdtemp(prefix="floatnote-crash-")
+        spawn(directory, options, options.seed + run)
+        problems, elapsed_ms = damage_run(directory, options, rng)
+        if elapsed_ms is not None:
+            recoveries += 1
+            slowest = max(slowest, elapsed_ms)
+        if problems:
+            failures += 1
+            print(f"run {run}: {options.damage}: " + "; ".join(problems[:5]), file=sys.stderr)
+        if problems and options.keep:
+            print(f"  store kept in {directory}", file=sys.stderr)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print(json.dumps({
+        'backend': options.backend,
+        'compression': options.compression,
+        'damage': options.damage,
+        'runs': options.runs,
+        'failures': failures,
+        'recoveries': recoveries,
+        'slowest_recovery_ms': round(slowest, 2),
+    }, indent=4))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
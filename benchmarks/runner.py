@@ -0,0 +1,493 @@
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Callable
+
+from benchmarks import corpus
+from benchmarks.startup_probe import peak_rss_kb
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Simulated backend write stall for the stalled_write benchmark
+STALL_S = 1.0
+
+# name -> function(context) returning {metric: {'value', 'unit'[, 'lower_is_better']}}
+BENCHMARKS: "OrderedDict[str, Callable]" = OrderedDict()
+
+
+def benchmark(name: str):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def metric(value, unit: str, lower_is_better: bool = True) -> Dict[str, Any]:
+    return {'value': value, 'unit': unit, 'lower_is_better': lower_is_better}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+class BenchmarkContext:
+    """Shared state: the generated corpus and, on first use, a live in-process app."""
+
+    def __init__(self, options):
+        self.options = options
+        self.workdir = tempfile.mkdtemp(prefix="floatnote-bench-")
+        self.corpus_dir = os.path.join(self.workdir, "corpus")
+        corpus.generate(self.corpus_dir, notes=options.notes, size=options.size,
+                        image_ratio=options.images, inline_images=options.inline_images,
+                        seed=options.seed)
+        self._controller = None
+
+    def fresh_copy(self, name: str) -> str:
+        target = os.path.join(self.workdir, name)
+        shutil.copytree(self.corpus_dir, target)
+        return target
+
+    @property
+    def controller(self):
+        """FloatNoteApp running on a private copy of the corpus (one per process)."""
+        if self._controller is None:
+            os.chdir(self.fresh_copy("live"))
+            sys.path.insert(0, REPO_ROOT)
+            import main as app_main
+            self._controller = app_main.FloatNoteApp()
+            # Let deferred startup build the remaining windows and the tray.
+            while self._controller.startup_steps:
+                self._controller.app.processEvents()
+        return self._controller
+
+    def pick_window(self):
+        controller = self.controller
+        if not controller.windows:
+            controller.create_new_note()
+        window = next(iter(controller.windows.values()))
+        window.show()
+        window.wake()
+        return window
+
+    def open_windows(self, count: int):
+        """At least count live, awake windows, opening dormant notes as needed."""
+        controller = self.controller
+        for note_id in list(controller.dormant):
+            if len(controller.windows) >= count:
+                break
+            controller.open_note(note_id)
+        while len(controller.windows) < count:
+            controller.create_new_note()
+        windows = list(controller.windows.values())[:count]
+        for window in windows:
+            window.wake()
+        controller.app.processEvents()
+        return windows
+
+    def close(self):
+        if self._controller is not None:
+            self._controller.scheduler.flush()
+            self._controller.storage.close()
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+@benchmark("startup")
+def bench_startup(context: BenchmarkContext) -> Dict[str, Any]:
+    """Cold start of FloatNoteApp in a fresh interpreter, median of --repeat runs."""
+    runs = []
+    for i in range(context.options.repeat):
+        cwd = context.fresh_copy(f"startup-{i}")
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+        out = subprocess.run(
+            [sys.executable, os.path.join(REPO_ROOT, "benchmarks", "startup_probe.py")],
+            cwd=cwd, env=env, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    results = {
+        'startup_s': metric(statistics.median(r['startup_s'] for r in runs), "s"),
+        'startup_import_s': metric(statistics.median(r['import_s'] for r in runs), "s"),
+        'startup_first_paint_s': metric(statistics.median(r['first_paint_s'] for r in runs), "s"),
+        'startup_restored_s': metric(statistics.median(r['restored_s'] for r in runs), "s"),
+        'startup_windows': metric(runs[0]['windows'], "windows"),
+    }
+    if runs[0]['peak_rss_kb'] is not None:
+        results['startup_peak_rss_kb'] = metric(max(r['peak_rss_kb'] for r in runs), "KiB")
+    return results
+
+
+@benchmark("save")
+def bench_save(context: BenchmarkContext) -> Dict[str, Any]:
+    """One dirty note through SaveScheduler.flush(), on the GUI thread and until written."""
+    controller = context.controller
+    window = context.pick_window()
+    gui, total = [], []
+    for _ in range(context.options.iterations):
+        window.editor.insertPlainText("x")
+        start = time.perf_counter()
+        controller.scheduler.flush()
+        flushed = time.perf_counter()
+        controller.writer.drain()
+        done = time.perf_counter()
+        gui.append((flushed - start) * 1000)
+        total.append((done - start) * 1000)
+    return {
+        'save_gui_p50_ms': metric(percentile(gui, 50), "ms"),
+        'save_gui_p99_ms': metric(percentile(gui, 99), "ms"),
+        'save_total_p50_ms': metric(percentile(total, 50), "ms"),
+        'save_total_p99_ms': metric(percentile(total, 99), "ms"),
+    }
+
+
+@benchmark("keystroke")
+def bench_keystroke(context: BenchmarkContext) -> Dict[str, Any]:
+    """Simulated typing into NoteEditor until the event queue is drained."""
+    from PyQt6.QtTest import QTest
+    controller = context.controller
+    window = context.pick_window()
+    window.editor.setFocus()
+    samples = []
+    for i in range(context.options.iterations):
+        start = time.perf_counter()
+        QTest.keyClick(window.editor, "abcdefghij"[i % 10])
+        controller.app.processEvents()
+        samples.append((time.perf_counter() - start) * 1000)
+    controller.scheduler.flush()
+    return {
+        'keystroke_p50_ms': metric(percentile(samples, 50), "ms"),
+        'keystroke_p99_ms': metric(percentile(samples, 99), "ms"),
+    }
+
+
+@benchmark("stalled_write")
+def bench_stalled_write(context: BenchmarkContext) -> Dict[str, Any]:
+    """Typing and saving while every backend write stalls for STALL_S on the writer thread."""
+    from PyQt6.QtTest import QTest
+    controller = context.controller
+    window = context.pick_window()
+    window.editor.setFocus()
+    backend = controller.writer.backend
+    write = backend.write
+
+    def stalled_write(*args, **kwargs):
+        time.sleep(STALL_S)
+        return write(*args, **kwargs)
+
+    backend.write = stalled_write
+    keys, saves = [], []
+    overlapped = 0
+    try:
+        for i in range(max(context.options.iterations, 100)):
+            start = time.perf_counter()
+            QTest.keyClick(window.editor, "abcdefghij"[i % 10])
+            controller.app.processEvents()
+            keys.append((time.perf_counter() - start) * 1000)
+            overlapped += controller.writer.is_busy()
+            if i % 10 == 9:
+                start = time.perf_counter()
+                controller.scheduler.flush()
+                saves.append((time.perf_counter() - start) * 1000)
+            # Keep typing for the length of at least one stalled write.
+            time.sleep(STALL_S / 50)
+        controller.writer.drain()
+    finally:
+        del backend.write
+    return {
+        'stalled_keystroke_p50_ms': metric(percentile(keys, 50), "ms"),
+        'stalled_keystroke_p99_ms': metric(percentile(keys, 99), "ms"),
+        'stalled_save_gui_p99_ms': metric(percentile(saves, 99), "ms"),
+        # Share of keystrokes typed while a write was stalled; near 1 means the case was exercised.
+        'stalled_write_overlap': metric(overlapped / len(keys), "ratio", lower_is_better=False),
+    }
+
+
+@benchmark("cursor")
+def bench_cursor(context: BenchmarkContext) -> Dict[str, Any]:
+    """Cursor moves across 50 open notes, each followed by a toolbar state update."""
+    controller = context.controller
+    windows = context.open_windows(50)
+    samples = []
+    for i in range(context.options.iterations):
+        for window in windows:
+            editor = window.editor
+            cursor = editor.textCursor()
+            cursor.setPosition((i * 97) % max(1, editor.document().characterCount() - 1))
+            editor.setTextCursor(cursor)
+            start = time.perf_counter()
+            window.update_style_buttons()
+            controller.app.processEvents()
+            samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'cursor_style_p50_ms': metric(percentile(samples, 50), "ms"),
+        'cursor_style_p99_ms': metric(percentile(samples, 99), "ms"),
+        'cursor_style_total_ms': metric(sum(samples), "ms"),
+    }
+
+
+def bytes_written():
+    """Bytes this process has passed to write() so far (Linux only, else None)."""
+    try:
+        with open("/proc/self/io", 'r') as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+@benchmark("layout")
+def bench_layout(context: BenchmarkContext) -> Dict[str, Any]:
+    """Moving 30 open notes and saving, as when tiling windows: bytes and time per save."""
+    controller = context.controller
+    windows = context.open_windows(30)
+    controller.scheduler.flush()
+    controller.writer.drain()
+    before = bytes_written()
+    samples = []
+    for i in range(context.options.iterations):
+        for window in windows:
+            window.move(window.x() + 1, window.y() + (i % 2))
+            window.schedule_save()  # as on toolbar mouse release
+        start = time.perf_counter()
+        controller.scheduler.flush()
+        controller.writer.drain()
+        samples.append((time.perf_counter() - start) * 1000)
+    results = {'layout_save_p50_ms': metric(percentile(samples, 50), "ms")}
+    if before is not None:
+        written = bytes_written() - before
+        results['layout_bytes_per_save'] = metric(written / context.options.iterations, "bytes")
+    return results
+
+
+@benchmark("content")
+def bench_content(context: BenchmarkContext) -> Dict[str, Any]:
+    """Stored size and parse time of the corpus as Qt HTML versus the canonical format."""
+    from PyQt6.QtGui import QTextDocument
+    context.controller  # a QApplication must exist for QTextDocument
+    sys.path.insert(0, REPO_ROOT)
+    import content_format
+    with open(os.path.join(context.corpus_dir, "notes.json"), 'r', encoding='utf-8') as f:
+        notes = json.load(f)
+    html = [content_format.to_html(note['content']) for note in notes]
+    canonical = [content_format.migrate(content) for content in html]
+
+    def parse_ms(contents):
+        start = time.perf_counter()
+        for content in contents:
+            content_format.load_into(QTextDocument(), content)
+        return (time.perf_counter() - start) * 1000
+
+    def store_bytes(contents):
+        return len(json.dumps([dict(note, content=content) for note, content in zip(notes, contents)],
+                              indent=4).encode('utf-8'))
+
+    return {
+        'content_html_bytes': metric(store_bytes(html), "bytes"),
+        'content_canonical_bytes': metric(store_bytes(canonical), "bytes"),
+        'content_html_parse_ms': metric(parse_ms(html), "ms"),
+        'content_canonical_parse_ms': metric(parse_ms(canonical), "ms"),
+    }
+
+
+@benchmark("store_format")
+def bench_store_format(context: BenchmarkContext) -> Dict[str, Any]:
+    """Whole-store rewrite after a one-note edit, and cold load, per snapshot format."""
+    sys.path.insert(0, REPO_ROOT)
+    from storage import JsonBackend
+    with open(os.path.join(context.corpus_dir, "notes.json"), 'r', encoding='utf-8') as f:
+        notes = {note['id']: note for note in json.load(f)}
+    edited = next(iter(notes))
+    results = {}
+    for compression in ("none", "zlib", "lzma"):
+        path = os.path.join(context.workdir, f"store-{compression}.json")
+        backend = JsonBackend(path, compression)
+        backend.write(notes, set(notes), set())
+        saves = []
+        for i in range(context.options.iterations):
+            notes[edited] = dict(notes[edited], content=notes[edited]['content'] + str(i))
+            start = time.perf_counter()
+            backend.write(notes, {edited}, set())
+            saves.append((time.perf_counter() - start) * 1000)
+        loads = []
+        for _ in range(context.options.repeat):
+            start = time.perf_counter()
+            JsonBackend(path, compression).load()
+            loads.append((time.perf_counter() - start) * 1000)
+        results[f'store_{compression}_bytes_per_save'] = metric(os.path.getsize(path), "bytes")
+        results[f'store_{compression}_save_p50_ms'] = metric(percentile(saves, 50), "ms")
+        results[f'store_{compression}_load_ms'] = metric(statistics.median(loads), "ms")
+    return results
+
+
+@benchmark("metadata_load")
+def bench_metadata_load(context: BenchmarkContext) -> Dict[str, Any]:
+    """Time and Python heap peak of listing every note, per backend, migration excluded."""
+    import tracemalloc
+    sys.path.insert(0, REPO_ROOT)
+    from journal import NoteJournal
+    from sqlite_backend import SqliteBackend
+    from archive_backend import ArchiveBackend
+    directory = context.fresh_copy("metadata-load")
+    source = os.path.join(directory, "notes.json")
+    backends = {
+        'journal': lambda: NoteJournal(source),
+        'sqlite': lambda: SqliteBackend(os.path.join(directory, "notes.db"), migrate_from=source),
+        'archive': lambda: ArchiveBackend(os.path.join(directory, "notes.fna"), migrate_from=source),
+    }
+    results = {}
+    for name, create in backends.items():
+        create().close()  # one-time import from notes.json
+        times = []
+        for _ in range(context.options.repeat):
+            backend = create()
+            start = time.perf_counter()
+            backend.load()
+            times.append((time.perf_counter() - start) * 1000)
+            backend.close()
+        # Separate run: tracemalloc slows allocation-heavy loads down.
+        backend = create()
+        tracemalloc.start()
+        backend.load()
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+        backend.close()
+        results[f'metadata_{name}_load_ms'] = metric(statistics.median(times), "ms")
+        results[f'metadata_{name}_peak_kb'] = metric(peak, "KiB")
+    return results
+
+
+@benchmark("manager")
+def bench_manager(context: BenchmarkContext) -> Dict[str, Any]:
+    """Note manager over the whole store: open, sort, filter and per-frame scroll cost."""
+    controller = context.controller
+    # Finish startup's idle indexing and migration now, or their slices land in the frames.
+    while controller.storage.sync_search_index(limit=1000):
+        pass
+    controller.storage.migrate_content()
+    controller.writer.drain()
+    windows_before = len(controller.windows)
+    start = time.perf_counter()
+    controller.show_manager()
+    controller.app.processEvents()
+    opened = (time.perf_counter() - start) * 1000
+    dialog = controller.manager_dialog
+    view = dialog.view
+    bar = view.verticalScrollBar()
+    # Three rows per frame, like a wheel notch, capped at 2000 frames end to end.
+    step = max(3 * view.sizeHintForRow(0), bar.maximum() // 2000, 1)
+    frames = []
+    for value in range(0, bar.maximum() + step, step):
+        start = time.perf_counter()
+        bar.setValue(value)
+        view.viewport().repaint()
+        controller.app.processEvents()
+        frames.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    dialog.model.sort_by("title")
+    sort_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    dialog.filter_edit.setText("re")
+    filter_ms = (time.perf_counter() - start) * 1000
+    dialog.filter_edit.clear()
+    dialog.thumbnails.pool.waitForDone()
+    dialog.hide()
+    return {
+        'manager_open_ms': metric(opened, "ms"),
+        'manager_scroll_frame_p50_ms': metric(percentile(frames, 50), "ms"),
+        'manager_scroll_frame_p99_ms': metric(percentile(frames, 99), "ms"),
+        'manager_sort_ms': metric(sort_ms, "ms"),
+        'manager_filter_ms': metric(filter_ms, "ms"),
+        'manager_windows_built': metric(len(controller.windows) - windows_before, "windows"),
+    }
+
+
+@benchmark("large_document")
+def bench_large_document(context: BenchmarkContext) -> Dict[str, Any]:
+    """A 5 MB web page pasted into a new note, then typed into at its start and middle."""
+    import random
+    from PyQt6.QtCore import QMimeData
+    from PyQt6.QtTest import QTest
+    controller = context.controller
+    html = corpus.make_html(random.Random(context.options.seed), 5_000_000)
+    controller.create_new_note()
+    window = list(controller.windows.values())[-1]
+    mime = QMimeData()
+    mime.setHtml(html)
+    start = time.perf_counter()
+    window.editor.insertFromMimeData(mime)
+    controller.app.processEvents()
+    paste_ms = (time.perf_counter() - start) * 1000
+    # Store the pasted note first; its first write is not part of typing.
+    controller.scheduler.flush()
+    controller.writer.drain()
+    editor = window.editor
+    editor.setFocus()
+    keys, saves = [], []
+    for position in (0, editor.document().characterCount() // 2):
+        cursor = editor.textCursor()
+        cursor.setPosition(position)
+        editor.setTextCursor(cursor)
+        for i in range(context.options.iterations):
+            start = time.perf_counter()
+            QTest.keyClick(editor, "abcdefghij"[i % 10])
+            controller.app.processEvents()
+            keys.append((time.perf_counter() - start) * 1000)
+            if i % 10 == 9:
+                start = time.perf_counter()
+                controller.scheduler.flush()
+                saves.append((time.perf_counter() - start) * 1000)
+    controller.writer.drain()
+    start = time.perf_counter()
+    window.hibernate()
+    window.wake()
+    reopen_ms = (time.perf_counter() - start) * 1000
+    editor_class = type(window.editor).__name__
+    window.close_note()
+    controller.writer.drain()
+    return {
+        'large_paste_ms': metric(paste_ms, "ms"),
+        'large_keystroke_p50_ms': metric(percentile(keys, 50), "ms"),
+        'large_keystroke_p99_ms': metric(percentile(keys, 99), "ms"),
+        'large_save_gui_p50_ms': metric(percentile(saves, 50), "ms"),
+        'large_save_gui_p99_ms': metric(percentile(saves, 99), "ms"),
+        'large_reopen_ms': metric(reopen_ms, "ms"),
+        'large_editor_is_plain': metric(int(editor_class == "LargeNoteEditor"), "bool",
+                                        lower_is_better=False),
+    }
+
+
+def run(options) -> Dict[str, Any]:
+    names = options.only or list(BENCHMARKS)
+    context = BenchmarkContext(options)
+    metrics: Dict[str, Any] = {}
+    try:
+        for name in names:
+            metrics.update(BENCHMARKS[name](context))
+        rss = peak_rss_kb()
+        if context._controller is not None and rss is not None:
+            metrics['process_peak_rss_kb'] = metric(rss, "KiB")
+    finally:
+        context.close()
+    return {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {
+            'notes': options.notes, 'size': options.size, 'images': options.images,
+            'inline_images': options.inline_images, 'iterations': options.iterations,
+            'repeat': options.repeat, 'seed': options.seed, 'backend': options.backend,
+        },
+        'metrics': metrics,
+    }
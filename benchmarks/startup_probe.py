@@ -0,0 +1,59 @@
+"""
+Cold-start probe, run in a fresh interpreter by the benchmark runner.
+
+Must be started with the corpus directory as the working directory; prints a
+single JSON object with timings and peak RSS on stdout.
+"""
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def main():
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_root)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    start = time.perf_counter()
+    import main as app_main
+    imported = time.perf_counter()
+    controller = app_main.FloatNoteApp(started=start)
+    constructed = time.perf_counter()
+    controller.app.processEvents()
+    ready = time.perf_counter()
+    # Run the event loop until the deferred startup steps are done.
+    while controller.startup_steps:
+        controller.app.processEvents()
+    restored = time.perf_counter()
+
+    report = controller.startup
+    result = {
+        'import_s': imported - start,
+        'construct_s': constructed - imported,
+        'startup_s': ready - start,
+        'first_paint_s': (report.elapsed_ms('first_paint') or 0.0) / 1000,
+        'restored_s': restored - start,
+        'phases': report.report()['phases'],
+        'windows': len(controller.windows),
+        'peak_rss_kb': peak_rss_kb(),
+    }
+    controller.storage.close()
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import base64
+import binascii
+import hashlib
+import os
+import re
+from collections import Counter
+from typing import Iterable, Optional, Set
+
+from fileutil import atomic_write
+
+
+class BlobStore:
+    """
+    Content-addressed store for images embedded in notes.
+
+    Each distinct image is written once as ``<dir>/<sha256>`` and referenced
+    from note HTML as ``blob:<sha256>``, so identical pastes in several notes
+    share one file. Notes record the hashes they use in their ``blobs`` field,
+    which is what collect() counts references from.
+    """
+    SCHEME = "blob"
+    REF_PATTERN = re.compile(r'blob:([0-9a-f]{64})')
+    DATA_URI_PATTERN = re.compile(
+        r'(["\'])data:image/[\w.+-]+;base64,([A-Za-z0-9+/=\s]+)\1')
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @classmethod
+    def url(cls, digest: str) -> str:
+        return f"{cls.SCHEME}:{digest}"
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest)
+
+    def put(self, data: bytes) -> str:
+        """Store data if it is new and return its hash."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(self.root, exist_ok=True)
+            atomic_write(path, data)
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(self.path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def references(cls, content: str) -> Set[str]:
+        return set(cls.REF_PATTERN.findall(content or ""))
+
+    def externalize_data_uris(self, html: str) -> str:
+        """Move inline base64 images out of html into the store."""
+        def replace(match):
+            try:
+                data = base64.b64decode(match.group(2), validate=False)
+            except (binascii.Error, ValueError):
+                return match.group(0)
+            quote = match.group(1)
+            return f"{quote}{self.url(self.put(data))}{quote}"
+        if "data:image/" not in html:
+            return html
+        return self.DATA_URI_PATTERN.sub(replace, html)
+
+    def collect(self, note_refs: Iterable[Iterable[str]]) -> int:
+        """
+        Reference-counting garbage collection.
+
+        note_refs yields the blob hashes used by each stored note; every blob
+        whose count drops to zero is deleted. Returns the number removed.
+        """
+        counts = Counter()
+        for refs in note_refs:
+            counts.update(set(refs))
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for name in names:
+            if len(name) == 64 and counts[name] == 0:
+                try:
+                    os.remove(self.path(name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
@@ -0,0 +1,103 @@
+import os
+import shutil
+import time
+from typing import List, Dict, Any, Callable, NamedTuple, Optional
+
+from config import Config
+from fileutil import atomic_write
+from snapshot_codec import CorruptSnapshot
+
+
+class RecoveryReport(NamedTuple):
+    # Checkpoint the notes were recovered from; None if none was readable
+    source: Optional[str]
+    # Files that failed to decode, newest first
+    corrupt: List[str]
+    # Copy of the damaged snapshot, kept for manual salvage
+    quarantined: Optional[str]
+    notes: int
+    elapsed_ms: float
+
+
+class Checkpoints:
+    """
+    Rotating copies of a snapshot file: ``<path>.1`` (newest) to ``<path>.N``.
+
+    rotate() runs just before the snapshot is replaced and keeps the current
+    file as checkpoint 1, at most once per interval, by hard-linking it so the
+    old bytes survive the rename. load() reads the snapshot and, if it does not
+    decode, walks the checkpoints newest first. Recovery reads at most
+    count + 1 files, so its time is bounded by the store size; it is timed and
+    returned as a RecoveryReport.
+    """
+
+    def __init__(self, path: str, count: Optional[int] = None,
+                 interval_s: Optional[float] = None):
+        self.path = path
+        self.count = count if count is not None else Config.get('checkpoint_count')
+        self.interval_s = (interval_s if interval_s is not None
+                           else Config.get('checkpoint_interval_minutes') * 60)
+
+    def paths(self) -> List[str]:
+        return [f"{self.path}.{i}" for i in range(1, self.count + 1)]
+
+    def rotate(self):
+        """Keep the current snapshot as the newest checkpoint if the last one is old enough."""
+        if self.count <= 0 or not os.path.exists(self.path):
+            return
+        paths = self.paths()
+        try:
+            if time.time() - os.path.getmtime(paths[0]) < self.interval_s:
+                return
+        except OSError:
+            pass
+        for older, newer in zip(reversed(paths), reversed(paths[:-1])):
+            if os.path.exists(newer):
+                os.replace(newer, older)
+        try:
+            # Still there if it was a hard link to the next one (a no-op rename).
+            os.remove(paths[0])
+        except FileNotFoundError:
+            pass
+        try:
+            os.link(self.path, paths[0])
+        except OSError:
+            # No hard links (FAT, some network shares): copy instead.
+            shutil.copy2(self.path, paths[0])
+
+    def load(self, read: Callable[..., List[Dict[str, Any]]]):
+        """
+        (notes, report) from the snapshot, or from the newest checkpoint that
+        read(path) accepts; report is None when the snapshot itself was fine.
+
+        read must raise CorruptSnapshot for a damaged file and return [] for a
+        missing one. If no checkpoint is readable, read(path, strict=False)
+        salvages what it can from the snapshot.
+        """
+        try:
+            return read(self.path), None
+        except CorruptSnapshot:
+            pass
+        start = time.perf_counter()
+        corrupt = [self.path]
+        source, notes = None, None
+        for path in self.paths():
+            if not os.path.exists(path):
+                continue
+            try:
+                notes = read(path)
+            except CorruptSnapshot:
+                corrupt.append(path)
+                continue
+            source = path
+            break
+        if notes is None:
+            notes = read(self.path, strict=False)
+        quarantined = f"{self.path}.corrupt-{time.strftime('%Y%m%d-%H%M%S')}"
+        shutil.copy2(self.path, quarantined)
+        if source is not None:
+            # Put the good copy back, so a crash before the next save still finds it.
+            with open(source, 'rb') as f:
+                atomic_write(self.path, f.read())
+        return notes, RecoveryReport(source, corrupt, quarantined, len(notes),
+                                     (time.perf_counter() - start) * 1000)
@@ -0,0 +1,70 @@
+import json
+import os
+from typing import Any, Dict
+
+
+class Config:
+    """
+    User-tunable settings.
+
+    Defaults live in DEFAULTS, can be overridden in settings.json next to the
+    note store, and per run with FLOATNOTE_<KEY> environment variables.
+    """
+    FILE_PATH = "settings.json"
+    DEFAULTS: Dict[str, Any] = {
+        # "journal", "json", "sqlite" or "archive"
+        'storage_backend': "journal",
+        # Snapshot format of notes.json: "none" (plain JSON), "zlib" or "lzma"
+        'storage_compression': "none",
+        # Previous snapshots kept as notes.json.1..N for crash recovery
+        'checkpoint_count': 3,
+        # Minimum age of the newest checkpoint before another is taken
+        'checkpoint_interval_minutes': 10,
+        'save_idle_ms': 500,
+        'save_max_latency_ms': 2000,
+        # Decoded embedded images shared by all editors
+        'image_cache_mb': 32,
+        # Windows built at startup; other notes stay dormant until opened
+        'restore_window_cap': 50,
+        # Idle minutes before a note's editor is torn down; 0 disables
+        'hibernate_after_minutes': 30,
+        # Estimated undo history kept across all notes; the least recently used
+        # notes' histories are cleared past it. 0 disables
+        'undo_budget_mb': 64,
+        # Decoded images held by open notes; the least recently used notes
+        # holding images are hibernated past it. 0 disables
+        'image_budget_mb': 256,
+        # Notes at least this long (in characters) open in the large-document editor
+        'large_document_chars': 1_000_000,
+        # Pastes at least this long skip Qt's rich-text import for a sanitized one
+        'large_paste_chars': 100_000,
+        # Revision history: minutes between recorded saves, and what each note keeps
+        'history_interval_minutes': 5,
+        'history_max_revisions': 100,
+        'history_max_days': 30,
+        'history_max_kb': 512,
+        # Write per-phase startup timings as JSON to this file ("-" for stderr)
+        'startup_report': "",
+    }
+    _values = None
+
+    @classmethod
+    def _load(cls) -> Dict[str, Any]:
+        try:
+            with open(cls.FILE_PATH, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    @classmethod
+    def get(cls, key: str) -> Any:
+        if cls._values is None:
+            cls._values = cls._load()
+        default = cls.DEFAULTS[key]
+        env = os.environ.get("FLOATNOTE_" + key.upper())
+        if env is not None:
+            if isinstance(default, bool):
+                return env.lower() in ("1", "true", "yes", "on")
+            return type(default)(env)
+        return cls._values.get(key, default)
@@ -0,0 +1,703 @@
+import json
+import re
+from html import escape as html_escape, unescape
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from PyQt6.QtGui import (QTextDocument, QTextCursor, QTextCharFormat, QTextBlockFormat,
+                         QTextListFormat, QTextImageFormat, QTextFormat, QColor, QFont)
+
+from search_index import html_to_text
+
+# Canonical notes start with this prefix; anything else is legacy toHtml() output.
+MAGIC = '{"fnc":1,'
+OBJECT_REPLACEMENT = "\ufffc"
+
+_LIST_STYLES = {
+    QTextListFormat.Style.ListDisc: "disc",
+    QTextListFormat.Style.ListCircle: "circle",
+    QTextListFormat.Style.ListSquare: "square",
+    QTextListFormat.Style.ListDecimal: "decimal",
+    QTextListFormat.Style.ListLowerAlpha: "lower-alpha",
+    QTextListFormat.Style.ListUpperAlpha: "upper-alpha",
+    QTextListFormat.Style.ListLowerRoman: "lower-roman",
+    QTextListFormat.Style.ListUpperRoman: "upper-roman",
+}
+_LIST_STYLE_NAMES = {name: style for style, name in _LIST_STYLES.items()}
+
+# The editor's font (Styles.EDITOR); legacy toHtml() output names it on every run.
+EDITOR_FONT_FAMILY = "Segoe UI"
+
+_P = QTextFormat.Property
+# Format properties serialize() stores
+_CHAR_KEPT = frozenset(p.value for p in (
+    _P.FontWeight, _P.FontItalic, _P.FontUnderline, _P.TextUnderlineStyle, _P.FontStrikeOut,
+    _P.FontPointSize, _P.FontPixelSize, _P.ForegroundBrush, _P.BackgroundBrush, _P.IsAnchor,
+    _P.AnchorHref, _P.ImageName, _P.ImageWidth, _P.ImageHeight, _P.ObjectType, _P.ObjectIndex))
+_LIST_KEPT = frozenset(p.value for p in (_P.ListStyle, _P.ListIndent))
+# Properties it drops, with the values that a load leaves them at anyway
+_NEUTRAL = {
+    _P.FontFamilies.value: ([], [EDITOR_FONT_FAMILY]),
+    _P.AnchorHref.value: ("",),
+    _P.LayoutDirection.value: (0, 2),
+    _P.BlockAlignment.value: (0, 1),
+    _P.BlockTopMargin.value: (0,),
+    _P.BlockBottomMargin.value: (0,),
+    _P.BlockLeftMargin.value: (0,),
+    _P.BlockRightMargin.value: (0,),
+    _P.BlockIndent.value: (0,),
+    _P.TextIndent.value: (0,),
+    _P.BlockNonBreakableLines.value: (False,),
+    _P.HeadingLevel.value: (0,),
+    _P.ListStart.value: (1,),
+}
+
+# Block spacing the editor has no controls for; Qt's HTML importer sets it from <p>, <ul> etc.
+_BLOCK_SPACING = (_P.BlockTopMargin, _P.BlockBottomMargin, _P.BlockLeftMargin,
+                  _P.BlockRightMargin, _P.BlockIndent, _P.TextIndent)
+
+
+def is_canonical(content: str) -> bool:
+    return bool(content) and content.startswith(MAGIC)
+
+
+# Serializing
+def _color_name(color: QColor) -> str:
+    return color.name(QColor.NameFormat.HexArgb if color.alpha() != 255
+                      else QColor.NameFormat.HexRgb)
+
+
+def _number(value: float):
+    return int(value) if value == int(value) else value
+
+
+def _char_attrs(fmt: QTextCharFormat) -> Dict[str, Any]:
+    attrs = {}
+    weight = fmt.fontWeight()
+    if weight == QFont.Weight.Bold:
+        attrs['b'] = 1
+    elif weight not in (0, QFont.Weight.Normal):
+        attrs['w'] = int(weight)
+    if fmt.fontItalic():
+        attrs['i'] = 1
+    if fmt.fontUnderline():
+        attrs['u'] = 1
+    if fmt.fontStrikeOut():
+        attrs['x'] = 1
+    if fmt.hasProperty(QTextCharFormat.Property.FontPointSize):
+        attrs['s'] = _number(fmt.fontPointSize())
+    if fmt.hasProperty(QTextCharFormat.Property.FontPixelSize):
+        attrs['px'] = fmt.intProperty(QTextCharFormat.Property.FontPixelSize)
+    if fmt.hasProperty(QTextCharFormat.Property.ForegroundBrush):
+        attrs['c'] = _color_name(fmt.foreground().color())
+    if fmt.hasProperty(QTextCharFormat.Property.BackgroundBrush):
+        attrs['k'] = _color_name(fmt.background().color())
+    if fmt.isAnchor() and fmt.anchorHref():
+        attrs['a'] = fmt.anchorHref()
+    if fmt.isImageFormat():
+        image = fmt.toImageFormat()
+        attrs['img'] = image.name()
+        if image.hasProperty(QTextImageFormat.Property.ImageWidth):
+            attrs['iw'] = _number(image.width())
+        if image.hasProperty(QTextImageFormat.Property.ImageHeight):
+            attrs['ih'] = _number(image.height())
+    return attrs
+
+
+def _supported(document: QTextDocument) -> bool:
+    """Tables and other frames are outside the subset; such notes stay HTML."""
+    # Qt's HTML importer leaves empty frames behind, e.g. after an <img/>.
+    return all(frame.firstPosition() > frame.lastPosition()
+               for frame in document.rootFrame().childFrames())
+
+
+def _lossless(fmt: QTextFormat, kept=frozenset()) -> bool:
+    """Whether fmt has nothing but kept properties and ones left at their neutral value."""
+    for key, value in fmt.properties().items():
+        if key not in kept and value not in _NEUTRAL.get(key, ()):
+            return False
+    return True
+
+
+def _block_runs(block, formats: Dict[int, Any]) -> Optional[List[Any]]:
+    """
+    The block's runs, or None if its formatting does not fit the format:
+    alignment, margins, fonts, <pre>, <hr>, super/subscript and the like.
+    """
+    text_list = block.textList()
+    kept = frozenset((_P.ObjectIndex.value,)) if text_list is not None else frozenset()
+    if not _lossless(block.blockFormat(), kept):
+        return None
+    if text_list is not None and not _lossless(text_list.format(), _LIST_KEPT):
+        return None
+    runs = []
+    it = block.begin()
+    while not it.atEnd():
+        fragment = it.fragment()
+        if fragment.isValid():
+            index = fragment.charFormatIndex()
+            attrs = formats.get(index)
+            if attrs is None:
+                fmt = fragment.charFormat()
+                attrs = formats[index] = _char_attrs(fmt) if _lossless(fmt, _CHAR_KEPT) else False
+            if attrs is False:
+                return None
+            text = fragment.text()
+            if runs and attrs and isinstance(runs[-1], list) and runs[-1][1] == attrs \
+                    and 'img' not in attrs:
+                runs[-1][0] += text
+            elif attrs:
+                runs.append([text, attrs])
+            else:
+                runs.append(text)
+        it += 1
+    return runs
+
+
+def _list_entry(text_list) -> List[Any]:
+    list_fmt = text_list.format()
+    return [_LIST_STYLES.get(list_fmt.style(), "disc"), list_fmt.indent()]
+
+
+def serialize(document: QTextDocument) -> str:
+    """
+    Compact run-length JSON for the formatting NoteWindow supports.
+
+    A document is {"fnc": 1, "l": [[style, indent], ...], "b": [block, ...]}.
+    A block is a list of runs, or {"l": list index, "r": runs} inside a list;
+    a run is a plain string, or [text, attrs] when it carries formatting.
+    Documents with tables, frames or any formatting outside this subset
+    stay HTML, so a round trip never loses anything.
+    """
+    if not _supported(document):
+        return document.toHtml()
+    lists: List[List[Any]] = []
+    list_ids: Dict[int, int] = {}
+    blocks = []
+    # Fragments share a small set of formats; convert each one once.
+    formats: Dict[int, Dict[str, Any]] = {}
+    block = document.begin()
+    while block.isValid():
+        runs = _block_runs(block, formats)
+        if runs is None:
+            return document.toHtml()
+        text_list = block.textList()
+        if text_list is not None:
+            # Wrappers are not stable; a list is identified by its first block.
+            key = text_list.item(0).blockNumber()
+            if key not in list_ids:
+                list_ids[key] = len(lists)
+                lists.append(_list_entry(text_list))
+            blocks.append({'l': list_ids[key], 'r': runs})
+        else:
+            blocks.append(runs)
+        block = block.next()
+    return _dumps(lists, blocks)
+
+
+def _dumps(lists: List[List[Any]], blocks: List[Any]) -> str:
+    data = {'fnc': 1}
+    if lists:
+        data['l'] = lists
+    data['b'] = blocks or [[]]
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+class BlockCache:
+    """
+    serialize() for a large document, re-reading only the blocks edited since
+    the previous call.
+
+    Each block's runs are kept encoded, by block number, with the objectIndex()
+    of its list (or -1). contentsChange reports every edit, format changes and
+    list membership included, as a range of the new document; the cache
+    replaces the blocks of that range and shifts the rest by the change in
+    block count. Output is identical to serialize().
+    """
+
+    def __init__(self, document: QTextDocument):
+        self.document = document
+        self.blocks: List[Any] = [None] * document.blockCount()
+        self._count = document.blockCount()
+        # contentsChange is only emitted once the document has a layout.
+        document.documentLayout()
+        document.contentsChange.connect(self._changed)
+
+    def _changed(self, position: int, removed: int, added: int):
+        document = self.document
+        count = document.blockCount()
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(position + added).blockNumber()
+        if first < 0:
+            self.blocks = [None] * count
+        else:
+            if last < 0:
+                last = count - 1
+            old_last = last - (count - self._count)
+            self.blocks[first:old_last + 1] = [None] * (last - first + 1)
+        self._count = count
+
+    def serialize(self) -> str:
+        document = self.document
+        if not _supported(document):
+            return document.toHtml()
+        if len(self.blocks) != document.blockCount():
+            # Out of step (e.g. after clear()); start over rather than guess.
+            self.blocks = [None] * document.blockCount()
+        formats: Dict[int, Dict[str, Any]] = {}
+        block = None
+        for number, entry in enumerate(self.blocks):
+            if entry is not None:
+                continue
+            if block is None or block.blockNumber() != number - 1:
+                block = document.findBlockByNumber(number)
+            else:
+                block = block.next()
+            text_list = block.textList()
+            runs = _block_runs(block, formats)
+            self.blocks[number] = (None if runs is None else _encode(runs),
+                                   text_list.objectIndex() if text_list is not None else -1)
+        if any(runs is None for runs, _ in self.blocks):
+            return document.toHtml()
+        lists: List[List[Any]] = []
+        list_ids: Dict[int, int] = {}
+        parts = []
+        for runs, list_object in self.blocks:
+            if list_object < 0:
+                parts.append(runs)
+                continue
+            list_id = list_ids.get(list_object)
+            if list_id is None:
+                list_id = list_ids[list_object] = len(lists)
+                lists.append(_list_entry(document.object(list_object)))
+            parts.append(f'{{"l":{list_id},"r":{runs}}}')
+        head = f'{MAGIC}"l":{_encode(lists)},' if lists else MAGIC
+        return f'{head}"b":[{",".join(parts)}]}}'
+
+
+# Parsing
+def _char_format(attrs: Dict[str, Any]) -> QTextCharFormat:
+    fmt = QTextImageFormat() if 'img' in attrs else QTextCharFormat()
+    if 'img' in attrs:
+        fmt.setName(attrs['img'])
+        if 'iw' in attrs:
+            fmt.setWidth(attrs['iw'])
+        if 'ih' in attrs:
+            fmt.setHeight(attrs['ih'])
+    if attrs.get('b'):
+        fmt.setFontWeight(QFont.Weight.Bold)
+    elif 'w' in attrs:
+        fmt.setFontWeight(attrs['w'])
+    if attrs.get('i'):
+        fmt.setFontItalic(True)
+    if attrs.get('u'):
+        fmt.setFontUnderline(True)
+    if attrs.get('x'):
+        fmt.setFontStrikeOut(True)
+    if 's' in attrs:
+        fmt.setFontPointSize(attrs['s'])
+    if 'px' in attrs:
+        fmt.setProperty(QTextCharFormat.Property.FontPixelSize, attrs['px'])
+    if 'c' in attrs:
+        fmt.setForeground(QColor(attrs['c']))
+    if 'k' in attrs:
+        fmt.setBackground(QColor(attrs['k']))
+    if 'a' in attrs:
+        fmt.setAnchor(True)
+        fmt.setAnchorHref(attrs['a'])
+    return fmt
+
+
+def clear_block_spacing(document: QTextDocument, start: int, end: int):
+    """
+    Reset margins and indents of the blocks touching start..end, e.g. after
+    a paste through Qt's importer, so the note keeps fitting the format.
+    """
+    block = document.findBlock(start)
+    last = document.findBlock(end).blockNumber()
+    cursor = QTextCursor(document)
+    while block.isValid() and block.blockNumber() <= last:
+        fmt = block.blockFormat()
+        if any(fmt.hasProperty(prop) for prop in _BLOCK_SPACING):
+            for prop in _BLOCK_SPACING:
+                fmt.clearProperty(prop)
+            cursor.setPosition(block.position())
+            cursor.setBlockFormat(fmt)
+        block = block.next()
+
+
+def load_into(document: QTextDocument, content: str):
+    """Replace document with content in either format; the undo stack is reset."""
+    if not is_canonical(content):
+        document.setHtml(content)
+        return
+    undo = document.isUndoRedoEnabled()
+    document.setUndoRedoEnabled(False)
+    document.clear()
+    insert(QTextCursor(document), content)
+    document.setUndoRedoEnabled(undo)
+    document.setModified(False)
+
+
+def insert(cursor: QTextCursor, content: str):
+    """Insert canonical content at cursor as a single edit block (one undo step)."""
+    data = json.loads(content)
+    list_formats = data.get('l', [])
+    lists = {}
+    cursor.beginEditBlock()
+    for index, block in enumerate(data['b']):
+        if index:
+            cursor.insertBlock(QTextBlockFormat(), QTextCharFormat())
+        if isinstance(block, dict):
+            list_id = block['l']
+            if list_id in lists:
+                lists[list_id].add(cursor.block())
+            else:
+                style, indent = list_formats[list_id]
+                list_fmt = QTextListFormat()
+                list_fmt.setStyle(_LIST_STYLE_NAMES.get(style, QTextListFormat.Style.ListDisc))
+                list_fmt.setIndent(indent)
+                lists[list_id] = cursor.createList(list_fmt)
+            runs = block['r']
+        else:
+            runs = block
+        for run in runs:
+            if isinstance(run, str):
+                cursor.insertText(run, QTextCharFormat())
+            elif 'img' in run[1]:
+                image = _char_format(run[1])
+                for _ in run[0]:
+                    cursor.insertImage(image)
+            else:
+                cursor.insertText(run[0], _char_format(run[1]))
+    cursor.endEditBlock()
+
+
+# Importing
+class _HtmlImporter:
+    """
+    Pasted HTML reduced to the subset NoteWindow edits: paragraphs, lists,
+    headings, bold/italic/underline/strike and links. Styles, scripts,
+    images, tables and every other attribute are dropped.
+
+    Tokenized with one regular expression rather than html.parser, which is
+    several times slower on multi-megabyte pages; malformed markup only
+    costs formatting, never text.
+    """
+    TOKEN = re.compile(r"<!--.*?-->|<!\[CDATA\[.*?\]\]>|<([!?/]?)([a-zA-Z][\w:-]*)([^>]*)>|([^<]+|<)",
+                       re.DOTALL)
+    HREF = re.compile(r"""\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+    SKIP = ('head', 'style', 'script', 'title', 'noscript', 'template', 'svg')
+    BLOCKS = ('p', 'div', 'li', 'tr', 'pre', 'blockquote', 'section', 'article',
+              'header', 'footer', 'table', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+    INLINE = {'b': ('b', 1), 'strong': ('b', 1), 'i': ('i', 1), 'em': ('i', 1),
+              'u': ('u', 1), 's': ('x', 1), 'strike': ('x', 1), 'del': ('x', 1)}
+    # Same look as toggle_heading() and insert_link()
+    HEADING = {'b': 1, 's': 20}
+    LINK = {'u': 1, 'c': "#0066cc"}
+
+    def __init__(self):
+        self.lists: List[List[Any]] = []
+        self.blocks: List[Any] = []
+        self._runs: List[Any] = []
+        self._list_stack: List[int] = []
+        self._item = None
+        self._attrs: List[Dict[str, Any]] = []
+        self._skip = 0
+        self._pre = 0
+
+    def _end_block(self, force=False):
+        if self._runs or force:
+            self.blocks.append({'l': self._item, 'r': self._runs}
+                               if self._item is not None else self._runs)
+        self._runs = []
+
+    def feed(self, html: str):
+        for match in self.TOKEN.finditer(html):
+            kind, tag, attrs, text = match.groups()
+            if text is not None:
+                self.handle_data(unescape(text) if "&" in text else text)
+            elif tag is None or kind in ("!", "?"):
+                # Comment, CDATA, doctype or processing instruction
+                continue
+            elif kind == "/":
+                self.handle_endtag(tag.lower())
+            else:
+                self.handle_starttag(tag.lower(), attrs)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag == 'br':
+            self._end_block(force=True)
+        elif tag in ('td', 'th'):
+            if self._runs:
+                self._add(" ")
+        elif tag in ('ul', 'ol'):
+            self._end_block()
+            self._list_stack.append(len(self.lists))
+            self.lists.append(["decimal" if tag == 'ol' else "disc", len(self._list_stack)])
+        elif tag in self.BLOCKS:
+            self._end_block()
+            if tag == 'li':
+                self._item = self._list_stack[-1] if self._list_stack else None
+            if tag == 'pre':
+                self._pre += 1
+            self._attrs.append(self.HEADING if tag in ('h1', 'h2', 'h3') else {})
+        elif tag in self.INLINE:
+            key, value = self.INLINE[tag]
+            self._attrs.append({key: value})
+        elif tag == 'a':
+            match = self.HREF.search(attrs)
+            href = unescape(next(filter(None, match.groups()), "")) if match else ""
+            self._attrs.append(dict(self.LINK, a=href) if href else {})
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag in ('ul', 'ol'):
+            self._end_block()
+            if self._list_stack:
+                self._list_stack.pop()
+            self._item = None
+        elif tag in self.BLOCKS:
+            self._end_block()
+            if tag == 'li':
+                self._item = None
+            if tag == 'pre':
+                self._pre = max(0, self._pre - 1)
+            if self._attrs:
+                self._attrs.pop()
+        elif (tag in self.INLINE or tag == 'a') and self._attrs:
+            self._attrs.pop()
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._pre:
+            lines = data.split("\n")
+            for i, line in enumerate(lines):
+                if i:
+                    self._end_block(force=True)
+                self._add(line)
+            return
+        # Collapse white space as a browser would; str.split() beats re.sub here.
+        text = " ".join(data.split())
+        if text and data[-1].isspace():
+            text += " "
+        if data[0].isspace() and self._runs:
+            text = " " + text
+        self._add(text)
+
+    def _add(self, text):
+        if not text:
+            return
+        attrs = {}
+        for layer in self._attrs:
+            attrs.update(layer)
+        if not attrs:
+            if self._runs and isinstance(self._runs[-1], str):
+                self._runs[-1] += text
+            else:
+                self._runs.append(text)
+        elif self._runs and isinstance(self._runs[-1], list) and self._runs[-1][1] == attrs:
+            self._runs[-1][0] += text
+        else:
+            self._runs.append([text, attrs])
+
+    def close(self):
+        self._end_block()
+
+
+def from_html(html: str) -> str:
+    """Canonical content for pasted HTML, sanitized without QTextDocument's importer."""
+    importer = _HtmlImporter()
+    importer.feed(html or "")
+    importer.close()
+    return _dumps(importer.lists, importer.blocks)
+
+
+def from_plain_text(text: str) -> str:
+    """Canonical content for plain text, one block per line."""
+    return _dumps([], [[line] if line else [] for line in text.split("\n")])
+
+
+def to_document(content: str) -> QTextDocument:
+    document = QTextDocument()
+    load_into(document, content)
+    return document
+
+
+def to_html(content: str) -> str:
+    return content if not is_canonical(content) else to_document(content).toHtml()
+
+
+def migrate(content: str) -> str:
+    """
+    Canonical form of a legacy HTML note. Canonical content, and HTML using
+    formatting the canonical format cannot hold, are returned unchanged.
+    """
+    if not content or is_canonical(content):
+        return content
+    migrated = serialize(to_document(content))
+    return migrated if is_canonical(migrated) else content
+
+
+def to_plain_text(content: str) -> str:
+    """Plain text of a note in either format, without building a QTextDocument."""
+    if not is_canonical(content):
+        return html_to_text(content)
+    lines = []
+    for block in json.loads(content)['b']:
+        runs = block['r'] if isinstance(block, dict) else block
+        lines.append("".join(run if isinstance(run, str) else run[0] for run in runs))
+    return "\n".join(lines).replace(OBJECT_REPLACEMENT, "")
+
+
+
+def title_from_text(text: str, max_length: int = 60) -> str:
+    """First non-blank line of a note's plain text, as NoteWindow stores it in 'title'."""
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            return line[:max_length]
+    return ""
+
+
+# Exporting
+_ORDERED_STYLES = ("decimal", "lower-alpha", "upper-alpha", "lower-roman", "upper-roman")
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_\[\]<>~])")
+
+
+def iter_blocks(content: str) -> Iterator[Tuple[Optional[List[Any]], List[Any]]]:
+    """(list entry [style, indent] or None, runs) for each block of canonical content."""
+    data = json.loads(content)
+    lists = data.get('l', [])
+    for block in data['b']:
+        if isinstance(block, dict):
+            yield lists[block['l']], block['r']
+        else:
+            yield None, block
+
+
+def _is_heading(runs: List[Any]) -> bool:
+    return bool(runs) and not isinstance(runs[0], str) and runs[0][1].get('s', 0) >= 18
+
+
+def _markdown_run(run, heading: bool, image_url: Callable[[str], str]) -> str:
+    if isinstance(run, str):
+        return _MARKDOWN_SPECIAL.sub(r"\\\1", run.replace(OBJECT_REPLACEMENT, ""))
+    text, attrs = run
+    if 'img' in attrs:
+        return "".join(f"![]({image_url(attrs['img'])})" for _ in text)
+    escaped = _MARKDOWN_SPECIAL.sub(r"\\\1", text)
+    core = escaped.strip()
+    if not core:
+        return escaped
+    # Emphasis markers must hug the text, so surrounding spaces go outside.
+    lead = escaped[:len(escaped) - len(escaped.lstrip())]
+    trail = escaped[len(escaped.rstrip()):]
+    if attrs.get('x'):
+        core = f"~~{core}~~"
+    if attrs.get('i'):
+        core = f"*{core}*"
+    if attrs.get('b') and not heading:
+        core = f"**{core}**"
+    if attrs.get('u') and 'a' not in attrs:
+        core = f"<u>{core}</u>"
+    if 'a' in attrs:
+        core = f"[{core}]({attrs['a']})"
+    return lead + core + trail
+
+
+def to_markdown(content: str, image_url: Callable[[str], str] = lambda name: name) -> str:
+    """
+    Markdown for a note, without Qt, so it can run off the GUI thread.
+
+    Colours and font sizes other than headings have no Markdown form and are
+    dropped; image_url maps a stored image name (blob:<hash>) to a link.
+    """
+    if not is_canonical(content):
+        return html_to_text(content).strip() + "\n"
+    lines = []
+    previous_list = False
+    for list_entry, runs in iter_blocks(content):
+        heading = _is_heading(runs)
+        text = "".join(_markdown_run(run, heading, image_url) for run in runs)
+        if list_entry is not None:
+            style, indent = list_entry
+            marker = "1." if style in _ORDERED_STYLES else "-"
+            line = "   " * max(0, indent - 1) + f"{marker} {text}"
+            if lines and not previous_list:
+                lines.append("")
+            lines.append(line)
+            previous_list = True
+            continue
+        if not text.strip():
+            continue
+        if lines:
+            lines.append("")
+        lines.append(("# " if heading else "") + text)
+        previous_list = False
+    return "\n".join(lines) + "\n"
+
+
+def _html_run(run, image_url: Callable[[str], str]) -> str:
+    if isinstance(run, str):
+        return html_escape(run.replace(OBJECT_REPLACEMENT, ""), quote=False)
+    text, attrs = run
+    if 'img' in attrs:
+        size = "".join(f' {key}="{attrs[attr]}"' for key, attr in (("width", 'iw'), ("height", 'ih'))
+                       if attr in attrs)
+        return f'<img src="{html_escape(image_url(attrs["img"]))}"{size}>' * len(text)
+    out = html_escape(text, quote=False)
+    styles = []
+    if 's' in attrs:
+        styles.append(f"font-size:{attrs['s']}pt")
+    if 'px' in attrs:
+        styles.append(f"font-size:{attrs['px']}px")
+    if 'w' in attrs:
+        styles.append(f"font-weight:{attrs['w']}")
+    if 'c' in attrs:
+        styles.append(f"color:{attrs['c']}")
+    if 'k' in attrs:
+        styles.append(f"background-color:{attrs['k']}")
+    if styles:
+        out = f'<span style="{";".join(styles)}">{out}</span>'
+    for key, tag in (('x', "s"), ('u', "u"), ('i', "i"), ('b', "b")):
+        if attrs.get(key):
+            out = f"<{tag}>{out}</{tag}>"
+    if 'a' in attrs:
+        out = f'<a href="{html_escape(attrs["a"])}">{out}</a>'
+    return out
+
+
+def to_portable_html(content: str, title: str = "",
+                     image_url: Callable[[str], str] = lambda name: name) -> str:
+    """A standalone HTML page for a note, built without Qt like to_markdown()."""
+    if not is_canonical(content):
+        return content
+    parts = [f'<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+             f'<title>{html_escape(title, quote=False)}</title></head><body>\n']
+    open_list = None
+    for list_entry, runs in iter_blocks(content):
+        if list_entry is not open_list and open_list is not None:
+            parts.append("</ol>\n" if open_list[0] in _ORDERED_STYLES else "</ul>\n")
+            open_list = None
+        text = "".join(_html_run(run, image_url) for run in runs) or "<br>"
+        if list_entry is None:
+            tag = "h1" if _is_heading(runs) else "p"
+            parts.append(f"<{tag}>{text}</{tag}>\n")
+            continue
+        if open_list is None:
+            style, indent = list_entry
+            tag = "ol" if style in _ORDERED_STYLES else "ul"
+            parts.append(f'<{tag} style="list-style-type:{style};margin-left:{indent * 1.5}em">\n')
+            open_list = list_entry
+        parts.append(f"<li>{text}</li>\n")
+    if open_list is not None:
+        parts.append("</ol>\n" if open_list[0] in _ORDERED_STYLES else "</ul>\n")
+    parts.append("</body></html>\n")
+    return "".join(parts)
@@ -0,0 +1,121 @@
+import os
+import threading
+from typing import Tuple
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+def file_signature(*paths: str) -> Tuple:
+    """Cheap change detector: (inode, mtime_ns, size) for each path, None if missing."""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            signature.append(None)
+        else:
+            # The inode catches a same-size rename-over within one mtime tick.
+            signature.append((st.st_ino, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def atomic_write(path: str, data: bytes):
+    """
+    Write data to a temp file next to path, fsync it and rename it into place.
+
+    A crash at any point leaves either the old file or the new one, never a
+    truncated mix.
+    """
+    # Unique per writer, so two processes never share a temp file.
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(os.path.dirname(path))
+
+
+def fsync_directory(directory: str):
+    """Make a rename in directory durable. Windows cannot open directories and does not need it."""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FileLock:
+    """
+    Advisory lock on a side file, shared by every process using the store.
+
+    flock() on POSIX and msvcrt.locking() on Windows; re-entrant within a
+    process, and also serializes the threads of this process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.path, 'a+b')
+                self._lock(self._file)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            self._unlock(self._file)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+        return False
+
+    if os.name == 'nt':
+        @staticmethod
+        def _lock(f):
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK gives up after ten one-second retries; keep waiting.
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    return
+                except OSError:
+                    continue
+
+        @staticmethod
+        def _unlock(f):
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        @staticmethod
+        def _lock(f):
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+        @staticmethod
+        def _unlock(f):
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,418 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import nullcontext
+from collections import OrderedDict
+from typing import (List, Dict, Any, Mapping, Set, Iterable, Iterator, NamedTuple, Optional,
+                    Tuple, Callable)
+
+from blob_store import BlobStore
+from config import Config
+
+
+class Revision(NamedTuple):
+    offset: int
+    # Offset of the snapshot record this revision is rebuilt from
+    base: int
+    time: float
+    rev: int
+    chars: int
+    # Bytes on disk, header included
+    size: int
+
+
+class _Tail:
+    """What record() needs to know about the newest revision of one note."""
+    __slots__ = ('text', 'rev', 'time', 'first_time', 'count', 'since_snapshot', 'size')
+
+    def __init__(self):
+        self.text: Optional[str] = None
+        self.rev = None
+        self.time = 0.0
+        self.first_time = 0.0
+        self.count = 0
+        self.since_snapshot = 0
+        self.size = 0
+
+
+class NoteHistory:
+    """
+    Persistent per-note revision history.
+
+    Each note has an append-only ``<root>/<note id>.hist`` file of records:
+    a fixed HEADER (time, rev, text length, kind, refs length, payload
+    length), the blob hashes the revision uses, then a zlib-compressed
+    payload. Kind SNAPSHOT stores the whole text; DELTA stores
+    ``[prefix, suffix, inserted]`` against the previous record. A snapshot is
+    written every SNAPSHOT_EVERY records or when a delta would not be much
+    smaller, so rebuilding a revision reads at most that many records.
+
+    Saves are recorded at most once per interval; a save that replaces more
+    than LARGE_CHANGE characters also records the version it replaced first,
+    so a wipe or a paste over a note can always be undone. Listing only reads
+    headers and rebuilding one revision only holds one text, so neither loads
+    the whole history. Files are trimmed to max_revisions, max_days and
+    max_kb by rewriting them from their first kept revision.
+    """
+    MAGIC = b"FNH1"
+    HEADER = struct.Struct("<dIIBII")
+    SNAPSHOT, DELTA = 0, 1
+    SNAPSHOT_EVERY = 16
+    # Notes whose newest text is kept in memory to compute the next delta
+    TAIL_CACHE = 32
+    LARGE_CHANGE = 200
+    COMPARE_BLOCK = 4096
+    # Trimming keeps this share of a budget, so it does not run on every save.
+    TRIM_TO = 0.75
+
+    def __init__(self, root: str, lock=None, interval_s: Optional[float] = None,
+                 max_revisions: Optional[int] = None, max_days: Optional[float] = None,
+                 max_kb: Optional[int] = None):
+        self.root = root
+        # Inter-process lock (fileutil.FileLock); other instances append too.
+        self.file_lock = lock if lock is not None else nullcontext()
+        self.interval_s = (interval_s if interval_s is not None
+                           else Config.get('history_interval_minutes') * 60)
+        self.max_revisions = max_revisions if max_revisions is not None else Config.get('history_max_revisions')
+        max_days = max_days if max_days is not None else Config.get('history_max_days')
+        self.max_age_s = max_days * 24 * 3600
+        self.max_bytes = (max_kb if max_kb is not None else Config.get('history_max_kb')) * 1024
+        self._lock = threading.RLock()
+        # Newest revision of recently recorded notes, least recently used first
+        self._tails: "OrderedDict[str, _Tail]" = OrderedDict()
+        # note id -> (text, rev, time) saved but not recorded yet
+        self._pending: Dict[str, Tuple[str, Any, float]] = {}
+        self._known: Set[str] = set()
+        # Notes changed by the user since their last written batch
+        self._edited: Set[str] = set()
+        # note id -> text before the first edit of a note without history
+        self._baselines: Dict[str, Optional[str]] = {}
+
+    def path(self, note_id: str) -> str:
+        return os.path.join(self.root, note_id + ".hist")
+
+    def has_history(self, note_id: str) -> bool:
+        if note_id in self._known:
+            return True
+        if os.path.exists(self.path(note_id)):
+            self._known.add(note_id)
+            return True
+        return False
+
+    # Recording
+    def record(self, note_id: str, text: str, rev=None, when: Optional[float] = None,
+               force: bool = False):
+        """Add text as the note's newest revision, or hold it until the interval has passed."""
+        when = time.time() if when is None else when
+        with self._lock, self.file_lock:
+            tail = self._tail(note_id)
+            pending = self._pending.pop(note_id, None)
+            latest = pending[0] if pending else tail.text
+            if text == latest:
+                if pending:
+                    self._pending[note_id] = pending
+                return
+            large = latest is not None and self._is_large_change(latest, text)
+            if pending and large:
+                # Keep the version this change replaced.
+                self._append(note_id, tail, *pending)
+            if force or large or tail.text is None or when - tail.time >= self.interval_s:
+                self._append(note_id, tail, text, rev, when)
+            else:
+                self._pending[note_id] = (text, rev, when)
+
+    def note_edited(self, note_id: str, baseline: Callable[[], Optional[str]]):
+        """
+        Mark a note as edited by the user, so the next written batch records it.
+
+        The first edit of a note without history also keeps baseline(), the
+        text it had before, for record_batch() to write ahead of the edit.
+        """
+        with self._lock:
+            self._edited.add(note_id)
+            if note_id not in self._baselines and not self.has_history(note_id):
+                self._baselines[note_id] = baseline()
+
+    def record_batch(self, notes: Mapping[str, Dict[str, Any]], changed: Iterable[str],
+                     deleted: Iterable[str]):
+        """Record the user-edited notes of a batch that was just written."""
+        for note_id in changed:
+            with self._lock:
+                if note_id not in self._edited:
+                    # e.g. a format migration, not an edit
+                    continue
+                self._edited.discard(note_id)
+                baseline = self._baselines.pop(note_id, None)
+            if baseline:
+                self.record(note_id, baseline, force=True)
+            note = notes.get(note_id)
+            if note is not None and 'content' in note:
+                self.record(note_id, note['content'], note.get('rev'))
+        for note_id in deleted:
+            with self._lock:
+                self._edited.discard(note_id)
+                self._baselines.pop(note_id, None)
+            self.flush(note_id)
+
+    def flush(self, note_id: Optional[str] = None):
+        """Write held saves now: of one note, or of all with no argument."""
+        with self._lock, self.file_lock:
+            ids = [note_id] if note_id is not None else list(self._pending)
+            for pending_id in ids:
+                pending = self._pending.pop(pending_id, None)
+                if pending:
+                    self._append(pending_id, self._tail(pending_id), *pending)
+
+    @classmethod
+    def _is_large_change(cls, old: str, new: str) -> bool:
+        prefix, suffix, inserted = cls._delta(old, new)
+        return max(len(old) - prefix - suffix, len(inserted)) >= cls.LARGE_CHANGE
+
+    @classmethod
+    def _common_prefix(cls, a: str, b: str, limit: int) -> int:
+        # Compare in blocks, then bisect the first differing one: a few C-level
+        # slice compares instead of a Python loop per character.
+        n = 0
+        while n < limit:
+            m = min(n + cls.COMPARE_BLOCK, limit)
+            if a[n:m] != b[n:m]:
+                lo, hi = n, m - 1
+                while lo < hi:
+                    mid = (lo + hi + 1) // 2
+                    if a[n:mid] == b[n:mid]:
+                        lo = mid
+                    else:
+                        hi = mid - 1
+                return lo
+            n = m
+        return limit
+
+    @classmethod
+    def _common_suffix(cls, a: str, b: str, limit: int) -> int:
+        la, lb = len(a), len(b)
+        n = 0
+        while n < limit:
+            m = min(n + cls.COMPARE_BLOCK, limit)
+            if a[la - m:la - n] != b[lb - m:lb - n]:
+                lo, hi = n, m - 1
+                while lo < hi:
+                    mid = (lo + hi + 1) // 2
+                    if a[la - mid:la - n] == b[lb - mid:lb - n]:
+                        lo = mid
+                    else:
+                        hi = mid - 1
+                return lo
+            n = m
+        return limit
+
+    @classmethod
+    def _delta(cls, old: str, new: str) -> Tuple[int, int, str]:
+        """new as (chars kept from the start of old, chars kept from its end, text between)."""
+        limit = min(len(old), len(new))
+        prefix = cls._common_prefix(old, new, limit)
+        suffix = cls._common_suffix(old, new, limit - prefix)
+        return prefix, suffix, new[prefix:len(new) - suffix]
+
+    @staticmethod
+    def _apply(old: str, delta) -> str:
+        prefix, suffix, inserted = delta
+        return old[:prefix] + inserted + old[len(old) - suffix:]
+
+    def _encode(self, tail: _Tail, text: str, rev, when: float) -> bytes:
+        """One record for text following tail; updates tail's snapshot counter."""
+        kind, payload = self.SNAPSHOT, text
+        if tail.text is not None and tail.since_snapshot < self.SNAPSHOT_EVERY - 1:
+            delta = json.dumps(self._delta(tail.text, text), ensure_ascii=False)
+            if len(delta) < len(text) // 2:
+                kind, payload = self.DELTA, delta
+        tail.since_snapshot = tail.since_snapshot + 1 if kind == self.DELTA else 0
+        refs = "".join(sorted(BlobStore.references(text))).encode('ascii')
+        data = zlib.compress(payload.encode('utf-8'))
+        rev = rev if isinstance(rev, int) and rev >= 0 else 0
+        return self.HEADER.pack(when, rev, len(text), kind, len(refs), len(data)) + refs + data
+
+    def _append(self, note_id: str, tail: _Tail, text: str, rev, when: float):
+        path = self.path(note_id)
+        if tail.size != self._file_size(path):
+            # Another instance appended since we looked; our delta base is stale.
+            tail = self._load_tail(note_id)
+        record = self._encode(tail, text, rev, when)
+        os.makedirs(self.root, exist_ok=True)
+        with open(path, 'ab') as f:
+            if f.tell() == 0:
+                f.write(self.MAGIC)
+            f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+            tail.size = f.tell()
+        tail.text, tail.rev, tail.time = text, rev, when
+        tail.first_time = tail.first_time if tail.count else when
+        tail.count += 1
+        self._known.add(note_id)
+        if (tail.count > self.max_revisions or tail.size > self.max_bytes
+                or (self.max_age_s > 0 and when - tail.first_time > self.max_age_s)):
+            self._trim(note_id, when)
+
+    # Reading
+    @staticmethod
+    def _file_size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _tail(self, note_id: str) -> _Tail:
+        tail = self._tails.get(note_id)
+        if tail is None:
+            tail = self._load_tail(note_id)
+        self._tails.move_to_end(note_id)
+        return tail
+
+    def _load_tail(self, note_id: str) -> _Tail:
+        tail = _Tail()
+        revisions = self.revisions(note_id)
+        if revisions:
+            last = revisions[-1]
+            tail.text = self.text_at(note_id, last)
+            tail.rev, tail.time = last.rev, last.time
+            tail.first_time = revisions[0].time
+            tail.count = len(revisions)
+            tail.since_snapshot = sum(1 for r in revisions if r.base == last.base) - 1
+        tail.size = self._file_size(self.path(note_id))
+        self._remember(note_id, tail)
+        return tail
+
+    def _remember(self, note_id: str, tail: _Tail):
+        self._tails[note_id] = tail
+        while len(self._tails) > self.TAIL_CACHE:
+            self._tails.popitem(last=False)
+
+    def _headers(self, f) -> Iterator[Tuple[Revision, int, int, int]]:
+        """(revision, kind, refs length, payload length) per record, seeking past payloads."""
+        if f.read(len(self.MAGIC)) != self.MAGIC:
+            return
+        end = os.fstat(f.fileno()).st_size
+        offset, base = len(self.MAGIC), None
+        while offset + self.HEADER.size <= end:
+            f.seek(offset)
+            when, rev, chars, kind, refs_len, data_len = self.HEADER.unpack(f.read(self.HEADER.size))
+            size = self.HEADER.size + refs_len + data_len
+            if offset + size > end:
+                # Torn last record from a crash mid-append.
+                return
+            if kind == self.SNAPSHOT:
+                base = offset
+            if base is not None:
+                yield Revision(offset, base, when, rev, chars, size), kind, refs_len, data_len
+            offset += size
+
+    def revisions(self, note_id: str) -> List[Revision]:
+        """Every recorded revision of a note, oldest first, without reading any text."""
+        try:
+            with open(self.path(note_id), 'rb') as f:
+                return [revision for revision, *_ in self._headers(f)]
+        except FileNotFoundError:
+            return []
+
+    def _texts(self, f, start: int = 0) -> Iterator[Tuple[Revision, str]]:
+        """Rebuild revisions in order from the snapshot at start, one text at a time."""
+        f.seek(0)
+        text = None
+        for revision, kind, refs_len, data_len in self._headers(f):
+            if revision.offset < start:
+                continue
+            f.seek(revision.offset + self.HEADER.size + refs_len)
+            payload = zlib.decompress(f.read(data_len)).decode('utf-8')
+            text = payload if kind == self.SNAPSHOT else self._apply(text, json.loads(payload))
+            yield revision, text
+
+    def text_at(self, note_id: str, revision: Revision) -> str:
+        """Text of one revision, rebuilt from its snapshot and the deltas after it."""
+        with open(self.path(note_id), 'rb') as f:
+            for current, text in self._texts(f, revision.base):
+                if current.offset == revision.offset:
+                    return text
+        raise KeyError(f"no revision at offset {revision.offset}")
+
+    def references(self) -> Iterator[Set[str]]:
+        """Blob hashes used by each stored revision, so collection keeps their images."""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith(".hist"):
+                continue
+            try:
+                f = open(os.path.join(self.root, name), 'rb')
+            except OSError:
+                continue
+            with f:
+                for revision, kind, refs_len, data_len in self._headers(f):
+                    f.seek(revision.offset + self.HEADER.size)
+                    refs = f.read(refs_len).decode('ascii')
+                    yield {refs[i:i + 64] for i in range(0, len(refs), 64)}
+
+    # Retention
+    def _trim(self, note_id: str, now: float):
+        """Rewrite a note's history from its oldest revision within every budget."""
+        revisions = self.revisions(note_id)
+        keep = min(len(revisions), max(1, int(self.max_revisions * self.TRIM_TO)))
+        first = len(revisions) - keep
+        while first < len(revisions) - 1 and (
+                (self.max_age_s > 0 and now - revisions[first].time > self.max_age_s)
+                or sum(r.size for r in revisions[first:]) > self.max_bytes * self.TRIM_TO):
+            first += 1
+        path = self.path(note_id)
+        tmp_path = path + ".tmp"
+        tail = _Tail()
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            dst.write(self.MAGIC)
+            for revision, text in self._texts(src, revisions[first].base):
+                if revision.offset < revisions[first].offset:
+                    continue
+                dst.write(self._encode(tail, text, revision.rev, revision.time))
+                tail.text, tail.rev, tail.time = text, revision.rev, revision.time
+                tail.first_time = tail.first_time or revision.time
+                tail.count += 1
+            dst.flush()
+            os.fsync(dst.fileno())
+            tail.size = dst.tell()
+        os.replace(tmp_path, path)
+        self._remember(note_id, tail)
+
+    def prune(self, live_ids) -> int:
+        """
+        Delete history files of notes not in live_ids, once untouched for
+        longer than max_days. Live notes keep theirs; _trim() ages those out
+        revision by revision.
+        """
+        if self.max_age_s <= 0:
+            return 0
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return 0
+        cutoff = time.time() - self.max_age_s
+        removed = 0
+        with self._lock, self.file_lock:
+            for name in names:
+                path = os.path.join(self.root, name)
+                try:
+                    if not name.endswith(".hist"):
+                        continue
+                    note_id = name[:-len(".hist")]
+                    if note_id not in live_ids and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        self._tails.pop(note_id, None)
+                        self._known.discard(note_id)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def close(self):
+        self.flush()
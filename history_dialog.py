@@ -0,0 +1,82 @@
+import time
+
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem,
+                             QPushButton, QSplitter, QLabel)
+from PyQt6.QtCore import Qt, pyqtSignal
+
+import content_format
+
+
+class HistoryDialog(QDialog):
+    """
+    Browse a note's stored revisions and restore one.
+
+    The list is built from record headers only; a revision's text is rebuilt
+    when it is selected, so one revision at a time is in memory.
+    """
+    restore_requested = pyqtSignal(str)
+
+    def __init__(self, history, note_id, preview, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.note_id = note_id
+        self.setWindowTitle("Note History")
+        self.setWindowFlags(self.windowFlags() | Qt.WindowType.WindowStaysOnTopHint)
+        self.resize(640, 420)
+
+        layout = QVBoxLayout(self)
+        splitter = QSplitter()
+        self.revision_list = QListWidget()
+        self.revision_list.currentItemChanged.connect(self.show_revision)
+        splitter.addWidget(self.revision_list)
+        # A read-only NoteEditor, so blob: images resolve like in the note.
+        self.preview = preview
+        self.preview.setReadOnly(True)
+        splitter.addWidget(self.preview)
+        splitter.setSizes([200, 440])
+        layout.addWidget(splitter)
+
+        buttons = QHBoxLayout()
+        self.status_label = QLabel()
+        buttons.addWidget(self.status_label)
+        buttons.addStretch()
+        self.restore_btn = QPushButton("Restore")
+        self.restore_btn.clicked.connect(self.restore_current)
+        buttons.addWidget(self.restore_btn)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.close)
+        buttons.addWidget(close_btn)
+        layout.addLayout(buttons)
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the list, newest first, from the history file's headers."""
+        # Include a save still waiting for the interval.
+        self.history.flush(self.note_id)
+        revisions = self.history.revisions(self.note_id)
+        self.revision_list.clear()
+        for revision in reversed(revisions):
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(revision.time))
+            item = QListWidgetItem(f"{stamp}  ·  {revision.chars:,} chars")
+            item.setData(Qt.ItemDataRole.UserRole, revision)
+            self.revision_list.addItem(item)
+        self.status_label.setText(f"{len(revisions)} revisions" if revisions else "No revisions yet")
+        self.restore_btn.setEnabled(bool(revisions))
+        if revisions:
+            self.revision_list.setCurrentRow(0)
+        else:
+            self.preview.clear()
+
+    def show_revision(self, item, previous=None):
+        if item is None:
+            return
+        text = self.history.text_at(self.note_id, item.data(Qt.ItemDataRole.UserRole))
+        content_format.load_into(self.preview.document(), text)
+
+    def restore_current(self):
+        item = self.revision_list.currentItem()
+        if item is None:
+            return
+        self.restore_requested.emit(
+            self.history.text_at(self.note_id, item.data(Qt.ItemDataRole.UserRole)))
+        self.close()
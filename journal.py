@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+from contextlib import nullcontext
+from typing import List, Dict, Any, Optional, Set
+
+from checkpoints import Checkpoints
+from fileutil import file_signature, atomic_write
+from snapshot_codec import SnapshotCodec
+
+
+class NoteJournal:
+    """
+    Append-only change log in front of a JSON snapshot.
+
+    Every change is appended as one JSON line to the journal. Once the journal
+    grows past COMPACT_THRESHOLD bytes it is rotated aside and a background
+    thread folds the current state back into the snapshot. The snapshot is
+    read and written through SnapshotCodec: plain ``notes.json`` list format
+    by default, so an existing file is imported as is, or a compressed
+    container that only recompresses notes changed since the last snapshot.
+
+    Appends are fsynced before write() returns. Each snapshot replacement
+    first rotates the previous one into Checkpoints, and load() falls back
+    to the newest readable checkpoint if the snapshot is damaged; replaying
+    the log on top is bounded by COMPACT_THRESHOLD.
+    """
+    COMPACT_THRESHOLD = 256 * 1024
+    LAZY_CONTENT = False
+
+    def __init__(self, snapshot_path: str, compact_threshold: Optional[int] = None,
+                 compression: str = "none", lock=None, checkpoints: Optional[Checkpoints] = None):
+        self.snapshot_path = snapshot_path
+        self.checkpoints = checkpoints if checkpoints is not None else Checkpoints(snapshot_path)
+        # Set by load() when the snapshot had to be recovered
+        self.recovery = None
+        # Inter-process lock (fileutil.FileLock) taken before self._lock when
+        # the snapshot is swapped in, so no other instance reads in between.
+        self.file_lock = lock if lock is not None else nullcontext()
+        self.codec = SnapshotCodec(compression)
+        self.journal_path = snapshot_path + ".journal"
+        self.pending_path = self.journal_path + ".compacting"
+        if compact_threshold is not None:
+            self.COMPACT_THRESHOLD = compact_threshold
+
+        self._lock = threading.RLock()
+        self._file = None
+        self._journal_size = 0
+        self._compactor: Optional[threading.Thread] = None
+        self._signature = None
+        # Notes put or deleted since the snapshot was written
+        self._unsnapshotted: Set[str] = set()
+
+    def _paths(self):
+        return self.snapshot_path, self.journal_path, self.pending_path
+
+    def paths(self) -> List[str]:
+        return list(self._paths())
+
+    def changed_externally(self) -> bool:
+        with self._lock:
+            return file_signature(*self._paths()) != self._signature
+
+    # Startup
+    def load(self) -> List[Dict[str, Any]]:
+        """Rebuild state from the snapshot, an interrupted compaction and the log tail."""
+        with self._lock:
+            self._close_file()
+            notes: Dict[str, Dict[str, Any]] = {}
+            for note in self._read_snapshot():
+                if note.get('id') is not None:
+                    notes[note['id']] = note
+            self._unsnapshotted = set()
+            self._replay_log(self.pending_path, notes)
+            self._replay_log(self.journal_path, notes)
+            self._journal_size = self._size(self.journal_path)
+            self._signature = file_signature(*self._paths())
+
+        if os.path.exists(self.pending_path):
+            # A previous compaction did not finish; fold everything now.
+            self.compact(notes, wait=True)
+        return list(notes.values())
+
+    def _read_snapshot(self) -> List[Dict[str, Any]]:
+        notes, self.recovery = self.checkpoints.load(self.codec.read)
+        return notes
+
+    def _replay_log(self, path: str, notes: Dict[str, Dict[str, Any]]):
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return
+        valid_end = 0
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # Torn tail from a crash mid-append; nothing after it is valid.
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                self._apply(record, notes)
+                valid_end += len(line)
+        if valid_end < self._size(path):
+            # Drop the torn tail so new appends do not get glued onto it.
+            with open(path, 'r+b') as f:
+                f.truncate(valid_end)
+
+    def _apply(self, record: Dict[str, Any], notes: Dict[str, Dict[str, Any]]):
+        op = record.get('op')
+        if op == 'put':
+            note = record.get('note') or {}
+            if note.get('id') is not None:
+                notes[note['id']] = note
+                self._unsnapshotted.add(note['id'])
+        elif op == 'del':
+            notes.pop(record.get('id'), None)
+            self._unsnapshotted.add(record.get('id'))
+
+    @staticmethod
+    def _size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    # Writes
+    def write(self, notes: Dict[str, Dict[str, Any]], changed: Set[str], deleted: Set[str]):
+        """Append one record per changed or deleted note."""
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.journal_path, 'a', encoding='utf-8')
+            for note_id in deleted:
+                self._append({'op': 'del', 'id': note_id})
+            for note_id in changed:
+                if note_id in notes:
+                    self._append({'op': 'put', 'note': notes[note_id]})
+            self._unsnapshotted |= changed | deleted
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._signature = file_signature(*self._paths())
+            if self._journal_size >= self.COMPACT_THRESHOLD:
+                self.compact(notes)
+
+    def _append(self, record: Dict[str, Any]):
+        line = json.dumps(record, separators=(',', ':')) + "\n"
+        self._file.write(line)
+        self._journal_size += len(line.encode('utf-8'))
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # Compaction
+    def compact(self, notes: Dict[str, Dict[str, Any]], wait: bool = False):
+        """
+        Fold the journal into the snapshot.
+
+        The live journal is renamed aside under the lock together with a copy of
+        the state, so appends can continue into a fresh journal while the
+        snapshot is written in the background. With wait the snapshot is
+        written on the calling thread, which may already hold the file lock.
+        """
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                # It already owns the pending records; ours fold in next time.
+                return
+            self._close_file()
+            if os.path.exists(self.journal_path):
+                if os.path.exists(self.pending_path):
+                    # Leftover from an interrupted run: keep its records ahead of ours.
+                    with open(self.pending_path, 'a', encoding='utf-8') as dst, \
+                            open(self.journal_path, 'r', encoding='utf-8') as src:
+                        dst.write(src.read())
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, self.pending_path)
+            self._journal_size = 0
+            self._signature = file_signature(*self._paths())
+            state = dict(notes)
+            changed, self._unsnapshotted = self._unsnapshotted, set()
+            pending = file_signature(self.pending_path)
+            if not wait:
+                self._compactor = threading.Thread(
+                    target=self._write_snapshot, args=(state, changed, pending),
+                    name="NoteJournalCompactor", daemon=True)
+                self._compactor.start()
+
+        if wait:
+            self._write_snapshot(state, changed, pending)
+
+    def _write_snapshot(self, notes: Dict[str, Dict[str, Any]], changed: Set[str], pending):
+        data = self.codec.encode(notes, changed)
+        with self.file_lock, self._lock:
+            if file_signature(self.pending_path) != pending:
+                # Another instance folded these records (and later ones) first.
+                self._signature = None
+                return
+            self.checkpoints.rotate()
+            atomic_write(self.snapshot_path, data)
+            try:
+                os.remove(self.pending_path)
+            except FileNotFoundError:
+                pass
+            self._signature = file_signature(*self._paths())
+
+    def close(self):
+        """Wait for a running compaction and release the journal handle."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._lock:
+            self._close_file()
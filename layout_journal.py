@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+from typing import List, Dict, Any, Mapping, Set, Iterable
+
+from fileutil import file_signature, atomic_write, FileLock
+
+
+class LayoutJournal:
+    """
+    Append-only log of window layout: geometry, pinned state and colour.
+
+    Each line is one note's current layout, or a deletion marker; the last
+    line for an id wins. Moving a note appends about a hundred bytes instead
+    of rewriting its content. The log is rewritten with one line per live
+    note once it is much larger than that.
+    """
+    KEYS = ('geometry', 'pinned', 'color')
+    MIN_COMPACT_SIZE = 64 * 1024
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._layouts: Dict[str, Dict[str, Any]] = {}
+        self._size = 0
+        self._signature = None
+
+    @classmethod
+    def layout_of(cls, note: Mapping[str, Any]) -> Dict[str, Any]:
+        return {key: note[key] for key in cls.KEYS if key in note}
+
+    def paths(self) -> List[str]:
+        return [self.path]
+
+    def changed_externally(self) -> bool:
+        return file_signature(self.path) != self._signature
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """note id -> layout fields, ignoring a torn last line."""
+        layouts: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        break
+                    note_id = record.pop('id', None)
+                    if note_id is None:
+                        continue
+                    if record.get('deleted'):
+                        layouts.pop(note_id, None)
+                    else:
+                        layouts[note_id] = record
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._layouts = layouts
+            self._size = self._file_size()
+            self._signature = file_signature(self.path)
+        return dict(layouts)
+
+    def _file_size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def write(self, notes: Mapping[str, Dict[str, Any]], ids: Iterable[str], deleted: Set[str]):
+        lines = []
+        with self._lock:
+            for note_id in deleted:
+                if self._layouts.pop(note_id, None) is not None:
+                    lines.append({'id': note_id, 'deleted': True})
+            for note_id in ids:
+                note = notes.get(note_id)
+                if note is None:
+                    continue
+                layout = self.layout_of(note)
+                if self._layouts.get(note_id) != layout:
+                    self._layouts[note_id] = layout
+                    lines.append(dict(layout, id=note_id))
+            if not lines:
+                return
+            data = "".join(json.dumps(line, separators=(',', ':')) + "\n" for line in lines)
+            if self._size > max(self.MIN_COMPACT_SIZE, 4 * 100 * len(self._layouts)):
+                self._compact()
+            else:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._size += len(data.encode('utf-8'))
+            self._signature = file_signature(self.path)
+
+    def _compact(self):
+        data = "".join(json.dumps(dict(layout, id=note_id), separators=(',', ':')) + "\n"
+                       for note_id, layout in self._layouts.items()).encode('utf-8')
+        atomic_write(self.path, data)
+        self._size = len(data)
+
+
+class LayoutBackend:
+    """
+    Pairs a content backend with a LayoutJournal, under one inter-process lock.
+
+    Layout-only changes go to the journal alone. Notes whose content changed
+    are written to both, so the journal always holds the latest layout and
+    overrides whatever the content backend stored with it.
+
+    If another process wrote since our last load, a write first re-reads the
+    store and applies our changes on top of it instead of overwriting it;
+    changed_externally() then stays true until the next load(), so Storage
+    picks the other process's notes up.
+    """
+
+    def __init__(self, content_backend, layout: LayoutJournal, lock: FileLock):
+        self.content = content_backend
+        self.layout = layout
+        self.lock = lock
+        self.LAZY_CONTENT = content_backend.LAZY_CONTENT
+        self._merged_external = False
+
+    def paths(self) -> List[str]:
+        return self.content.paths() + self.layout.paths()
+
+    @property
+    def recovery(self):
+        """The content backend's RecoveryReport from its last load, if it had to recover."""
+        return getattr(self.content, 'recovery', None)
+
+    def changed_externally(self) -> bool:
+        return (self._merged_external or self.content.changed_externally()
+                or self.layout.changed_externally())
+
+    def load(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            self._merged_external = False
+            return self._load()
+
+    def _load(self) -> List[Dict[str, Any]]:
+        notes = self.content.load()
+        layouts = self.layout.load()
+        for note in notes:
+            layout = layouts.get(note.get('id'))
+            if layout:
+                note.update(layout)
+        return notes
+
+    def load_content(self, note_id: str) -> str:
+        return self.content.load_content(note_id)
+
+    def write(self, notes: Mapping[str, Dict[str, Any]], changed: Set[str], deleted: Set[str],
+              layout_changed: Set[str] = frozenset()):
+        with self.lock:
+            # Until Storage reloads, its notes lack what the last merge found.
+            if self.changed_externally():
+                notes = self._merge_external(notes, changed, deleted, layout_changed)
+            if changed or deleted:
+                self.content.write(notes, changed, deleted)
+            self.layout.write(notes, changed | layout_changed, deleted)
+
+    def _merge_external(self, notes, changed, deleted, layout_changed) -> Dict[str, Dict[str, Any]]:
+        """The store on disk with this batch applied on top."""
+        merged = {n['id']: n for n in self._load() if n.get('id') is not None}
+        for note_id in deleted:
+            merged.pop(note_id, None)
+        for note_id in changed:
+            if note_id in notes:
+                merged[note_id] = notes[note_id]
+        for note_id in layout_changed:
+            if note_id in merged and note_id in notes:
+                # Keep the other process's content; only our layout is newer.
+                merged[note_id] = dict(merged[note_id], **LayoutJournal.layout_of(notes[note_id]))
+            elif note_id in notes:
+                merged[note_id] = notes[note_id]
+        self._merged_external = True
+        return merged
+
+    def close(self):
+        self.content.close()
@@ -1,11 +1,23 @@
 import sys
 import os
-from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMenu
+import time
+# Start of the startup timing report; taken before Qt is imported
+STARTED = time.perf_counter()
+from collections import deque
+from functools import partial
+from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QFileDialog, QProgressDialog
 from PyQt6.QtGui import QIcon, QAction
-from PyQt6.QtCore import QTimer
+from PyQt6.QtCore import QTimer, QRect, QFileSystemWatcher
 
+from config import Config
 from storage import Storage
 from note_window import NoteWindow
+from save_scheduler import SaveScheduler
+from persistence_worker import PersistenceWorker
+from memory_accounting import MemoryBudget, summarize
+from startup import StartupReport
+from tracing import tracer, traced
+# Dialogs and the export/import workers are imported when first used.
 
 
 def get_resource_path(filename):
@@ -16,61 +28,474 @@ def get_resource_path(filename):
 
 
 class FloatNoteApp:
-    def __init__(self):
+    OPEN_MENU_LIMIT = 50
+    INDEX_SLICE = 100
+    MIGRATE_SLICE = 50
+    # Quiet period after a store file changes before reloading it
+    RELOAD_DELAY_MS = 300
+    MARKDOWN_EXPORT = "Markdown notes (*.zip)"
+    HTML_EXPORT = "HTML notes (*.zip)"
+    # Longest wait for the first note to paint before deferred startup runs anyway
+    FIRST_PAINT_TIMEOUT_MS = 500
+    MEMORY_CHECK_MS = 15 * 1000
+
+    def __init__(self, started=STARTED):
+        self.startup = StartupReport(started)
+        self.startup.mark('import')
         self.app = QApplication(sys.argv)
         self.app.setQuitOnLastWindowClosed(False)
+        self.startup.mark('qt_init')
         
         self.storage = Storage()
+        self.scheduler = SaveScheduler(self.storage)
         self.windows = {}
+        # Stored notes without a window yet: note_id -> metadata
+        self.dormant = {}
+        self.search_dialog = None
+        self.manager_dialog = None
+        self.trace_dialog = None
+        self.memory_dialog = None
+        self.tray_icon = None
+        # Running ExportWorker or ImportWorker, one at a time
+        self.transfer = None
+        self.import_counts = [0, 0]
         
-        self.setup_tray()
-        self.load_existing_notes()
+        self.setup_persistence()
+        self.setup_hibernation()
+        restore = self.load_existing_notes()
+        self.setup_watcher()
         
-        if not self.windows:
+        if not self.windows and not self.dormant:
             self.create_new_note()
+        self.startup.mark('pinned_windows')
 
-    def setup_tray(self):
-        self.tray_icon = QSystemTrayIcon(self.app)
-        
-        # Load custom icon
+        # Everything else waits until the first note is on screen, then runs
+        # one step per event-loop turn so input and painting stay responsive.
+        self.startup_steps = deque([self.setup_tray, self.setup_tray_menu])
+        self.startup_steps.extend(partial(self.restore_note, note_id) for note_id in restore)
+        self.startup_steps.extend([self.report_recovery, self.finish_startup])
+        self.startup_begun = False
+        if self.windows:
+            self.startup.first_paint.connect(self.begin_deferred_startup)
+            QTimer.singleShot(self.FIRST_PAINT_TIMEOUT_MS, self.begin_deferred_startup)
+        else:
+            QTimer.singleShot(0, self.begin_deferred_startup)
+
+    def begin_deferred_startup(self):
+        if not self.startup_begun:
+            self.startup_begun = True
+            self.continue_startup()
+
+    def continue_startup(self):
+        """Run the next deferred startup step and schedule the one after it."""
+        if not self.startup_steps:
+            return
+        self.startup_steps.popleft()()
+        if self.startup_steps:
+            QTimer.singleShot(0, self.continue_startup)
+
+    def finish_startup(self):
+        self.startup.finish(windows=len(self.windows), dormant=len(self.dormant))
+        # Catch up on notes saved before indexing or edited elsewhere, once idle
+        QTimer.singleShot(0, self.sync_search_index)
+        # Drop the history of notes deleted longer ago than history_max_days
+        QTimer.singleShot(0, lambda: self.storage.history.prune(set(self.storage.snapshot())))
+
+    def load_icon(self):
         icon_path = get_resource_path("logo.ico")
         if os.path.exists(icon_path):
-            icon = QIcon(icon_path)
-        else:
-            # Fallback to PNG
-            png_path = get_resource_path("logo.png")
-            if os.path.exists(png_path):
-                icon = QIcon(png_path)
-            else:
-                style = self.app.style()
-                icon = style.standardIcon(style.StandardPixmap.SP_FileIcon)
-        
+            return QIcon(icon_path)
+        # Fallback to PNG
+        png_path = get_resource_path("logo.png")
+        if os.path.exists(png_path):
+            return QIcon(png_path)
+        style = self.app.style()
+        return style.standardIcon(style.StandardPixmap.SP_FileIcon)
+
+    def setup_tray(self):
+        if self.tray_icon is not None:
+            return
+        self.tray_icon = QSystemTrayIcon(self.app)
+        icon = self.load_icon()
         self.tray_icon.setIcon(icon)
         self.app.setWindowIcon(icon)
+        self.tray_icon.show()
 
-        
+    def setup_tray_menu(self):
         menu = QMenu()
         
         new_note_action = QAction("New Note", self.app)
         new_note_action.triggered.connect(self.create_new_note)
         menu.addAction(new_note_action)
         
+        search_action = QAction("Search…", self.app)
+        search_action.triggered.connect(self.show_search)
+        menu.addAction(search_action)
+
+        self.open_note_menu = menu.addMenu("Open Note")
+        self.open_note_menu.aboutToShow.connect(self.populate_open_note_menu)
+
+        manager_action = QAction("All Notes…", self.app)
+        manager_action.triggered.connect(self.show_manager)
+        menu.addAction(manager_action)
+
+        menu.addSeparator()
+        export_action = QAction("Export Notes…", self.app)
+        export_action.triggered.connect(self.export_notes)
+        menu.addAction(export_action)
+
+        import_action = QAction("Import Notes…", self.app)
+        import_action.triggered.connect(self.import_notes)
+        menu.addAction(import_action)
+
         show_all_action = QAction("Show All", self.app)
         show_all_action.triggered.connect(self.show_all_notes)
         menu.addAction(show_all_action)
         
+        menu.addSeparator()
+        trace_action = QAction("Tracing", self.app)
+        trace_action.setCheckable(True)
+        trace_action.setChecked(tracer.enabled)
+        trace_action.toggled.connect(tracer.set_enabled)
+        menu.addAction(trace_action)
+
+        trace_stats_action = QAction("Trace Stats…", self.app)
+        trace_stats_action.triggered.connect(self.show_trace_stats)
+        menu.addAction(trace_stats_action)
+
+        memory_usage_action = QAction("Memory Usage…", self.app)
+        memory_usage_action.triggered.connect(self.show_memory_usage)
+        menu.addAction(memory_usage_action)
+
+        self.memory_action = QAction("", self.app)
+        self.memory_action.setEnabled(False)
+        menu.addAction(self.memory_action)
+        self.hibernated_action = QAction("", self.app)
+        self.hibernated_action.setEnabled(False)
+        menu.addAction(self.hibernated_action)
+        menu.aboutToShow.connect(self.update_memory_action)
+
         quit_action = QAction("Quit", self.app)
         quit_action.triggered.connect(self.quit_app)
         menu.addAction(quit_action)
         
         self.tray_icon.setContextMenu(menu)
-        self.tray_icon.show()
 
+    def notify(self, message, icon=QSystemTrayIcon.MessageIcon.Information):
+        """Show a tray message, bringing the tray up first if startup has not yet."""
+        self.setup_tray()
+        self.tray_icon.showMessage("Sticky Notes", message, icon)
+
+    def setup_persistence(self):
+        """Move disk writes onto a worker thread so saves never block the UI."""
+        self.writer = PersistenceWorker(self.storage.backend, self.storage.history)
+        self.writer.failed.connect(self.on_save_failed)
+        self.writer.start()
+        self.storage.set_writer(self.writer)
+
+    def setup_watcher(self):
+        """Pick up notes written by another instance or a sync tool."""
+        self.watcher = QFileSystemWatcher()
+        self.watcher.fileChanged.connect(self.schedule_reload)
+        self.watcher.directoryChanged.connect(self.schedule_reload)
+        self.reload_timer = QTimer()
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.timeout.connect(self.reload_external_changes)
+        self.watcher.addPath(os.path.abspath(os.path.dirname(Storage.FILE_PATH) or "."))
+        self.watch_store_files()
+
+    def watch_store_files(self):
+        # Atomic renames drop a file from the watch list; re-add what exists now.
+        watched = set(self.watcher.files())
+        paths = [path for path in map(os.path.abspath, self.storage.backend.paths())
+                 if path not in watched and os.path.exists(path)]
+        if paths:
+            self.watcher.addPaths(paths)
+
+    def schedule_reload(self, path=None):
+        self.reload_timer.start(self.RELOAD_DELAY_MS)
+
+    def reload_external_changes(self):
+        """Apply another process's changes to just the affected windows."""
+        self.watch_store_files()
+        if self.writer.is_busy():
+            self.schedule_reload()
+            return
+        diff = self.storage.reload()
+        if diff is None:
+            return
+        self.apply_store_diff(diff)
+        self.sync_search_index()
+
+    def apply_store_diff(self, diff, open_added=True):
+        """
+        Bring windows in line with notes that changed in storage.
+
+        Added notes get a window like at startup when open_added, else they
+        stay dormant; windows with unsaved edits keep them.
+        """
+        for note_id in diff.removed:
+            self.dormant.pop(note_id, None)
+            window = self.windows.get(note_id)
+            if window is not None and not window.content_dirty:
+                del self.windows[note_id]
+                self.scheduler.forget(note_id)
+                window.close()
+                window.deleteLater()
+        cap = Config.get('restore_window_cap')
+        for note_id in diff.added:
+            meta = self.storage.get_metadata(note_id)
+            if open_added and len(self.windows) < cap and (meta.get('pinned') or self.is_on_screen(meta)):
+                self.create_note_window(self.storage.get_note(note_id))
+            else:
+                self.dormant[note_id] = {k: v for k, v in meta.items() if k != 'content'}
+        changed = [(note_id, True) for note_id in diff.content_changed]
+        changed += [(note_id, False) for note_id in diff.layout_changed]
+        for note_id, content_changed in changed:
+            window = self.windows.get(note_id)
+            if window is None:
+                meta = self.storage.get_metadata(note_id)
+                self.dormant[note_id] = {k: v for k, v in meta.items() if k != 'content'}
+            elif not window.content_dirty:
+                # Unsaved local edits win; they are written over this version.
+                note = self.storage.get_note(note_id) if content_changed \
+                    else self.storage.get_metadata(note_id)
+                window.apply_external(note, content_changed)
+        if self.manager_dialog is not None:
+            self.manager_dialog.schedule_refresh()
+
+    def report_recovery(self):
+        """Tell the user if the store was damaged and restored from a checkpoint."""
+        report = self.storage.recovery
+        if report is None:
+            return
+        if report.source is not None:
+            message = (f"The note store was damaged; restored {report.notes} notes from "
+                       f"{os.path.basename(report.source)} in {report.elapsed_ms:.0f} ms.")
+        else:
+            message = (f"The note store was damaged and no checkpoint was readable; "
+                       f"salvaged {report.notes} notes.")
+        message += f" A copy of the damaged file was kept as {os.path.basename(report.quarantined)}."
+        self.notify(message, QSystemTrayIcon.MessageIcon.Warning)
+
+    def on_save_failed(self, message):
+        self.notify(f"Could not save notes: {message}", QSystemTrayIcon.MessageIcon.Warning)
+
+    def show_search(self):
+        if self.search_dialog is None:
+            from search_dialog import SearchDialog
+            self.search_dialog = SearchDialog(self.storage)
+            self.search_dialog.note_selected.connect(self.open_note)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
+
+    def show_manager(self):
+        if self.manager_dialog is None:
+            from note_manager import NoteManagerDialog
+            self.manager_dialog = NoteManagerDialog(self.storage)
+            self.manager_dialog.note_selected.connect(self.open_note)
+            self.writer.written.connect(self.manager_dialog.schedule_refresh)
+        self.manager_dialog.show()
+        self.manager_dialog.raise_()
+        self.manager_dialog.activateWindow()
+
+    def sync_search_index(self):
+        """Index stale notes in small slices so the event loop stays responsive."""
+        if self.storage.sync_search_index(limit=self.INDEX_SLICE) >= self.INDEX_SLICE:
+            QTimer.singleShot(0, self.sync_search_index)
+        else:
+            QTimer.singleShot(0, self.migrate_content)
+
+    def migrate_content(self):
+        """Rewrite legacy HTML notes in the compact format, a slice per idle turn."""
+        if self.storage.migrate_content(limit=self.MIGRATE_SLICE):
+            QTimer.singleShot(0, self.migrate_content)
+
+    # Export and import
+    def export_notes(self):
+        if self.transfer is not None:
+            return
+        path, selected = QFileDialog.getSaveFileName(
+            None, "Export Notes", "notes-export.zip", f"{self.MARKDOWN_EXPORT};;{self.HTML_EXPORT}")
+        if not path:
+            return
+        # The export reads the store; include edits still waiting to be saved.
+        self.scheduler.flush()
+        from note_transfer import ExportWorker
+        worker = ExportWorker(self.storage, path, "html" if selected == self.HTML_EXPORT else "markdown")
+        worker.done.connect(lambda count: self.notify(
+            f"Exported {count} notes to {os.path.basename(path)}."))
+        self.run_transfer(worker, "Exporting notes…")
+
+    def import_notes(self):
+        if self.transfer is not None:
+            return
+        path, _ = QFileDialog.getOpenFileName(None, "Import Notes", "", "Note exports (*.zip)")
+        if not path:
+            return
+        self.import_counts = [0, 0]
+        from note_transfer import ImportWorker
+        worker = ImportWorker(self.storage, path)
+        worker.batch_ready.connect(self.apply_import_batch)
+        worker.done.connect(self.on_import_done)
+        self.run_transfer(worker, "Importing notes…")
+
+    def run_transfer(self, worker, label):
+        """Run an export or import worker behind a progress dialog."""
+        self.transfer = worker
+        dialog = QProgressDialog(label, "Cancel", 0, 0)
+        dialog.setWindowTitle("Sticky Notes")
+        dialog.setMinimumDuration(500)
+        worker.progress.connect(lambda done, total: (dialog.setMaximum(total), dialog.setValue(done)))
+        dialog.canceled.connect(worker.requestInterruption)
+        worker.failed.connect(lambda message: self.notify(
+            f"{label[:-1]} failed: {message}", QSystemTrayIcon.MessageIcon.Warning))
+        worker.finished.connect(dialog.reset)
+        worker.finished.connect(self.on_transfer_finished)
+        self.transfer_dialog = dialog
+        worker.start()
+
+    def on_transfer_finished(self):
+        self.transfer = None
+        self.transfer_dialog = None
+
+    def apply_import_batch(self, notes):
+        """Stage one batch from the ImportWorker, then let it read the next."""
+        diff = self.storage.import_notes(notes)
+        self.storage.flush()
+        self.apply_store_diff(diff, open_added=False)
+        self.import_counts[0] += len(diff.added)
+        self.import_counts[1] += len(diff.content_changed)
+        if self.transfer is not None:
+            self.transfer.batch_applied()
+
+    def on_import_done(self, read):
+        added, updated = self.import_counts
+        skipped = read - added - updated
+        self.notify(f"Imported {added} new and {updated} updated notes"
+                    + (f"; {skipped} already up to date." if skipped else "."))
+        self.sync_search_index()
+
+    def show_trace_stats(self):
+        if self.trace_dialog is None:
+            from trace_dialog import TraceStatsDialog
+            self.trace_dialog = TraceStatsDialog()
+        self.trace_dialog.show()
+        self.trace_dialog.raise_()
+
+    def show_memory_usage(self):
+        if self.memory_dialog is None:
+            from memory_dialog import MemoryDialog
+            self.memory_dialog = MemoryDialog(self)
+        self.memory_dialog.show()
+        self.memory_dialog.raise_()
+
+    def setup_hibernation(self):
+        self.hibernate_after = Config.get('hibernate_after_minutes') * 60
+        self.hibernate_timer = QTimer()
+        self.hibernate_timer.timeout.connect(self.hibernate_idle_notes)
+        if self.hibernate_after > 0:
+            self.hibernate_timer.start(60 * 1000)
+
+        self.memory_budget = MemoryBudget(Config.get('undo_budget_mb') * 1024 * 1024,
+                                          Config.get('image_budget_mb') * 1024 * 1024)
+        self.memory_timer = QTimer()
+        self.memory_timer.timeout.connect(self.enforce_memory_budget)
+        self.memory_timer.start(self.MEMORY_CHECK_MS)
+
+    def enforce_memory_budget(self):
+        """Clear old undo history and hibernate image-heavy notes once over budget."""
+        with tracer.span("FloatNoteApp.enforce_memory_budget"):
+            self.memory_budget.enforce(self.windows.values())
+
+    def hibernate_idle_notes(self):
+        """Tear down editors of notes that are hidden or have not had focus for a while."""
+        now = time.monotonic()
+        for window in self.windows.values():
+            if window.hibernated or window.isActiveWindow():
+                continue
+            hidden = not window.isVisible() or window.isMinimized()
+            if hidden or now - window.last_active >= self.hibernate_after:
+                window.hibernate()
+
+    def update_memory_action(self):
+        summary = summarize(self.windows.values())
+        self.memory_action.setText(
+            f"Memory: ~{summary.footprint / (1024 * 1024):.1f} MB in {summary.windows} notes "
+            f"(undo {summary.undo_bytes / (1024 * 1024):.1f} MB, "
+            f"images {summary.image_bytes / (1024 * 1024):.1f} MB)")
+        hibernated = [w for w in self.windows.values() if w.hibernated]
+        reclaimed = sum(w.reclaimed_bytes for w in hibernated)
+        self.hibernated_action.setText(
+            f"Hibernated: {len(hibernated)} notes, ~{reclaimed / (1024 * 1024):.1f} MB reclaimed")
+
+    def populate_open_note_menu(self):
+        """List dormant notes; built on demand so a large store costs nothing until opened."""
+        self.open_note_menu.clear()
+        if not self.dormant:
+            self.open_note_menu.addAction("No hidden notes").setEnabled(False)
+            return
+        for note_id, meta in list(self.dormant.items())[:self.OPEN_MENU_LIMIT]:
+            # Titles of old notes are filled in after they went dormant.
+            meta = self.storage.get_metadata(note_id) or meta
+            action = self.open_note_menu.addAction(meta.get('title') or "Untitled note")
+            action.triggered.connect(lambda checked=False, note_id=note_id: self.open_note(note_id))
+
+    @traced("FloatNoteApp.load_existing_notes")
     def load_existing_notes(self):
-        notes_data = self.storage.load_notes()
-        for note in notes_data:
+        """
+        Restore pinned or on-screen notes, at most restore_window_cap of them.
+
+        Pinned notes get their windows now. The ids of the other notes to
+        restore are returned for restore_note() to build one per idle turn;
+        until then they, like everything else, stay a metadata record in
+        self.dormant and can be opened from the tray.
+        """
+        cap = Config.get('restore_window_cap')
+        metas = self.storage.list_metadata()
+        self.startup.mark('storage_load')
+        metas.sort(key=lambda meta: not meta.get('pinned', False))
+        restore = []
+        for meta in metas:
+            if len(self.windows) + len(restore) < cap and (meta.get('pinned') or self.is_on_screen(meta)):
+                if meta.get('pinned'):
+                    # Metadata first; each body is only fetched as its window is built.
+                    self.create_note_window(self.storage.get_note(meta['id']))
+                    continue
+                restore.append(meta['id'])
+            self.dormant[meta['id']] = meta
+        return restore
+
+    def restore_note(self, note_id):
+        """Build the window of a note queued at startup, unless it was opened or removed since."""
+        if self.dormant.pop(note_id, None) is None:
+            return
+        note = self.storage.get_note(note_id)
+        if note is not None:
             self.create_note_window(note)
 
+    def is_on_screen(self, meta):
+        geometry = meta.get('geometry')
+        if not geometry:
+            return True
+        rect = QRect(*geometry)
+        return any(screen.availableGeometry().intersects(rect) for screen in self.app.screens())
+
+    def open_note(self, note_id):
+        """Show a note, building its window first if it is dormant."""
+        window = self.windows.get(note_id)
+        if window is None:
+            if self.dormant.pop(note_id, None) is None or self.storage.get_note(note_id) is None:
+                return None
+            self.create_note_window(self.storage.get_note(note_id))
+            window = self.windows[note_id]
+        window.wake()
+        window.show()
+        window.raise_()
+        window.activateWindow()
+        return window
+
     def create_new_note(self):
         self.create_note_window()
 
@@ -78,14 +503,19 @@ class FloatNoteApp:
         window = NoteWindow(note_data)
         window.closed.connect(self.on_note_closed)
         window.new_note.connect(self.create_new_note)
+        window.save_requested.connect(self.scheduler.mark_dirty)
         window.show()
         self.windows[window.note_id] = window
+        self.startup.watch(window)
 
     def on_note_closed(self, note_id):
         if note_id in self.windows:
-            # The window is already closed and deleted from storage by the window itself
-            # We just need to remove the reference
+            # The window is already closed; drop the reference and keep the
+            # note reachable from the tray if it is still stored.
             del self.windows[note_id]
+            note = self.storage.get_metadata(note_id)
+            if note is not None:
+                self.dormant[note_id] = {k: v for k, v in note.items() if k != 'content'}
 
     def show_all_notes(self):
         for window in self.windows.values():
@@ -93,13 +523,20 @@ class FloatNoteApp:
             window.raise_()
 
     def quit_app(self):
-        # Save all states one last time (though they auto-save)
-        for window in self.windows.values():
-            window.save_note()
+        if self.transfer is not None:
+            self.transfer.requestInterruption()
+            self.transfer.wait()
+        # Take in other instances' notes first, so their images are not collected.
+        self.reload_external_changes()
+        # Write whatever is still waiting in the scheduler before leaving
+        self.scheduler.flush()
+        self.storage.collect_blobs()
         self.app.quit()
 
     def run(self):
-        sys.exit(self.app.exec())
+        exit_code = self.app.exec()
+        self.storage.close()
+        sys.exit(exit_code)
 
 if __name__ == "__main__":
     controller = FloatNoteApp()
@@ -0,0 +1,148 @@
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+from PyQt6.QtCore import QObject
+
+
+class NoteMemory(NamedTuple):
+    """Estimated memory held by one note window, in bytes unless noted."""
+    note_id: str
+    title: str
+    chars: int
+    image_bytes: int
+    undo_steps: int
+    undo_bytes: int
+    footprint: int
+    hibernated: bool
+
+
+class MemorySummary(NamedTuple):
+    windows: int
+    hibernated: int
+    chars: int
+    # Images shared by several documents are counted once
+    image_bytes: int
+    undo_steps: int
+    undo_bytes: int
+    footprint: int
+
+
+class UndoMeter(QObject):
+    """
+    Estimate of what a QTextDocument's undo history holds.
+
+    Qt keeps the text of every edit in the document's piece table until the
+    undo stack is cleared, so the estimate is the characters inserted or
+    removed since then, as UTF-16, plus a fixed cost per undo step.
+    """
+    # QTextUndoCommand and its piece-table fragment
+    STEP_BYTES = 64
+
+    def __init__(self, document):
+        super().__init__(document)
+        self.document = document
+        self.chars = 0
+        document.contentsChange.connect(self._changed)
+        document.undoAvailable.connect(self._undo_available)
+
+    def _changed(self, position: int, removed: int, added: int):
+        # Loading a note disables undo or clears it first; those edits are not kept.
+        if self.document.isUndoRedoEnabled() and self.steps():
+            self.chars += removed + added
+
+    def _undo_available(self, available: bool):
+        if not available and not self.document.availableRedoSteps():
+            self.chars = 0
+
+    def steps(self) -> int:
+        return self.document.availableUndoSteps() + self.document.availableRedoSteps()
+
+    def estimate(self) -> int:
+        steps = self.steps()
+        return self.chars * 2 + steps * self.STEP_BYTES if steps else 0
+
+    def clear(self) -> int:
+        """Drop the undo and redo history; returns the estimated bytes freed."""
+        freed = self.estimate()
+        self.document.clearUndoRedoStacks()
+        self.chars = 0
+        return freed
+
+
+def summarize(windows: Iterable) -> MemorySummary:
+    """Totals over NoteWindows, counting each decoded image once."""
+    usages = []
+    images: Dict[int, int] = {}
+    for window in windows:
+        usages.append(window.memory_usage())
+        images.update(window.held_images())
+    image_bytes = sum(images.values())
+    return MemorySummary(
+        windows=len(usages),
+        hibernated=sum(usage.hibernated for usage in usages),
+        chars=sum(usage.chars for usage in usages),
+        image_bytes=image_bytes,
+        undo_steps=sum(usage.undo_steps for usage in usages),
+        undo_bytes=sum(usage.undo_bytes for usage in usages),
+        footprint=sum(usage.footprint - usage.image_bytes for usage in usages) + image_bytes,
+    )
+
+
+class MemoryBudget:
+    """
+    Keeps undo history and decoded images of all note windows within budget.
+
+    Over undo_budget bytes, the undo histories of the least recently used
+    windows are cleared until the total fits. QTextDocument keeps every image
+    it has shown, so over image_budget bytes the least recently used windows
+    holding images are hibernated instead. The active window is left alone.
+    """
+
+    def __init__(self, undo_budget: int, image_budget: int):
+        self.undo_budget = undo_budget
+        self.image_budget = image_budget
+        self.undo_trimmed = 0
+        self.hibernated = 0
+
+    def enforce(self, windows: Iterable) -> Tuple[int, int]:
+        """Returns how many windows had their undo history cleared and were hibernated."""
+        live = sorted((w for w in windows if not w.hibernated), key=lambda w: w.last_active)
+        candidates = [w for w in live if not w.isActiveWindow()]
+
+        trimmed = 0
+        undo_total = sum(w.undo_meter.estimate() for w in live)
+        if self.undo_budget > 0:
+            for window in candidates:
+                if undo_total <= self.undo_budget:
+                    break
+                if window.undo_meter.steps():
+                    undo_total -= window.undo_meter.clear()
+                    trimmed += 1
+
+        hibernated = 0
+        if self.image_budget > 0:
+            images: Dict[int, int] = {}
+            holders: Dict[int, int] = {}
+            for window in live:
+                for key, size in window.held_images().items():
+                    images[key] = size
+                    holders[key] = holders.get(key, 0) + 1
+            image_total = sum(images.values())
+            for window in candidates:
+                if image_total <= self.image_budget:
+                    break
+                held = window.held_images()
+                if not held:
+                    continue
+                window.hibernate()
+                if not window.hibernated:
+                    continue
+                hibernated += 1
+                for key in held:
+                    holders[key] -= 1
+                    # Still shown by another window: hibernating this one frees nothing.
+                    if not holders[key]:
+                        image_total -= images[key]
+
+        self.undo_trimmed += trimmed
+        self.hibernated += hibernated
+        return trimmed, hibernated
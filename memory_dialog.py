@@ -0,0 +1,80 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget,
+                             QTableWidgetItem, QPushButton, QLabel)
+from PyQt6.QtCore import Qt, QTimer
+
+from memory_accounting import summarize
+
+
+def format_bytes(size):
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    return f"{size / 1024:.0f} KB"
+
+
+class MemoryDialog(QDialog):
+    """Live per-note memory estimates, largest first, refreshed once a second."""
+    COLUMNS = ("Note", "Characters", "Images", "Undo steps", "Undo", "Footprint")
+
+    def __init__(self, controller, parent=None):
+        super().__init__(parent)
+        self.controller = controller
+        self.setWindowTitle("Memory Usage")
+        self.resize(620, 420)
+
+        layout = QVBoxLayout(self)
+        self.summary_label = QLabel()
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        trim_btn = QPushButton("Enforce Budgets")
+        trim_btn.clicked.connect(self.enforce)
+        buttons.addWidget(trim_btn)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        windows = list(self.controller.windows.values())
+        summary = summarize(windows)
+        budget = self.controller.memory_budget
+        self.summary_label.setText(
+            f"~{format_bytes(summary.footprint)} in {summary.windows} open notes "
+            f"({summary.hibernated} hibernated) · undo {format_bytes(summary.undo_bytes)} "
+            f"of {format_bytes(budget.undo_budget)} · images {format_bytes(summary.image_bytes)} "
+            f"of {format_bytes(budget.image_budget)} · undo histories cleared "
+            f"{budget.undo_trimmed}, notes hibernated {budget.hibernated}")
+        usages = sorted((w.memory_usage() for w in windows), key=lambda u: u.footprint, reverse=True)
+        self.table.setRowCount(len(usages))
+        for row, usage in enumerate(usages):
+            title = usage.title or "Untitled note"
+            cells = (title + (" (hibernated)" if usage.hibernated else ""), f"{usage.chars:,}",
+                     format_bytes(usage.image_bytes), str(usage.undo_steps),
+                     format_bytes(usage.undo_bytes), format_bytes(usage.footprint))
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.table.resizeColumnToContents(0)
+
+    def enforce(self):
+        self.controller.enforce_memory_budget()
+        self.refresh()
@@ -0,0 +1,405 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable
+
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QComboBox, QCheckBox,
+                             QListView, QLabel, QStyledItemDelegate, QStyle, QAbstractItemView)
+from PyQt6.QtCore import (Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel, QObject,
+                          QRunnable, QThreadPool, QSize, QRect, QRectF, QTimer, pyqtSignal)
+from PyQt6.QtGui import QImage, QPainter, QColor, QFont, QPen
+
+import content_format
+
+
+class _Task(QRunnable):
+    def __init__(self, fn: Callable[[], None]):
+        super().__init__()
+        self.fn = fn
+
+    def run(self):
+        self.fn()
+
+
+class ThumbnailCache(QObject):
+    """
+    Small previews of note bodies, rendered on a thread pool and cached on disk.
+
+    get() answers from an in-memory LRU of MEMORY_ITEMS images. A miss adds
+    the note to a small "wanted" set, newest first; once scrolling has settled
+    for SETTLE_MS, pool workers load ``<root>/<note id>.png`` or, if it was
+    rendered for an older revision, render and save a new one, then emit
+    ready(note_id). Rows scrolled past drop out of the set before any work is
+    done for them, and a stale image is returned meanwhile so rows never
+    flash empty.
+    """
+    ready = pyqtSignal(str)
+    _finished = pyqtSignal(str, str, QImage)
+    SIZE = QSize(96, 72)
+    MEMORY_ITEMS = 512
+    WANTED_MAX = 64
+    SETTLE_MS = 60
+    PREVIEW_CHARS = 400
+
+    def __init__(self, root: str, content_of: Callable[[str], str], parent=None):
+        super().__init__(parent)
+        self.root = root
+        # Called on pool threads; Storage.peek_content is safe there.
+        self.content_of = content_of
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self._images: "OrderedDict[str, tuple]" = OrderedDict()
+        # note id -> (key, colour), shared with the workers under _lock
+        self._wanted: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._rendering = set()
+        self._workers = 0
+        self._finished.connect(self._store)
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.timeout.connect(self._start_workers)
+
+    @staticmethod
+    def key(meta: Dict[str, Any]) -> str:
+        return f"{meta.get('rev', 0)}:{meta.get('modified')}:{meta.get('color')}"
+
+    def path(self, note_id: str) -> str:
+        return os.path.join(self.root, note_id + ".png")
+
+    def get(self, meta: Dict[str, Any]) -> Optional[QImage]:
+        note_id, key = meta['id'], self.key(meta)
+        entry = self._images.get(note_id)
+        if entry is not None:
+            self._images.move_to_end(note_id)
+            if entry[0] == key:
+                return entry[1]
+        with self._lock:
+            if note_id in self._rendering:
+                return entry[1] if entry is not None else None
+            self._wanted[note_id] = (key, meta.get('color') or "#FFF7D1")
+            self._wanted.move_to_end(note_id)
+            while len(self._wanted) > self.WANTED_MAX:
+                self._wanted.popitem(last=False)
+        self.settle_timer.start(self.SETTLE_MS)
+        return entry[1] if entry is not None else None
+
+    def _start_workers(self):
+        with self._lock:
+            count = min(len(self._wanted), self.pool.maxThreadCount() - self._workers)
+            self._workers += max(0, count)
+        for _ in range(count):
+            self.pool.start(_Task(self._drain))
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                if not self._wanted:
+                    self._workers -= 1
+                    return
+                # Newest first: the rows on screen now.
+                note_id, (key, color) = self._wanted.popitem(last=True)
+                self._rendering.add(note_id)
+            image = self._load(note_id, key, color)
+            with self._lock:
+                self._rendering.discard(note_id)
+            try:
+                self._finished.emit(note_id, key, image)
+            except RuntimeError:
+                # The dialog was destroyed while this was rendering.
+                return
+
+    def _load(self, note_id: str, key: str, color: str) -> QImage:
+        path = self.path(note_id)
+        image = QImage(path)
+        if image.isNull() or image.text("key") != key:
+            text = content_format.to_plain_text(self.content_of(note_id))
+            image = self.render(text[:self.PREVIEW_CHARS], color)
+            image.setText("key", key)
+            os.makedirs(self.root, exist_ok=True)
+            image.save(path, "PNG")
+        return image
+
+    @classmethod
+    def render(cls, text: str, color: str) -> QImage:
+        """Note-coloured card with the start of the text; safe off the GUI thread."""
+        image = QImage(cls.SIZE, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setBrush(QColor(color))
+        painter.setPen(QPen(QColor(0, 0, 0, 40)))
+        painter.drawRoundedRect(QRectF(0.5, 0.5, cls.SIZE.width() - 1, cls.SIZE.height() - 1), 6, 6)
+        font = QFont()
+        font.setPixelSize(8)
+        painter.setFont(font)
+        painter.setPen(QColor(0, 0, 0, 200))
+        painter.drawText(QRect(6, 5, cls.SIZE.width() - 12, cls.SIZE.height() - 10),
+                         Qt.TextFlag.TextWordWrap, " ".join(text.split()))
+        painter.end()
+        return image
+
+    def _store(self, note_id: str, key: str, image: QImage):
+        self._images[note_id] = (key, image)
+        self._images.move_to_end(note_id)
+        while len(self._images) > self.MEMORY_ITEMS:
+            self._images.popitem(last=False)
+        self.ready.emit(note_id)
+
+    def prune(self, live_ids):
+        """Delete cached previews of notes that no longer exist, on the pool."""
+        live = set(live_ids)
+
+        def remove_stale():
+            try:
+                names = os.listdir(self.root)
+            except FileNotFoundError:
+                return
+            for name in names:
+                if name.endswith(".png") and name[:-4] not in live:
+                    try:
+                        os.remove(os.path.join(self.root, name))
+                    except OSError:
+                        pass
+        self.pool.start(_Task(remove_stale))
+
+
+class NoteListModel(QAbstractListModel):
+    """
+    One row per stored note, built from Storage.list_metadata() alone.
+
+    Nothing per row is computed up front: the view asks for the visible rows
+    only, and thumbnails are fetched from ThumbnailCache as they are shown.
+    Sorting is done here on the metadata list, which is much cheaper than
+    letting a proxy compare rows through data().
+    """
+    IdRole = Qt.ItemDataRole.UserRole + 1
+    ColorRole = Qt.ItemDataRole.UserRole + 2
+    ModifiedRole = Qt.ItemDataRole.UserRole + 3
+    PinnedRole = Qt.ItemDataRole.UserRole + 4
+    # name -> (key function, descending)
+    SORT_KEYS = {
+        "modified": (lambda meta: meta.get('modified') or 0, True),
+        "title": (lambda meta: (meta.get('title') or "").casefold(), False),
+        "color": (lambda meta: meta.get('color') or "", False),
+        "pinned": (lambda meta: (bool(meta.get('pinned')), meta.get('modified') or 0), True),
+    }
+
+    def __init__(self, storage, thumbnails: ThumbnailCache, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        self.thumbnails = thumbnails
+        self.thumbnails.ready.connect(self.on_thumbnail_ready)
+        self.sort_key = "modified"
+        self._notes: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._notes)
+
+    def meta(self, row: int) -> Dict[str, Any]:
+        return self._notes[row]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        meta = self._notes[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole or role == Qt.ItemDataRole.ToolTipRole:
+            return meta.get('title') or "Untitled note"
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.thumbnails.get(meta)
+        if role == self.IdRole:
+            return meta['id']
+        if role == self.ColorRole:
+            return meta.get('color')
+        if role == self.ModifiedRole:
+            return meta.get('modified')
+        if role == self.PinnedRole:
+            return bool(meta.get('pinned'))
+        return None
+
+    def reload(self):
+        """Re-read metadata; rows are updated in place when the set of notes is unchanged."""
+        notes = self.storage.list_metadata()
+        if {meta['id'] for meta in notes} != set(self._rows):
+            self.beginResetModel()
+            self._notes = notes
+            self._apply_sort()
+            self.endResetModel()
+            return
+        by_id = {meta['id']: meta for meta in notes}
+        for row, old in enumerate(self._notes):
+            new = by_id[old['id']]
+            if new != old:
+                self._notes[row] = new
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+        self.sort_by(self.sort_key)
+
+    def sort_by(self, key: str):
+        """Reorder rows, keeping the selection and scroll anchors on the same notes."""
+        self.sort_key = key
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        ids = [self._notes[index.row()]['id'] for index in persistent]
+        self._apply_sort()
+        self.changePersistentIndexList(persistent, [self.index(self._rows[i]) for i in ids])
+        self.layoutChanged.emit()
+
+    def _apply_sort(self):
+        key, descending = self.SORT_KEYS[self.sort_key]
+        self._notes.sort(key=key, reverse=descending)
+        self._rows = {meta['id']: row for row, meta in enumerate(self._notes)}
+
+    def on_thumbnail_ready(self, note_id: str):
+        row = self._rows.get(note_id)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+
+class NoteFilterModel(QSortFilterProxyModel):
+    """Title substring and pinned-only filter; keeps the source model's order."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.text = ""
+        self.pinned_only = False
+
+    def set_filter(self, text: str, pinned_only: bool):
+        self.text = text.casefold().strip()
+        self.pinned_only = pinned_only
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        meta = self.sourceModel().meta(source_row)
+        if self.pinned_only and not meta.get('pinned'):
+            return False
+        return not self.text or self.text in (meta.get('title') or "").casefold()
+
+
+class NoteItemDelegate(QStyledItemDelegate):
+    """Thumbnail (or a colour swatch until it is ready), title, modified time and pin."""
+    ROW_HEIGHT = ThumbnailCache.SIZE.height() + 8
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        rect = option.rect
+        thumb = QRect(rect.left() + 4, rect.top() + 4, ThumbnailCache.SIZE.width(),
+                      ThumbnailCache.SIZE.height())
+        image = index.data(Qt.ItemDataRole.DecorationRole)
+        if isinstance(image, QImage) and not image.isNull():
+            painter.drawImage(thumb, image)
+        else:
+            painter.fillRect(thumb, QColor(index.data(NoteListModel.ColorRole) or "#FFF7D1"))
+        text_rect = rect.adjusted(thumb.width() + 14, 8, -8, -8)
+        font = QFont(option.font)
+        font.setBold(True)
+        painter.setFont(font)
+        title = index.data(Qt.ItemDataRole.DisplayRole)
+        if index.data(NoteListModel.PinnedRole):
+            title = "📌 " + title
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft,
+                         painter.fontMetrics().elidedText(title, Qt.TextElideMode.ElideRight,
+                                                          text_rect.width()))
+        painter.setFont(option.font)
+        modified = index.data(NoteListModel.ModifiedRole)
+        stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(modified)) if modified else "—"
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignBottom | Qt.AlignmentFlag.AlignLeft, stamp)
+        painter.restore()
+
+
+class NoteManagerDialog(QDialog):
+    """
+    Every stored note in one scrollable list; emits the id of the picked note.
+
+    The list is virtualized: only visible rows are painted and no NoteWindow
+    is built until a note is opened.
+    """
+    note_selected = pyqtSignal(str)
+    SORT_OPTIONS = (("Last modified", "modified"), ("Title", "title"),
+                    ("Colour", "color"), ("Pinned first", "pinned"))
+    # Coalesce refreshes while saves keep landing
+    REFRESH_DELAY_MS = 1000
+
+    def __init__(self, storage, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        self.setWindowTitle("All Notes")
+        self.resize(420, 560)
+
+        self.thumbnails = ThumbnailCache(
+            os.path.join(os.path.dirname(storage.FILE_PATH), "thumbnails"), storage.peek_content, self)
+        self.model = NoteListModel(storage, self.thumbnails, self)
+        self.proxy = NoteFilterModel(self)
+        self.proxy.setSourceModel(self.model)
+
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter by title…")
+        self.filter_edit.textChanged.connect(self.apply_filter)
+        controls.addWidget(self.filter_edit)
+        self.sort_combo = QComboBox()
+        for label, key in self.SORT_OPTIONS:
+            self.sort_combo.addItem(label, key)
+        self.sort_combo.currentIndexChanged.connect(
+            lambda: self.model.sort_by(self.sort_combo.currentData()))
+        controls.addWidget(self.sort_combo)
+        self.pinned_check = QCheckBox("Pinned")
+        self.pinned_check.toggled.connect(self.apply_filter)
+        controls.addWidget(self.pinned_check)
+        layout.addLayout(controls)
+
+        self.view = QListView()
+        self.view.setModel(self.proxy)
+        self.view.setItemDelegate(NoteItemDelegate(self.view))
+        # Every row is the same height, so the view never measures all 10,000.
+        self.view.setUniformItemSizes(True)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.view.activated.connect(self.pick_index)
+        layout.addWidget(self.view)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self._pruned = False
+
+    def refresh(self):
+        self.model.reload()
+        self.update_status()
+        if not self._pruned:
+            self._pruned = True
+            self.thumbnails.prune(self.model.data(self.model.index(row), NoteListModel.IdRole)
+                                  for row in range(self.model.rowCount()))
+
+    def schedule_refresh(self, *args):
+        """Refresh soon if visible, e.g. after a save was written."""
+        if self.isVisible():
+            self.refresh_timer.start(self.REFRESH_DELAY_MS)
+
+    def apply_filter(self):
+        self.proxy.set_filter(self.filter_edit.text(), self.pinned_check.isChecked())
+        self.update_status()
+
+    def update_status(self):
+        total = self.model.rowCount()
+        shown = self.proxy.rowCount()
+        self.status_label.setText(f"{total} notes" if shown == total else f"{shown} of {total} notes")
+
+    def pick_index(self, index):
+        self.note_selected.emit(index.data(NoteListModel.IdRole))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.filter_edit.setFocus()
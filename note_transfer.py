@@ -0,0 +1,295 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from blob_store import BlobStore
+import content_format
+
+
+class ArchiveError(ValueError):
+    """The file is not a note export this version can read."""
+
+
+FORMAT = "floatnote-export"
+VERSION = 1
+MANIFEST = "manifest.jsonl"
+EXTENSIONS = {'markdown': ".md", 'html': ".html"}
+# Manifest fields that describe the archive entry, not the note
+ENTRY_KEYS = ('file',)
+_UNSAFE = re.compile(r"[^\w\- ]+")
+# Note ids name files in the history and thumbnail directories
+_NOTE_ID = re.compile(r"[\w-]+")
+
+
+def _file_name(note: Dict[str, Any], extension: str) -> str:
+    title = _UNSAFE.sub("", note.get('title') or "").strip()[:40] or "note"
+    return f"notes/{title}-{note['id'][:8]}{extension}"
+
+
+def _image_url(name: str) -> str:
+    """Link from a file under notes/ to the image stored as blob:<hash>."""
+    return "../blobs/" + name.split(":", 1)[-1]
+
+
+def export_archive(notes: Iterable[Dict[str, Any]], path: str, blobs: BlobStore,
+                   fmt: str = "markdown") -> Iterator[int]:
+    """
+    Write notes to a zip at path, yielding the number exported after each one.
+
+    The archive holds one Markdown or HTML file per note, the images they
+    use under blobs/, and manifest.jsonl: a header line, then each stored
+    record (content included) with the file it was rendered to, which is
+    what import reads back. notes may be a generator; one note is in memory
+    at a time. Manifest lines are spooled to a temporary file, and the zip
+    is built as path + ".part" and renamed at the end, so an interrupted
+    export (close the generator) leaves nothing behind.
+    """
+    extension = EXTENSIONS[fmt]
+    partial = path + ".part"
+    written_blobs = set()
+    names = set()
+    count = 0
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as manifest:
+        try:
+            with zipfile.ZipFile(partial, "w", zipfile.ZIP_DEFLATED) as archive:
+                for note in notes:
+                    content = note.get('content', "")
+                    name = _file_name(note, extension)
+                    if name in names:
+                        name = f"{name[:-len(extension)]}-{note['id']}{extension}"
+                    names.add(name)
+                    if fmt == "html":
+                        body = content_format.to_portable_html(
+                            content, note.get('title', ""), _image_url)
+                    else:
+                        body = content_format.to_markdown(content, _image_url)
+                    archive.writestr(name, body)
+
+                    for digest in note.get('blobs') or BlobStore.references(content):
+                        source = blobs.path(digest)
+                        if digest not in written_blobs and os.path.exists(source):
+                            archive.write(source, f"blobs/{digest}")
+                            written_blobs.add(digest)
+                    manifest.write(json.dumps(dict(note, file=name), ensure_ascii=False) + "\n")
+                    count += 1
+                    yield count
+
+                manifest.seek(0)
+                with archive.open(MANIFEST, "w") as out:
+                    header = {'format': FORMAT, 'version': VERSION, 'notes': count,
+                              'content': fmt, 'exported': time.time()}
+                    out.write((json.dumps(header) + "\n").encode("utf-8"))
+                    for line in manifest:
+                        out.write(line.encode("utf-8"))
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+
+def _header(archive: zipfile.ZipFile) -> Dict[str, Any]:
+    try:
+        with archive.open(MANIFEST) as f:
+            header = json.loads(f.readline())
+    except (KeyError, ValueError) as e:
+        raise ArchiveError(f"no readable {MANIFEST}: {e}") from e
+    if header.get('format') != FORMAT or header.get('version', 0) > VERSION:
+        raise ArchiveError("not a note export, or from a newer version")
+    return header
+
+
+def archive_header(path: str) -> Dict[str, Any]:
+    """The manifest header: format, version, note count, content format."""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            return _header(archive)
+    except zipfile.BadZipFile as e:
+        raise ArchiveError(str(e)) from e
+
+
+def read_archive(path: str, blobs: BlobStore) -> Iterator[Dict[str, Any]]:
+    """
+    Notes of an export, one at a time, streamed from its manifest.
+
+    A note id seen earlier in the archive is skipped. Images the notes
+    reference are copied into blobs as they come. A manifest line without
+    content (e.g. written by hand) takes it from its rendered file. A record
+    that is not an object, whose id could not name a file, or with a field
+    of the wrong type raises ArchiveError. 'blobs' is recomputed from the
+    content.
+    """
+    seen = set()
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise ArchiveError(str(e)) from e
+    with archive:
+        _header(archive)
+        with archive.open(MANIFEST) as f:
+            f.readline()
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ArchiveError(f"{MANIFEST}: note record is not an object")
+                note_id = record.get('id')
+                if not note_id or note_id in seen:
+                    continue
+                if not isinstance(note_id, str) or not _NOTE_ID.fullmatch(note_id):
+                    raise ArchiveError(f"{MANIFEST}: invalid note id {note_id!r}")
+                _check_fields(record)
+                seen.add(note_id)
+                note = {k: v for k, v in record.items() if k not in ENTRY_KEYS}
+                if 'content' not in note:
+                    note['content'] = _rendered_content(archive, record.get('file'))
+                # The archive's list may not match the content; collect_blobs trusts it.
+                note['blobs'] = sorted(BlobStore.references(note['content']))
+                for digest in note['blobs']:
+                    _import_blob(archive, blobs, digest)
+                yield note
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# Optional note fields and the check their value must pass
+_FIELD_CHECKS = {
+    'content': lambda value: isinstance(value, str),
+    'title': lambda value: isinstance(value, str),
+    'color': lambda value: isinstance(value, str),
+    'modified': _is_number,
+    'pinned': lambda value: isinstance(value, bool),
+    'geometry': lambda value: isinstance(value, list) and len(value) == 4 and all(
+        isinstance(v, int) and not isinstance(v, bool) for v in value),
+}
+
+
+def _check_fields(record: Dict[str, Any]):
+    for key, valid in _FIELD_CHECKS.items():
+        if record.get(key) is not None and not valid(record[key]):
+            raise ArchiveError(f"{MANIFEST}: invalid {key} {record[key]!r} in note {record['id']}")
+
+
+def _rendered_content(archive: zipfile.ZipFile, name: Optional[str]) -> str:
+    if not isinstance(name, str) or not name:
+        return ""
+    try:
+        text = archive.read(name).decode("utf-8")
+    except KeyError:
+        return ""
+    if name.endswith(".html"):
+        return content_format.from_html(text)
+    return content_format.from_plain_text(text)
+
+
+def _import_blob(archive: zipfile.ZipFile, blobs: BlobStore, digest: str):
+    if os.path.exists(blobs.path(digest)):
+        return
+    try:
+        with archive.open(f"blobs/{digest}") as source:
+            data = source.read()
+    except KeyError:
+        return
+    # put() names the file by its hash, so a damaged entry cannot take a valid name.
+    blobs.put(data)
+
+
+class ExportWorker(QThread):
+    """Runs export_archive() off the GUI thread over a snapshot of the store."""
+    progress = pyqtSignal(int, int)
+    done = pyqtSignal(int)
+    failed = pyqtSignal(str)
+    # Minimum seconds between progress signals
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, storage, path, fmt="markdown", parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        self.path = path
+        self.fmt = fmt
+        # Taken on the GUI thread; edits made during the export are not included.
+        self.notes = storage.snapshot()
+
+    def run(self):
+        total = len(self.notes)
+        exported = 0
+        last = 0.0
+        steps = export_archive(self.storage.iter_notes(self.notes), self.path,
+                               self.storage.blobs, self.fmt)
+        try:
+            for exported in steps:
+                if self.isInterruptionRequested():
+                    steps.close()
+                    return
+                now = time.monotonic()
+                if now - last >= self.PROGRESS_INTERVAL:
+                    self.progress.emit(exported, total)
+                    last = now
+        except (OSError, ValueError) as e:
+            self.failed.emit(str(e))
+            return
+        self.progress.emit(exported, total)
+        self.done.emit(exported)
+
+
+class ImportWorker(QThread):
+    """
+    Reads an export off the GUI thread and hands its notes over in batches.
+
+    Storage is only touched on the GUI thread: each batch_ready is applied
+    there, which must call batch_applied() before the next batch is read,
+    so at most one batch is in memory.
+    """
+    progress = pyqtSignal(int, int)
+    batch_ready = pyqtSignal(list)
+    done = pyqtSignal(int)
+    failed = pyqtSignal(str)
+    BATCH_NOTES = 200
+    BATCH_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, storage, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.blobs = storage.blobs
+        self._applied = threading.Semaphore(0)
+
+    def batch_applied(self):
+        self._applied.release()
+
+    def _hand_over(self, batch) -> bool:
+        self.batch_ready.emit(batch)
+        while not self._applied.acquire(timeout=0.1):
+            if self.isInterruptionRequested():
+                return False
+        return not self.isInterruptionRequested()
+
+    def run(self):
+        read = 0
+        try:
+            total = archive_header(self.path)['notes']
+            batch, size = [], 0
+            for note in read_archive(self.path, self.blobs):
+                batch.append(note)
+                size += len(note['content'])
+                read += 1
+                if len(batch) >= self.BATCH_NOTES or size >= self.BATCH_BYTES:
+                    if not self._hand_over(batch):
+                        return
+                    self.progress.emit(read, total)
+                    batch, size = [], 0
+            if batch and not self._hand_over(batch):
+                return
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            self.failed.emit(str(e))
+            return
+        self.progress.emit(read, total)
+        self.done.emit(read)
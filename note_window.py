@@ -1,13 +1,23 @@
+import time
 import uuid
+import zlib
+from collections import OrderedDict
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QTextEdit, QPushButton, QFrame, QMenu,
+                             QTextEdit, QPlainTextEdit, QPushButton, QFrame, QMenu, QLabel,
                              QApplication, QInputDialog)
-from PyQt6.QtCore import Qt, pyqtSignal, QTimer
+from PyQt6.QtCore import (Qt, pyqtSignal, QTimer, QBuffer, QByteArray, QIODevice,
+                          QEvent)
 from PyQt6.QtGui import (QAction, QFont, QTextCharFormat, QColor, QCursor,
-                         QTextListFormat, QKeyEvent, QPainter, QPen)
+                         QTextListFormat, QKeyEvent, QPainter, QPen, QImage,
+                         QTextDocument, QTextImageFormat, QTextCursor)
 
-from styles import Styles, Colors
+from styles import Styles, Colors, set_style_property
 from storage import Storage
+from blob_store import BlobStore
+import content_format
+from memory_accounting import NoteMemory, UndoMeter
+from config import Config
+from tracing import tracer, traced
 
 
 class ResizeGrip(QWidget):
@@ -47,8 +57,118 @@ class ResizeGrip(QWidget):
         self.parent_window.schedule_save()
 
 
-class NoteEditor(QTextEdit):
-    """Custom editor that removes link formatting on Enter."""
+class ImageCache:
+    """Byte-bounded LRU of decoded images, shared by every editor."""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._images = OrderedDict()
+
+    def get(self, key):
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        old = self._images.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old.sizeInBytes()
+        self._images[key] = image
+        self.total_bytes += image.sizeInBytes()
+        while self.total_bytes > self.max_bytes and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self.total_bytes -= evicted.sizeInBytes()
+
+
+class EditorBehavior:
+    """
+    What NoteEditor and LargeNoteEditor share.
+
+    Pasted images go to the blob store and are referenced as blob:<hash>;
+    loadResource() decodes them on demand through the shared ImageCache.
+    The document keeps every image it was given; loaded_images mirrors that
+    for memory accounting.
+    Pastes of large_paste_chars or more are converted with
+    content_format.from_html() instead of Qt's rich-text importer; smaller
+    HTML pastes go through the importer with block margins and indents reset.
+    """
+    image_cache = ImageCache(Config.get('image_cache_mb') * 1024 * 1024)
+    LARGE_PASTE_CHARS = Config.get('large_paste_chars')
+    # Set by LargeNoteEditor
+    large = False
+
+    def canInsertFromMimeData(self, source):
+        if self.blobs is not None and source.hasImage():
+            return True
+        return super().canInsertFromMimeData(source)
+
+    def insertFromMimeData(self, source):
+        if self.blobs is not None and source.hasImage():
+            self.insert_image(QImage(source.imageData()))
+        elif source.hasHtml() and (self.large or len(source.html()) >= self.LARGE_PASTE_CHARS):
+            # Images are dropped with the rest of the page's markup.
+            html = source.html()
+            with tracer.span("NoteEditor.paste_html", bytes=len(html)):
+                self.paste_content(content_format.from_html(html), len(html))
+        elif source.hasText() and len(source.text()) >= self.LARGE_PASTE_CHARS:
+            text = source.text()
+            self.paste_content(content_format.from_plain_text(text), len(text))
+        elif source.hasHtml():
+            self.paste_html(source)
+        else:
+            super().insertFromMimeData(source)
+
+    def paste_html(self, source):
+        """Paste through Qt's importer, minus the block spacing notes cannot store."""
+        cursor = self.textCursor()
+        start = cursor.selectionStart()
+        # One undo step with the spacing cleanup
+        cursor.beginEditBlock()
+        if self.blobs is not None and "data:image/" in source.html():
+            self.insertHtml(self.blobs.externalize_data_uris(source.html()))
+        else:
+            super().insertFromMimeData(source)
+        content_format.clear_block_spacing(self.document(), start, self.textCursor().position())
+        cursor.endEditBlock()
+
+    def serialize(self):
+        return content_format.serialize(self.document())
+
+    def paste_content(self, content, size):
+        """Insert canonical content at the cursor as one undo step."""
+        content_format.insert(self.textCursor(), content)
+        self.ensureCursorVisible()
+
+    def insert_image(self, image):
+        if image.isNull():
+            return
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        image.save(buffer, "PNG")
+        buffer.close()
+        url = BlobStore.url(self.blobs.put(bytes(data)))
+        self.image_cache.put(url, image)
+        fmt = QTextImageFormat()
+        fmt.setName(url)
+        self.textCursor().insertImage(fmt)
+
+    def loadResource(self, resource_type, name):
+        if (resource_type == QTextDocument.ResourceType.ImageResource.value
+                and name.scheme() == BlobStore.SCHEME and self.blobs is not None):
+            url = name.toString()
+            image = self.image_cache.get(url)
+            if image is None:
+                data = self.blobs.get(name.path())
+                if data is None:
+                    return None
+                image = QImage.fromData(data)
+                self.image_cache.put(url, image)
+            self.loaded_images[url] = image
+            return image
+        return super().loadResource(resource_type, name)
+
     def keyPressEvent(self, event: QKeyEvent):
         if event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
             cursor = self.textCursor()
@@ -63,18 +183,80 @@ class NoteEditor(QTextEdit):
         super().keyPressEvent(event)
 
 
+class NoteEditor(EditorBehavior, QTextEdit):
+    """Custom editor that removes link formatting on Enter."""
+    # Emitted instead of pasting when the paste would make this a large document
+    outgrown = pyqtSignal(str)
+
+    def __init__(self, blobs=None, parent=None):
+        super().__init__(parent)
+        self.blobs = blobs
+        self.loaded_images = {}
+
+    def paste_content(self, content, size):
+        if (self.document().characterCount() + size >= LargeNoteEditor.LARGE_DOCUMENT_CHARS
+                and self.receivers(self.outgrown)):
+            self.outgrown.emit(content)
+            return
+        super().paste_content(content, size)
+
+
+class LargeNoteEditor(EditorBehavior, QPlainTextEdit):
+    """
+    Editor for notes of large_document_chars or more.
+
+    QPlainTextEdit lays out only the blocks around the viewport, so typing
+    stays cheap however long the note is. Character formats are drawn, and
+    lists and images are kept in the document (and saved) but shown flat.
+    Saves re-read only the blocks edited since the previous one.
+    """
+    LARGE_DOCUMENT_CHARS = Config.get('large_document_chars')
+    large = True
+
+    def __init__(self, blobs=None, parent=None):
+        super().__init__(parent)
+        self.blobs = blobs
+        self.loaded_images = {}
+        self.block_cache = content_format.BlockCache(self.document())
+
+    def serialize(self):
+        return self.block_cache.serialize()
+
+
 class NoteWindow(QMainWindow):
     closed = pyqtSignal(str)
     new_note = pyqtSignal()
-
+    save_requested = pyqtSignal(object)
+    STYLE_UPDATE_MS = 50
+    # Large documents: toolbar state lags the cursor more, and the search
+    # index, which re-tokenizes the whole note, waits for this long a pause.
+    LARGE_STYLE_UPDATE_MS = 300
+    LARGE_INDEX_DELAY_MS = 30000
+
+    @traced("NoteWindow.__init__")
     def __init__(self, note_data=None):
         super().__init__()
         self.storage = Storage()
         self.drag_pos = None
+        # True when the editor changed since self.content was last serialized
+        self.content_dirty = False
+        # Set once self.content came from this editor or its conversion failed;
+        # a legacy note is only converted on the first save after loading.
+        self._conversion_tried = False
+        # Hibernation: compressed content kept while the editor is torn down
+        self.hibernated = False
+        self.hibernated_content = None
+        self.reclaimed_bytes = 0
+        self.last_active = time.monotonic()
+        self.history_dialog = None
+        self.large_document = False
         
         if note_data:
             self.note_id = note_data.get('id')
             self.content = note_data.get('content', '')
+            if not content_format.is_canonical(self.content):
+                # Older notes may carry base64 images inline; move them to the blob store.
+                self.content = self.storage.blobs.externalize_data_uris(self.content)
             self.bg_color = note_data.get('color', Colors.PASTEL_YELLOW)
             self.is_pinned = note_data.get('pinned', False)
             rect = note_data.get('geometry')
@@ -89,19 +271,28 @@ class NoteWindow(QMainWindow):
             self.is_pinned = False
             self.resize(300, 350)
 
+        self.blob_refs = sorted(BlobStore.references(self.content))
+        self.title = note_data.get('title') if note_data else ''
+        if self.title is None:
+            # Saved before titles were stored
+            self.title = content_format.title_from_text(content_format.to_plain_text(self.content))
+        self.modified = note_data.get('modified') if note_data else None
+        # Bumped whenever the content is re-serialized; other instances diff on it.
+        self.revision = note_data.get('rev', 0) if note_data else 0
+        # Revision last handed to storage; a newer one is a user edit for the history.
+        self.saved_revision = self.revision
         self.setup_ui()
         self.apply_styles()
         
-        # Auto-save timer
-        self.save_timer = QTimer()
-        self.save_timer.setSingleShot(True)
-        self.save_timer.timeout.connect(self.auto_save)
-
         # Style update timer
         self.style_update_timer = QTimer()
         self.style_update_timer.setSingleShot(True)
         self.style_update_timer.timeout.connect(self.update_style_buttons)
 
+        self.index_timer = QTimer()
+        self.index_timer.setSingleShot(True)
+        self.index_timer.timeout.connect(self.update_index)
+
     def setup_ui(self):
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint)
         if self.is_pinned:
@@ -109,6 +300,7 @@ class NoteWindow(QMainWindow):
             
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setMinimumSize(200, 150)
+        Styles.ensure_installed()
 
         self.central_widget = QWidget()
         self.central_widget.setObjectName("centralWidget")
@@ -120,6 +312,7 @@ class NoteWindow(QMainWindow):
 
         # Toolbar
         self.toolbar = QFrame()
+        self.toolbar.setObjectName("noteToolbar")
         self.toolbar.setFixedHeight(40)
         self.toolbar_layout = QHBoxLayout(self.toolbar)
         self.toolbar_layout.setContentsMargins(8, 0, 8, 0)
@@ -140,15 +333,18 @@ class NoteWindow(QMainWindow):
         self.heading_btn = self.add_toolbar_button("H", self.toggle_heading, "Heading")
         self.list_btn = self.add_toolbar_button("•", self.toggle_list, "Bullet List")
         self.add_separator()
-        self.add_toolbar_button("🔗", self.insert_link, "Insert Link")
+        self.link_btn = self.add_toolbar_button("🔗", self.insert_link, "Insert Link")
         self.add_separator()
         self.add_toolbar_button("🎨", self.change_color, "Change Color")
         
         self.pin_btn = self.add_toolbar_button("📌", self.toggle_pin, "Pin/Unpin")
+        self.pin_btn.setObjectName("pinButton")
         self.update_pin_style()
 
         self.toolbar_layout.addStretch()
         
+        self.add_toolbar_button("🕘", self.show_history, "History…")
+
         # Clear button
         self.add_toolbar_button("🗑", self.clear_note, "Clear")
         
@@ -157,17 +353,60 @@ class NoteWindow(QMainWindow):
         self.layout.addWidget(self.toolbar)
 
         # Editor
-        self.editor = NoteEditor()
-        self.editor.setHtml(self.content)
-        self.editor.textChanged.connect(self.on_text_changed)
-        self.editor.cursorPositionChanged.connect(self.schedule_style_update)
-        self.editor.setAcceptRichText(True)
-        self.layout.addWidget(self.editor)
+        self.placeholder = None
+        self.create_editor()
 
         # Resize grip
         self.resize_grip = ResizeGrip(self)
         self.position_resize_grip()
 
+    def create_editor(self, large=None):
+        self.large_document = self.wants_large_editor(len(self.content)) if large is None else large
+        if self.large_document:
+            self.editor = LargeNoteEditor(self.storage.blobs)
+        else:
+            self.editor = NoteEditor(self.storage.blobs)
+            self.editor.setAcceptRichText(True)
+            self.editor.outgrown.connect(self.paste_into_large_editor)
+        self.editor.setObjectName("noteEditor")
+        with tracer.span("NoteWindow.load_content", bytes=len(self.content)):
+            content_format.load_into(self.editor.document(), self.content)
+        self.editor.moveCursor(QTextCursor.MoveOperation.Start)
+        self.editor.textChanged.connect(self.on_text_changed)
+        self.editor.cursorPositionChanged.connect(self.schedule_style_update)
+        self.undo_meter = UndoMeter(self.editor.document())
+        self.layout.addWidget(self.editor)
+
+    def wants_large_editor(self, size):
+        """
+        Whether content of size characters belongs in a LargeNoteEditor.
+
+        A note already in one keeps it until it shrinks to half the threshold,
+        so editing around the limit does not swap editors back and forth.
+        """
+        threshold = LargeNoteEditor.LARGE_DOCUMENT_CHARS
+        return size >= (threshold // 2 if self.large_document else threshold)
+
+    def rebuild_editor(self, large=None):
+        """Recreate the editor from self.content, keeping the cursor; the undo stack is lost."""
+        position = self.editor.textCursor().position()
+        self.style_update_timer.stop()
+        self.layout.removeWidget(self.editor)
+        self.editor.deleteLater()
+        self.create_editor(large)
+        cursor = self.editor.textCursor()
+        cursor.setPosition(min(position, self.editor.document().characterCount() - 1))
+        self.editor.setTextCursor(cursor)
+        self.editor.setFocus()
+        self.resize_grip.raise_()
+
+    @traced("NoteWindow.paste_into_large_editor")
+    def paste_into_large_editor(self, content):
+        """Switch to a LargeNoteEditor, then paste, when a paste would cross the threshold."""
+        self.content = self.serialize_content()
+        self.rebuild_editor(large=True)
+        self.editor.paste_content(content, len(content))
+
     def position_resize_grip(self):
         self.resize_grip.move(
             self.width() - self.resize_grip.width(),
@@ -175,12 +414,14 @@ class NoteWindow(QMainWindow):
         )
 
     def resizeEvent(self, event):
+        tracer.count(self.trace_scope, "resize_events")
         self.position_resize_grip()
         self.schedule_save()
         super().resizeEvent(event)
 
     def add_toolbar_button(self, text, callback, tooltip=""):
         btn = QPushButton(text)
+        btn.setProperty("active", False)
         btn.setFixedSize(28, 28)
         btn.clicked.connect(callback)
         btn.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -191,30 +432,33 @@ class NoteWindow(QMainWindow):
 
     def add_separator(self):
         sep = QFrame()
+        sep.setObjectName("toolbarSeparator")
         sep.setFixedSize(1, 20)
-        sep.setStyleSheet("background-color: rgba(0,0,0,0.1);")
         self.toolbar_layout.addWidget(sep)
 
+    @traced("NoteWindow.apply_styles")
     def apply_styles(self):
-        self.central_widget.setStyleSheet(f"""
-            QWidget#centralWidget {{
-                background-color: {self.bg_color};
-                border-radius: 10px;
-                border: 1px solid {Colors.BORDER};
-            }}
-        """)
-        self.toolbar.setStyleSheet(Styles.TOOLBAR.format(
-            toolbar_bg=Colors.TOOLBAR_BG
-        ))
-        self.editor.setStyleSheet(Styles.EDITOR.format(
-            text_color=Colors.TEXT_DARK
-        ) + Styles.SCROLLBAR)
+        """Reflect bg_color through the noteColor property of the shared stylesheet."""
+        name = Colors.NOTE_COLOR_NAMES.get(self.bg_color)
+        if name is not None:
+            if self.central_widget.styleSheet():
+                self.central_widget.setStyleSheet("")
+            set_style_property(self.central_widget, "noteColor", name)
+        else:
+            # Colour outside the palette: fall back to a widget stylesheet.
+            self.central_widget.setStyleSheet(Styles.NOTE_WINDOW.format(
+                bg_color=self.bg_color, border_color=Colors.BORDER))
 
     # Style updates
     def schedule_style_update(self):
-        self.style_update_timer.start(50)
+        self.style_update_timer.start(self.LARGE_STYLE_UPDATE_MS if self.large_document
+                                      else self.STYLE_UPDATE_MS)
 
+    @traced("NoteWindow.update_style_buttons")
     def update_style_buttons(self):
+        if self.hibernated:
+            return
+        tracer.count(self.trace_scope, "style_updates")
         cursor = self.editor.textCursor()
         fmt = cursor.charFormat()
         
@@ -235,10 +479,8 @@ class NoteWindow(QMainWindow):
         self._set_button_active(self.list_btn, is_list)
 
     def _set_button_active(self, btn, active):
-        if active:
-            btn.setStyleSheet("background-color: rgba(0,0,0,0.25); border-radius: 4px; font-weight: bold;")
-        else:
-            btn.setStyleSheet("")
+        # Re-polishes only when the state actually flips.
+        set_style_property(btn, "active", bool(active))
 
     # Window Dragging
     def toolbar_mouse_press(self, event):
@@ -308,10 +550,11 @@ class NoteWindow(QMainWindow):
         current_list = cursor.currentList()
         
         if current_list:
+            # remove() leaves the list's indent on the block; clear it afterwards.
+            current_list.remove(cursor.block())
             block_fmt = cursor.blockFormat()
             block_fmt.setIndent(0)
             cursor.setBlockFormat(block_fmt)
-            current_list.remove(cursor.block())
         else:
             list_fmt = QTextListFormat()
             list_fmt.setStyle(QTextListFormat.Style.ListDisc)
@@ -341,21 +584,7 @@ class NoteWindow(QMainWindow):
 
     def change_color(self):
         menu = QMenu(self)
-        menu.setStyleSheet("""
-            QMenu {
-                background-color: white;
-                border: 1px solid #ccc;
-                border-radius: 4px;
-                padding: 4px;
-            }
-            QMenu::item {
-                padding: 8px 16px;
-                border-radius: 4px;
-            }
-            QMenu::item:selected {
-                background-color: rgba(0,0,0,0.1);
-            }
-        """)
+        menu.setObjectName("colorMenu")
         
         color_map = {
             "Yellow": Colors.PASTEL_YELLOW,
@@ -384,27 +613,59 @@ class NoteWindow(QMainWindow):
         self.schedule_save()
 
     def toggle_pin(self):
-        self.is_pinned = not self.is_pinned
+        self.set_pinned(not self.is_pinned)
+        self.show()
+        self.schedule_save()
+
+    def set_pinned(self, pinned):
+        visible = self.isVisible()
+        self.is_pinned = pinned
         flags = Qt.WindowType.FramelessWindowHint
         if self.is_pinned:
             flags |= Qt.WindowType.WindowStaysOnTopHint
+        # Changing flags hides the window.
         self.setWindowFlags(flags)
-        self.show()
+        if visible:
+            self.show()
         self.update_pin_style()
-        self.schedule_save()
 
     def update_pin_style(self):
-        if self.is_pinned:
-            self.pin_btn.setStyleSheet("background-color: rgba(0,0,0,0.25); border-radius: 4px;")
-        else:
-            self.pin_btn.setStyleSheet("")
+        set_style_property(self.pin_btn, "active", self.is_pinned)
 
     def clear_note(self):
-        """Clear content and delete from storage."""
+        """Clear content and delete from storage; the last text stays in the note's history."""
+        self.wake()
+        if self.has_content():
+            self.storage.history.record(self.note_id, self.serialize_content(), self.revision, force=True)
         self.editor.clear()
         self.content = ""
         self.storage.delete_note(self.note_id)
 
+    def show_history(self):
+        if self.history_dialog is None:
+            from history_dialog import HistoryDialog
+            self.history_dialog = HistoryDialog(self.storage.history, self.note_id,
+                                                NoteEditor(self.storage.blobs))
+            self.history_dialog.restore_requested.connect(self.restore_revision)
+        else:
+            self.history_dialog.refresh()
+        self.history_dialog.show()
+        self.history_dialog.raise_()
+
+    def restore_revision(self, content):
+        """Replace the document with a stored revision; the text it replaces is recorded first."""
+        self.wake()
+        if self.has_content():
+            self.storage.history.record(self.note_id, self.serialize_content(), self.revision, force=True)
+        if self.wants_large_editor(len(content)) != self.large_document:
+            self.content = content
+            self.rebuild_editor()
+            self.on_text_changed()
+        else:
+            # Loading emits textChanged, which saves the restored text as a new revision.
+            content_format.load_into(self.editor.document(), content)
+        self.editor.moveCursor(QTextCursor.MoveOperation.Start)
+
     def close_note(self):
         self.close()
         self.closed.emit(self.note_id)
@@ -412,40 +673,235 @@ class NoteWindow(QMainWindow):
     # Persistence
     def has_content(self):
         """Check if editor has real content (not just empty HTML)."""
-        plain_text = self.editor.toPlainText().strip()
-        return len(plain_text) > 0
+        if self.hibernated:
+            # Only notes that had content are hibernated.
+            return True
+        doc = self.editor.document()
+        if doc.isEmpty():
+            return False
+        # Stop at the first non-blank block instead of building the whole text.
+        block = doc.begin()
+        while block.isValid():
+            if block.text().strip():
+                return True
+            block = block.next()
+        return False
 
     def on_text_changed(self):
-        self.content = self.editor.toHtml()
+        # Serialization is deferred to the coalesced save.
+        self.content_dirty = True
         self.schedule_save()
 
+    def serialize_content(self):
+        """Refresh self.content from the editor if it changed since the last save."""
+        if self.hibernated:
+            return zlib.decompress(self.hibernated_content).decode('utf-8')
+        if not self.content_dirty and not self._conversion_tried \
+                and self.content and not content_format.is_canonical(self.content):
+            # Legacy HTML note: convert on its next save without touching 'modified',
+            # unless it uses formatting only HTML can hold.
+            converted = self.editor.serialize()
+            if content_format.is_canonical(converted):
+                self.content = converted
+        self._conversion_tried = True
+        if self.content_dirty:
+            with tracer.span("NoteWindow.serialize"):
+                self.content = self.editor.serialize()
+            self.blob_refs = sorted(BlobStore.references(self.content))
+            self.title = self.title_from_document()
+            self.modified = time.time()
+            self.revision += 1
+            if self.large_document:
+                # Re-tokenizing megabytes per save would stall typing; wait for a pause.
+                self.index_timer.start(self.LARGE_INDEX_DELAY_MS)
+            else:
+                self.update_index()
+            self.content_dirty = False
+        return self.content
+
+    def update_index(self):
+        if self.storage.get_metadata(self.note_id) is None and not self.content_dirty:
+            # A deferred update for a note deleted since it was scheduled
+            return
+        if self.hibernated:
+            text = content_format.to_plain_text(self.serialize_content())
+        else:
+            text = self.editor.toPlainText()
+        self.storage.index.update(self.note_id, text, self.modified)
+
+    def apply_external(self, note_data, content_changed):
+        """
+        Take over this note as another instance stored it, without saving it back.
+
+        The document is only reloaded when content_changed; otherwise just the
+        layout fields are applied.
+        """
+        if content_changed:
+            content = note_data.get('content', '')
+            if self.hibernated:
+                self.hibernated_content = zlib.compress(content.encode('utf-8'))
+            elif self.wants_large_editor(len(content)) != self.large_document:
+                self.content = content
+                self.rebuild_editor()
+            else:
+                position = self.editor.textCursor().position()
+                self.editor.blockSignals(True)
+                content_format.load_into(self.editor.document(), content)
+                self.editor.blockSignals(False)
+                cursor = self.editor.textCursor()
+                cursor.setPosition(min(position, self.editor.document().characterCount() - 1))
+                self.editor.setTextCursor(cursor)
+                self.content = content
+            self.content_dirty = False
+            self._conversion_tried = False
+            self.blob_refs = sorted(note_data.get('blobs') or BlobStore.references(content))
+            self.title = note_data.get('title')
+            if self.title is None:
+                self.title = content_format.title_from_text(content_format.to_plain_text(content))
+            self.modified = note_data.get('modified')
+            self.revision = note_data.get('rev', 0)
+            self.saved_revision = self.revision
+        color = note_data.get('color', self.bg_color)
+        if color != self.bg_color:
+            self.bg_color = color
+            self.apply_styles()
+        pinned = note_data.get('pinned', False)
+        if pinned != self.is_pinned:
+            self.set_pinned(pinned)
+        rect = note_data.get('geometry')
+        if rect and list(rect) != [self.x(), self.y(), self.width(), self.height()]:
+            self.setGeometry(*rect)
+
+    def title_from_document(self, max_length=60):
+        """First non-blank line, used to list the note without loading its body."""
+        block = self.editor.document().begin()
+        while block.isValid():
+            text = block.text().strip()
+            if text:
+                return text[:max_length]
+            block = block.next()
+        return ''
+
     def schedule_save(self):
-        self.save_timer.stop()
-        self.save_timer.start(500)
+        """Ask the application's save scheduler to persist this note soon."""
+        self.save_requested.emit(self)
 
     def auto_save(self):
-        """Auto-save only if there's content."""
+        """Stage this note in storage only if there's content; the caller flushes."""
         if self.has_content():
             self._do_save()
         else:
             # No content - remove from storage
-            self.storage.delete_note(self.note_id)
+            self.storage.remove_note(self.note_id)
+
+    # Memory accounting and hibernation
+    def held_images(self):
+        """Decoded images the document holds, as QImage.cacheKey() -> bytes."""
+        if self.hibernated:
+            return {}
+        return {image.cacheKey(): image.sizeInBytes() for image in self.editor.loaded_images.values()}
+
+    def memory_usage(self):
+        if self.hibernated:
+            return NoteMemory(self.note_id, self.title, 0, 0, 0, 0,
+                              len(self.hibernated_content), True)
+        image_bytes = sum(self.held_images().values())
+        return NoteMemory(self.note_id, self.title, self.editor.document().characterCount(),
+                          image_bytes, self.undo_meter.steps(), self.undo_meter.estimate(),
+                          self.estimate_footprint(), False)
+
+    def estimate_footprint(self):
+        """Rough bytes held by the live editor: text, layout, decoded images and undo history."""
+        if self.hibernated:
+            return 0
+        # UTF-16 text plus per-character format and layout overhead
+        total = self.editor.document().characterCount() * 2 * 4
+        return total + sum(self.held_images().values()) + self.undo_meter.estimate()
+
+    def hibernate(self):
+        """Compress the document and tear down the editor until the note is used again."""
+        if self.hibernated or not self.has_content():
+            return 0
+        content = self.serialize_content()
+        footprint = self.estimate_footprint()
+        self.hibernated_content = zlib.compress(content.encode('utf-8'))
+        self.content = ""
+        self.reclaimed_bytes = max(0, footprint - len(self.hibernated_content))
+        self.hibernated_cursor = self.editor.textCursor().position()
+        self.hibernated_scroll = self.editor.verticalScrollBar().value()
+
+        self.style_update_timer.stop()
+        self.layout.removeWidget(self.editor)
+        self.editor.deleteLater()
+        self.editor = None
+        self.undo_meter = None
+        self.hibernated = True
+
+        self.placeholder = QLabel(self.title or "…")
+        self.placeholder.setWordWrap(True)
+        self.placeholder.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
+        self.placeholder.setContentsMargins(12, 12, 12, 12)
+        self.placeholder.mousePressEvent = lambda event: self.wake()
+        self.layout.addWidget(self.placeholder)
+        for btn in self.format_buttons():
+            btn.setEnabled(False)
+        return self.reclaimed_bytes
+
+    def wake(self):
+        """Rebuild the editor from the compressed document."""
+        if not self.hibernated:
+            return
+        self.content = zlib.decompress(self.hibernated_content).decode('utf-8')
+        self.hibernated_content = None
+        self.hibernated = False
+        self.reclaimed_bytes = 0
+
+        self.layout.removeWidget(self.placeholder)
+        self.placeholder.deleteLater()
+        self.placeholder = None
+        self.create_editor()
+        cursor = self.editor.textCursor()
+        cursor.setPosition(min(self.hibernated_cursor, self.editor.document().characterCount() - 1))
+        self.editor.setTextCursor(cursor)
+        self.editor.verticalScrollBar().setValue(self.hibernated_scroll)
+        for btn in self.format_buttons():
+            btn.setEnabled(True)
+        self.resize_grip.raise_()
+        self.touch()
+
+    def format_buttons(self):
+        return [self.bold_btn, self.italic_btn, self.underline_btn,
+                self.heading_btn, self.list_btn, self.link_btn]
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def showEvent(self, event):
+        self.wake()
+        super().showEvent(event)
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.Type.ActivationChange and self.isActiveWindow():
+            self.wake()
+            self.touch()
+        super().changeEvent(event)
+
+    @property
+    def trace_scope(self):
+        return f"window {self.note_id[:8]}"
 
     def _do_save(self):
+        tracer.count(self.trace_scope, "saves")
         note_data = {
             'id': self.note_id,
-            'content': self.content,
+            'content': self.serialize_content(),
             'color': self.bg_color,
             'pinned': self.is_pinned,
-            'geometry': [self.x(), self.y(), self.width(), self.height()]
+            'geometry': [self.x(), self.y(), self.width(), self.height()],
+            'blobs': self.blob_refs,
+            'title': self.title,
+            'modified': self.modified,
+            'rev': self.revision
         }
-        notes = self.storage.load_notes()
-        existing = False
-        for i, n in enumerate(notes):
-            if n.get('id') == self.note_id:
-                notes[i] = note_data
-                existing = True
-                break
-        if not existing:
-            notes.append(note_data)
-        self.storage.save_all(notes)
+        self.storage.put_note(note_data, edited=self.revision != self.saved_revision)
+        self.saved_revision = self.revision
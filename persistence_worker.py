@@ -0,0 +1,102 @@
+import threading
+from typing import Optional
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from storage import WriteBatch
+from tracing import tracer
+
+
+class PersistenceWorker(QThread):
+    """
+    Runs Storage backend writes off the GUI thread.
+
+    Only one batch waits in the queue at a time: a newer submission is merged
+    over the queued one, so a slow disk never builds up a backlog of stale
+    snapshots. Results are reported through signals, which Qt delivers on the
+    receiver's thread.
+    """
+    written = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, backend, history=None, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        # NoteHistory recording each written batch, off the GUI thread too
+        self.history = history
+        self._cond = threading.Condition()
+        self._pending: Optional[WriteBatch] = None
+        self._retry: Optional[WriteBatch] = None
+        self._busy = False
+        self._stopping = False
+        self._generation = 0
+
+    def submit(self, batch: WriteBatch):
+        with self._cond:
+            if self._retry is not None:
+                batch = batch.merged_after(self._retry)
+                self._retry = None
+            if self._pending is not None:
+                batch = batch.merged_after(self._pending)
+            self._pending = batch
+            self._cond.notify_all()
+
+    def is_busy(self) -> bool:
+        with self._cond:
+            return self._busy or self._pending is not None
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything submitted so far has been written (or failed)."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._busy and self._pending is None, timeout)
+
+    def stop(self):
+        """Write what is queued, then end the thread."""
+        with self._cond:
+            if self._retry is not None:
+                self._pending = (self._retry if self._pending is None
+                                 else self._pending.merged_after(self._retry))
+                self._retry = None
+            self._stopping = True
+            self._cond.notify_all()
+        self.wait()
+
+    def _record_history(self, batch: WriteBatch):
+        try:
+            with tracer.span("history.record", notes=len(batch.changed)):
+                self.history.record_batch(batch.notes, batch.changed, batch.deleted)
+        except Exception as e:
+            # The notes themselves are saved; only their history is behind.
+            self.failed.emit(f"revision history: {e}")
+
+    def run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._stopping)
+                if self._pending is None:
+                    return
+                batch, self._pending = self._pending, None
+                if self._retry is not None:
+                    # Failed while this batch was queued; write both together.
+                    batch, self._retry = batch.merged_after(self._retry), None
+                self._busy = True
+
+            try:
+                with tracer.span("backend.write", notes=len(batch.changed) + len(batch.deleted),
+                                 layouts=len(batch.layout_changed)):
+                    self.backend.write(batch.notes, batch.changed, batch.deleted, batch.layout_changed)
+            except Exception as e:
+                with self._cond:
+                    # Keep the batch so the next submission retries it.
+                    self._retry = batch if self._retry is None else batch.merged_after(self._retry)
+                self.failed.emit(str(e))
+            else:
+                if self.history is not None:
+                    self._record_history(batch)
+                self._generation += 1
+                self.written.emit(self._generation)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
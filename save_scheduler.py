@@ -0,0 +1,55 @@
+import time
+from typing import Dict
+
+from PyQt6.QtCore import QObject, QTimer
+
+from config import Config
+
+
+class SaveScheduler(QObject):
+    """
+    Application-wide save coalescer.
+
+    Windows mark themselves dirty; after IDLE_DELAY_MS of quiet, or at the
+    latest MAX_LATENCY_MS after the first pending change, every dirty window
+    is written into Storage and flushed in a single write.
+    """
+    IDLE_DELAY_MS = Config.get('save_idle_ms')
+    MAX_LATENCY_MS = Config.get('save_max_latency_ms')
+
+    def __init__(self, storage, idle_delay_ms=None, max_latency_ms=None, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        self.idle_delay_ms = idle_delay_ms if idle_delay_ms is not None else self.IDLE_DELAY_MS
+        self.max_latency_ms = max_latency_ms if max_latency_ms is not None else self.MAX_LATENCY_MS
+
+        self._dirty: Dict[str, object] = {}
+        self._deadline = None
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def mark_dirty(self, window):
+        self._dirty[window.note_id] = window
+        now = time.monotonic()
+        if self._deadline is None:
+            self._deadline = now + self.max_latency_ms / 1000.0
+        remaining_ms = max(0, int((self._deadline - now) * 1000))
+        self.timer.start(min(self.idle_delay_ms, remaining_ms))
+
+    def forget(self, note_id: str):
+        """Drop a pending save, e.g. for a note deleted by another instance."""
+        self._dirty.pop(note_id, None)
+
+    def has_pending(self) -> bool:
+        return bool(self._dirty)
+
+    def flush(self):
+        """Collect every dirty window into Storage and write once."""
+        self.timer.stop()
+        self._deadline = None
+        dirty, self._dirty = self._dirty, {}
+        for window in dirty.values():
+            window.auto_save()
+        self.storage.flush()
@@ -0,0 +1,52 @@
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem
+from PyQt6.QtCore import Qt, pyqtSignal
+
+
+class SearchDialog(QDialog):
+    """Quick-search over the storage search index; emits the picked note id."""
+    note_selected = pyqtSignal(str)
+    RESULT_LIMIT = 30
+
+    def __init__(self, storage, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        self.setWindowTitle("Search Notes")
+        self.setWindowFlags(self.windowFlags() | Qt.WindowType.WindowStaysOnTopHint)
+        self.resize(360, 420)
+
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Search…")
+        self.query_edit.textChanged.connect(self.run_query)
+        self.query_edit.returnPressed.connect(self.pick_current)
+        layout.addWidget(self.query_edit)
+
+        self.results = QListWidget()
+        self.results.itemActivated.connect(self.pick_item)
+        layout.addWidget(self.results)
+
+    def run_query(self, text):
+        self.results.clear()
+        for note_id, score in self.storage.index.search(text, self.RESULT_LIMIT):
+            note = self.storage.get_metadata(note_id)
+            if note is None:
+                continue
+            item = QListWidgetItem(note.get('title') or "Untitled note")
+            item.setData(Qt.ItemDataRole.UserRole, note_id)
+            self.results.addItem(item)
+        if self.results.count():
+            self.results.setCurrentRow(0)
+
+    def pick_current(self):
+        item = self.results.currentItem()
+        if item is not None:
+            self.pick_item(item)
+
+    def pick_item(self, item):
+        self.note_selected.emit(item.data(Qt.ItemDataRole.UserRole))
+        self.hide()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.query_edit.selectAll()
+        self.query_edit.setFocus()
@@ -0,0 +1,180 @@
+import bisect
+import heapq
+import json
+import math
+import re
+from collections import Counter
+from html.parser import HTMLParser
+from typing import Dict, List, Tuple, Optional, Any
+
+from fileutil import atomic_write
+
+
+class _TextExtractor(HTMLParser):
+    SKIP = ('head', 'style', 'script', 'title')
+    BREAKS = ('p', 'br', 'div', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'tr')
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag in self.BREAKS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """Plain text of a note body without going through QTextDocument."""
+    parser = _TextExtractor()
+    parser.feed(html or "")
+    parser.close()
+    return "".join(parser.parts)
+
+
+class SearchIndex:
+    """
+    Incremental inverted index over note plain text.
+
+    Only the forward index (note id -> term frequencies) is persisted; the
+    postings and the sorted vocabulary used for prefix matching are rebuilt
+    in memory on load. Results are ranked with BM25, and the last query term
+    also matches as a prefix so the index can back search-as-you-type.
+    """
+    VERSION = 1
+    TOKEN_PATTERN = re.compile(r"\w+")
+    K1 = 1.2
+    B = 0.75
+    # Bound the work a one- or two-letter prefix can trigger.
+    MAX_PREFIX_TERMS = 64
+
+    def __init__(self, path: str):
+        self.path = path
+        # note_id -> {'sig': signature, 'len': token count, 'terms': {term: tf}}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._vocabulary: Optional[List[str]] = None
+        self._total_length = 0
+        self.dirty = False
+        self.load()
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        return cls.TOKEN_PATTERN.findall(text.lower())
+
+    # Persistence
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return
+        for note_id, doc in data.get('docs', {}).items():
+            self._add(note_id, doc)
+
+    def save(self):
+        if not self.dirty:
+            return
+        data = {'version': self.VERSION, 'docs': self._docs}
+        atomic_write(self.path, json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        self.dirty = False
+
+    # Updates
+    def __contains__(self, note_id: str) -> bool:
+        return note_id in self._docs
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def ids(self) -> List[str]:
+        return list(self._docs)
+
+    def signature(self, note_id: str):
+        doc = self._docs.get(note_id)
+        return doc['sig'] if doc else None
+
+    def update(self, note_id: str, text: str, signature=None):
+        terms = Counter(self.tokenize(text))
+        self.remove(note_id)
+        self._add(note_id, {'sig': signature, 'len': sum(terms.values()), 'terms': dict(terms)})
+        self.dirty = True
+
+    def _add(self, note_id: str, doc: Dict[str, Any]):
+        self._docs[note_id] = doc
+        self._total_length += doc['len']
+        for term, tf in doc['terms'].items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._vocabulary = None
+            postings[note_id] = tf
+
+    def remove(self, note_id: str):
+        doc = self._docs.pop(note_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc['len']
+        for term in doc['terms']:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(note_id, None)
+            if not postings:
+                del self._postings[term]
+                self._vocabulary = None
+        self.dirty = True
+
+    # Queries
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff")
+        return self._vocabulary[start:min(end, start + self.MAX_PREFIX_TERMS)]
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Notes matching every query term, best first, as (note_id, score)."""
+        tokens = self.tokenize(query)
+        if not tokens or not self._docs:
+            return []
+        n_docs = len(self._docs)
+        avg_length = (self._total_length / n_docs) or 1.0
+        scores: Optional[Dict[str, float]] = None
+
+        for i, token in enumerate(tokens):
+            is_last = i == len(tokens) - 1
+            terms = self._expand_prefix(token) if is_last else [token]
+            term_scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                # Exact matches outrank prefix completions.
+                weight = idf if term == token else idf * 0.5
+                for note_id, tf in postings.items():
+                    length = self._docs[note_id]['len']
+                    norm = tf * (self.K1 + 1) / (
+                        tf + self.K1 * (1 - self.B + self.B * length / avg_length))
+                    term_scores[note_id] = term_scores.get(note_id, 0.0) + weight * norm
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {note_id: score + term_scores[note_id]
+                          for note_id, score in scores.items() if note_id in term_scores}
+            if not scores:
+                return []
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,140 @@
+import json
+import lzma
+import struct
+import threading
+import zlib
+from typing import List, Dict, Any, Mapping, Optional, Iterable
+
+
+class CorruptSnapshot(ValueError):
+    """A snapshot file exists but does not decode to a note list."""
+
+
+class SnapshotCodec:
+    """
+    Reads and writes a whole-collection snapshot such as ``notes.json``.
+
+    With compression "none" the snapshot is the legacy indented JSON list.
+    "zlib" and "lzma" write a container instead: MAGIC, one codec byte, then
+    one ``<u32 length><compressed note JSON>`` record per note. Records are
+    cached per note id, so rewriting the collection only recompresses the
+    notes that changed. read() detects the format from the first bytes, so
+    plain JSON files keep loading whatever compression is configured.
+    """
+    MAGIC = b"FNZ1"
+    CODECS = {
+        b"z": (zlib.compress, zlib.decompress),
+        b"x": (lzma.compress, lzma.decompress),
+    }
+    NAMES = {"zlib": b"z", "lzma": b"x"}
+    _LENGTH = struct.Struct("<I")
+
+    def __init__(self, compression: str = "none"):
+        if compression not in ("none", *self.NAMES):
+            raise ValueError(f"unknown snapshot compression {compression!r}")
+        self.codec = self.NAMES.get(compression)
+        self._records: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def compressed(self) -> bool:
+        return self.codec is not None
+
+    @classmethod
+    def is_container(cls, data: bytes) -> bool:
+        return data[:len(cls.MAGIC)] == cls.MAGIC
+
+    # Reading
+    def read(self, path: str, strict: bool = True) -> List[Dict[str, Any]]:
+        """
+        Notes stored at path in either format; [] if the file is missing.
+
+        A file that is empty, truncated or otherwise damaged raises
+        CorruptSnapshot, unless strict is off: then whatever still decodes
+        is returned.
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        if self.is_container(data):
+            return self._decode(data, strict)
+        try:
+            notes = json.loads(data)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            if strict:
+                raise CorruptSnapshot(f"{path}: {e}") from e
+            return []
+        if not isinstance(notes, list):
+            if strict:
+                raise CorruptSnapshot(f"{path}: not a note list")
+            return []
+        return notes
+
+    def _decode(self, data: bytes, strict: bool = True) -> List[Dict[str, Any]]:
+        codec = data[len(self.MAGIC):len(self.MAGIC) + 1]
+        if codec not in self.CODECS:
+            if strict:
+                raise CorruptSnapshot(f"unknown snapshot codec {codec!r}")
+            return []
+        decompress = self.CODECS[codec][1]
+        notes, records = [], {}
+        for record in self._split(data, len(self.MAGIC) + 1, strict):
+            try:
+                note = json.loads(decompress(record))
+            except (zlib.error, lzma.LZMAError, json.JSONDecodeError, UnicodeDecodeError) as e:
+                if strict:
+                    raise CorruptSnapshot(f"damaged snapshot record: {e}") from e
+                # Salvaging: a damaged record only costs that note.
+                continue
+            if not isinstance(note, dict):
+                continue
+            notes.append(note)
+            if note.get('id') is not None:
+                records[note['id']] = record
+        if codec == self.codec:
+            # Unchanged notes are written back as the exact bytes just read.
+            with self._lock:
+                self._records = records
+        return notes
+
+    def _split(self, data: bytes, offset: int, strict: bool = True) -> Iterable[bytes]:
+        size = self._LENGTH.size
+        while offset + size <= len(data):
+            (length,) = self._LENGTH.unpack_from(data, offset)
+            offset += size
+            if offset + length > len(data):
+                break
+            yield data[offset:offset + length]
+            offset += length
+        if offset != len(data) and strict:
+            raise CorruptSnapshot("truncated snapshot container")
+
+    # Writing
+    def encode(self, notes: Mapping[str, Dict[str, Any]],
+               changed: Optional[Iterable[str]] = None) -> bytes:
+        """
+        Serialize the whole collection.
+
+        changed lists the ids modified since the previous encode() or read();
+        None recompresses everything.
+        """
+        if not self.compressed:
+            return json.dumps(list(notes.values()), indent=4).encode('utf-8')
+        compress = self.CODECS[self.codec][0]
+        with self._lock:
+            cached = self._records if changed is not None else {}
+            stale = set(changed or ())
+            records: Dict[str, bytes] = {}
+            for note_id, note in notes.items():
+                record = cached.get(note_id) if note_id not in stale else None
+                if record is None:
+                    record = compress(json.dumps(note, separators=(',', ':')).encode('utf-8'))
+                records[note_id] = record
+            self._records = records
+        parts: List[bytes] = [self.MAGIC, self.codec]
+        for record in records.values():
+            parts.append(self._LENGTH.pack(len(record)))
+            parts.append(record)
+        return b"".join(parts)
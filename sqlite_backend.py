@@ -0,0 +1,150 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Dict, Any, Mapping, Set, Optional
+
+from fileutil import file_signature
+from journal import NoteJournal
+
+
+class SqliteBackend:
+    """
+    Storage backend keeping one row per note in a WAL-mode SQLite database.
+
+    Metadata (id, color, pinned, geometry) lives in the ``notes`` table and the
+    HTML body in ``contents``, so load() only touches the small rows and
+    load_content() fetches a single body when a window needs it.
+    """
+    LAZY_CONTENT = True
+    SCHEMA_VERSION = 1
+    META_COLUMNS = ('color', 'pinned', 'geometry')
+
+    def __init__(self, path: str, migrate_from: Optional[str] = None):
+        self.path = path
+        self.migrate_from = migrate_from
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._signature = None
+        self._ensure_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; WAL lets the GUI thread read
+        # content while the persistence worker writes.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _ensure_schema(self):
+        conn = self._connection()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS notes (
+                    id TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    color TEXT,
+                    pinned INTEGER NOT NULL DEFAULT 0,
+                    x INTEGER, y INTEGER, width INTEGER, height INTEGER,
+                    extra TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS contents (
+                    id TEXT PRIMARY KEY REFERENCES notes(id) ON DELETE CASCADE,
+                    content TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            if self.migrate_from:
+                self._migrate(conn, self.migrate_from)
+            conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+
+    def _migrate(self, conn: sqlite3.Connection, json_path: str):
+        """One-shot import of notes.json (and any journal tail) into a fresh database."""
+        if not os.path.exists(json_path):
+            return
+        notes = {n['id']: n for n in NoteJournal(json_path).load() if n.get('id') is not None}
+        self._write(conn, notes, set(notes), set())
+
+    def paths(self) -> List[str]:
+        return [self.path, self.path + "-wal"]
+
+    def changed_externally(self) -> bool:
+        return file_signature(self.path, self.path + "-wal") != self._signature
+
+    # Reads
+    def load(self) -> List[Dict[str, Any]]:
+        """Metadata of every note, in creation order, without content."""
+        rows = self._connection().execute(
+            "SELECT id, color, pinned, x, y, width, height, extra "
+            "FROM notes ORDER BY position").fetchall()
+        self._signature = file_signature(self.path, self.path + "-wal")
+        return [self._row_to_meta(row) for row in rows]
+
+    @staticmethod
+    def _row_to_meta(row) -> Dict[str, Any]:
+        note_id, color, pinned, x, y, width, height, extra = row
+        note = json.loads(extra) if extra else {}
+        note['id'] = note_id
+        if color is not None:
+            note['color'] = color
+        note['pinned'] = bool(pinned)
+        if x is not None:
+            note['geometry'] = [x, y, width, height]
+        return note
+
+    def load_content(self, note_id: str) -> str:
+        row = self._connection().execute(
+            "SELECT content FROM contents WHERE id = ?", (note_id,)).fetchone()
+        return row[0] if row else ""
+
+    # Writes
+    def write(self, notes: Mapping[str, Dict[str, Any]], changed: Set[str], deleted: Set[str]):
+        conn = self._connection()
+        with conn:
+            self._write(conn, notes, changed, deleted)
+        self._signature = file_signature(self.path, self.path + "-wal")
+
+    def _write(self, conn, notes, changed, deleted):
+        for note_id in deleted:
+            conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+        for note_id in changed:
+            note = notes.get(note_id)
+            if note is None:
+                continue
+            geometry = note.get('geometry') or [None] * 4
+            extra = {k: v for k, v in note.items()
+                     if k not in self.META_COLUMNS and k not in ('id', 'content')}
+            conn.execute("""
+                INSERT INTO notes (id, position, color, pinned, x, y, width, height, extra)
+                VALUES (?, COALESCE((SELECT MAX(position) FROM notes), 0) + 1,
+                        ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    color = excluded.color, pinned = excluded.pinned,
+                    x = excluded.x, y = excluded.y,
+                    width = excluded.width, height = excluded.height,
+                    extra = excluded.extra
+            """, (note_id, note.get('color'), int(bool(note.get('pinned'))),
+                  *geometry, json.dumps(extra) if extra else None))
+            if 'content' in note:
+                conn.execute(
+                    "INSERT INTO contents (id, content) VALUES (?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET content = excluded.content",
+                    (note_id, note['content']))
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
@@ -0,0 +1,78 @@
+import json
+import sys
+import time
+from typing import Any, Dict, Optional
+
+from PyQt6.QtCore import QObject, QEvent, pyqtSignal
+
+from config import Config
+
+
+class StartupReport(QObject):
+    """
+    Per-phase timings of one cold start.
+
+    Times are measured from started, taken before main.py imports Qt. Phases
+    are marked in order with mark(); the first Paint event of the window
+    passed to watch() marks 'first_paint' and emits first_paint. finish()
+    marks 'restored' and writes the report as JSON to the startup_report
+    setting ("-" for stderr), so CI can track time-to-first-note.
+    """
+    first_paint = pyqtSignal()
+
+    def __init__(self, started: float, parent=None):
+        super().__init__(parent)
+        self.started = started
+        self.marks: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._watched = None
+
+    def mark(self, phase: str):
+        """Record that phase ended now; later marks of the same phase are ignored."""
+        self.marks.setdefault(phase, time.perf_counter())
+
+    def watch(self, window):
+        """Mark 'first_paint' when window first paints."""
+        if self._watched is not None or 'first_paint' in self.marks:
+            return
+        self._watched = window
+        window.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self._watched and event.type() == QEvent.Type.Paint:
+            obj.removeEventFilter(self)
+            self._watched = None
+            self.mark('first_paint')
+            self.first_paint.emit()
+        return False
+
+    def elapsed_ms(self, phase: str) -> Optional[float]:
+        if phase not in self.marks:
+            return None
+        return (self.marks[phase] - self.started) * 1000
+
+    def report(self) -> Dict[str, Any]:
+        """Phases in the order marked: time spent in each and time since start, in ms."""
+        phases = []
+        previous = self.started
+        for phase, at in sorted(self.marks.items(), key=lambda item: item[1]):
+            phases.append({'phase': phase, 'ms': round((at - previous) * 1000, 1),
+                           'at_ms': round((at - self.started) * 1000, 1)})
+            previous = at
+        return {'phases': phases, **self.counts}
+
+    def finish(self, **counts: int):
+        self.mark('restored')
+        self.counts.update(counts)
+        target = Config.get('startup_report')
+        if not target:
+            return
+        text = json.dumps(self.report())
+        if target == "-":
+            print(text, file=sys.stderr)
+            return
+        try:
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(text + "\n")
+        except OSError as e:
+            print(f"Could not write startup report to {target}: {e}", file=sys.stderr)
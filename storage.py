@@ -1,51 +1,443 @@
-import json
+import itertools
 import os
-from typing import List, Dict, Any
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Set, NamedTuple, Mapping, FrozenSet, Iterable, Iterator
+
+from blob_store import BlobStore
+from checkpoints import Checkpoints
+from config import Config
+from fileutil import file_signature, atomic_write, FileLock
+from history import NoteHistory
+from journal import NoteJournal
+from search_index import SearchIndex
+from snapshot_codec import SnapshotCodec
+import content_format
+from tracing import traced
+from layout_journal import LayoutJournal, LayoutBackend
+
+
+class WriteBatch(NamedTuple):
+    """
+    Immutable snapshot of the store plus the ids that changed since the last batch.
+
+    changed holds notes whose content (or other non-layout fields) changed;
+    layout_changed those where only geometry, pinned state or colour did.
+    """
+    notes: Mapping[str, Dict[str, Any]]
+    changed: FrozenSet[str]
+    deleted: FrozenSet[str]
+    layout_changed: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def capture(cls, notes, changed, deleted, layout_changed=()) -> "WriteBatch":
+        return cls(MappingProxyType(dict(notes)), frozenset(changed), frozenset(deleted),
+                   frozenset(layout_changed))
+
+    def merged_after(self, older: "WriteBatch") -> "WriteBatch":
+        """Fold an older, still unwritten batch underneath this one."""
+        changed = (older.changed - self.deleted) | self.changed
+        deleted = (older.deleted - self.changed - self.layout_changed) | self.deleted
+        layout_changed = ((older.layout_changed - self.deleted) | self.layout_changed) - changed
+        return WriteBatch(self.notes, changed, deleted, layout_changed)
+
+
+class ReloadDiff(NamedTuple):
+    """Note ids that differ after re-reading a store another process changed."""
+    added: List[str]
+    content_changed: List[str]
+    layout_changed: List[str]
+    removed: List[str]
+
+
+class JsonBackend:
+    """
+    Legacy backend: the whole collection is rewritten on every flush.
+
+    Each rewrite is atomic and rotates the previous file into Checkpoints,
+    which load() falls back to if the file is damaged.
+    """
+    LAZY_CONTENT = False
+
+    def __init__(self, path: str, compression: str = "none"):
+        self.path = path
+        self.codec = SnapshotCodec(compression)
+        self.checkpoints = Checkpoints(path)
+        self.recovery = None
+        self._signature = None
+
+    def paths(self) -> List[str]:
+        return [self.path]
+
+    def changed_externally(self) -> bool:
+        return file_signature(self.path) != self._signature
+
+    def load(self) -> List[Dict[str, Any]]:
+        data, self.recovery = self.checkpoints.load(self.codec.read)
+        self._signature = file_signature(self.path)
+        return data
+
+    def write(self, notes: Mapping[str, Dict[str, Any]], changed: Set[str], deleted: Set[str]):
+        data = self.codec.encode(notes, changed)
+        self.checkpoints.rotate()
+        atomic_write(self.path, data)
+        self._signature = file_signature(self.path)
+
+    def close(self):
+        pass
+
 
 class Storage:
+    """
+    Singleton owning the authoritative in-memory copy of all notes.
+
+    Notes are kept in a dict keyed by id. Mutations only mark entries dirty;
+    flush() hands the dirty set to the backend, and is a no-op when nothing
+    changed. The files are re-read only when their mtime or size moved.
+    With a writer attached (see PersistenceWorker), flushes are handed off as
+    immutable WriteBatch snapshots instead of being written on the caller's
+    thread. Changes that only touch geometry, pinned state or colour are
+    tracked apart and go to the small layout journal, not the content backend.
+    """
     _instance = None
     FILE_PATH = "notes.json"
+    DB_PATH = "notes.db"
+    ARCHIVE_PATH = "notes.fna"
+    # "journal" appends one record per change, "json" rewrites the whole file,
+    # "sqlite" keeps one row per note, "archive" memory-maps a binary archive.
+    # None reads the storage_backend setting.
+    MODE = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Storage, cls).__new__(cls)
             cls._instance._ensure_file_exists()
+            cls._instance._init_index()
         return cls._instance
 
     def _ensure_file_exists(self):
         if not os.path.exists(self.FILE_PATH):
-            with open(self.FILE_PATH, 'w', encoding='utf-8') as f:
-                json.dump([], f)
+            atomic_write(self.FILE_PATH, b"[]")
+
+    def _init_index(self):
+        # Geometry, pinned state and colour are journaled apart from content.
+        base = os.path.splitext(self.FILE_PATH)[0]
+        # Advisory lock shared with other instances for every store read and write.
+        lock = FileLock(base + ".lock")
+        with lock:
+            content = self._create_backend(self.MODE or Config.get('storage_backend'), lock)
+        self.backend = LayoutBackend(content, LayoutJournal(base + ".layout"), lock)
+        self._notes: Dict[str, Dict[str, Any]] = {}
+        self._dirty: Set[str] = set()
+        self._layout_dirty: Set[str] = set()
+        self._deleted: Set[str] = set()
+        self.writer = None
+        # Ids still to check for legacy HTML content, built on first migrate_content()
+        self._migration_queue: Optional[List[str]] = None
+        self.blobs = BlobStore(os.path.join(os.path.dirname(self.FILE_PATH), "blobs"))
+        self.index = SearchIndex(os.path.splitext(self.FILE_PATH)[0] + ".index.json")
+        self.history = NoteHistory(os.path.join(os.path.dirname(self.FILE_PATH), "history"), lock)
+        self._load()
+        # checkpoints.RecoveryReport if the store was damaged and restored on startup
+        self.recovery = self.backend.recovery
+
+    def _create_backend(self, mode: str, lock: FileLock):
+        # Backends other than the default are imported only when selected.
+        if mode == "sqlite":
+            from sqlite_backend import SqliteBackend
+            # The first run against a new database imports the JSON store.
+            return SqliteBackend(self.DB_PATH, migrate_from=self.FILE_PATH)
+        if mode == "archive":
+            from archive_backend import ArchiveBackend
+            return ArchiveBackend(self.ARCHIVE_PATH, migrate_from=self.FILE_PATH)
+        compression = Config.get('storage_compression')
+        if mode == "json":
+            return JsonBackend(self.FILE_PATH, compression)
+        return NoteJournal(self.FILE_PATH, compression=compression, lock=lock)
+
+    def set_writer(self, writer):
+        """Route flushes through writer.submit(batch); None writes synchronously."""
+        self.writer = writer
+
+    def _load(self):
+        self._notes = {n['id']: n for n in self.backend.load() if n.get('id') is not None}
+
+    def reload(self) -> Optional[ReloadDiff]:
+        """
+        Reload from disk if another process changed the files, reporting which
+        notes differ from the previous state; None if nothing was reloaded.
+
+        Only the caller that applies the diff to open windows should reload;
+        reads such as list_metadata() serve the in-memory state.
+
+        Content counts as changed when 'rev' or 'modified' moved (or, with
+        both bodies in memory, when they differ), so unchanged notes keep
+        their cached body. Notes with unflushed local edits are left out.
+        """
+        if self.writer is not None and self.writer.is_busy():
+            # Our own write is in flight; the disk is not comparable yet.
+            return None
+        if not self.backend.changed_externally():
+            return None
+        pending = {i: self._notes[i] for i in self._dirty | self._layout_dirty if i in self._notes}
+        previous = self._notes
+        self._load()
+        diff = ReloadDiff([], [], [], [])
+        for note_id, note in self._notes.items():
+            before = previous.get(note_id)
+            if note_id in pending:
+                continue
+            if before is None:
+                diff.added.append(note_id)
+            elif self._content_changed(before, note):
+                diff.content_changed.append(note_id)
+            else:
+                if 'content' in before and 'content' not in note:
+                    note['content'] = before['content']
+                if LayoutJournal.layout_of(before) != LayoutJournal.layout_of(note):
+                    diff.layout_changed.append(note_id)
+        diff.removed.extend(i for i in previous
+                            if i not in self._notes and i not in pending and i not in self._deleted)
+        self._notes.update(pending)
+        for note_id in self._deleted:
+            self._notes.pop(note_id, None)
+        return diff
+
+    @staticmethod
+    def _content_changed(before: Dict[str, Any], after: Dict[str, Any]) -> bool:
+        if (before.get('rev'), before.get('modified')) != (after.get('rev'), after.get('modified')):
+            return True
+        if 'content' in before and 'content' in after:
+            return before['content'] != after['content']
+        return False
+
+    # Index
+    def get_note(self, note_id: str) -> Optional[Dict[str, Any]]:
+        """Full note including content, fetched from the backend on first access."""
+        note = self._notes.get(note_id)
+        if note is not None and 'content' not in note:
+            note = dict(note, content=self.backend.load_content(note_id))
+            self._notes[note_id] = note
+        return note
+
+    def get_metadata(self, note_id: str) -> Optional[Dict[str, Any]]:
+        """Stored record without forcing its content to load."""
+        return self._notes.get(note_id)
 
+    def peek_content(self, note_id: str) -> str:
+        """Content of a note without caching it in the index."""
+        note = self._notes.get(note_id)
+        if note is None:
+            return ""
+        if 'content' in note:
+            return note['content']
+        return self.backend.load_content(note_id)
+
+    def snapshot(self) -> Mapping[str, Dict[str, Any]]:
+        """Read-only view of the current records, safe to hand to another thread."""
+        return MappingProxyType(dict(self._notes))
+
+    def iter_notes(self, notes: Optional[Mapping[str, Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Full notes one at a time, from notes (a snapshot()) or the live records.
+
+        Bodies not in memory are read from the backend per note and not
+        cached, so a pass over the whole store holds one body at a time.
+        """
+        for note_id, note in (notes if notes is not None else self.snapshot()).items():
+            if 'content' not in note:
+                note = dict(note, content=self.backend.load_content(note_id))
+            yield note
+
+    def import_notes(self, notes: Iterable[Dict[str, Any]]) -> ReloadDiff:
+        """
+        Stage imported notes, deduplicated by id.
+
+        A note already in the store is only replaced when the imported copy
+        was modified later. Returns what changed in reload()'s terms; the
+        caller flushes.
+        """
+        diff = ReloadDiff([], [], [], [])
+        for note in notes:
+            note_id = note['id']
+            existing = self._notes.get(note_id)
+            if existing is None:
+                diff.added.append(note_id)
+            elif (note.get('modified') or 0) > (existing.get('modified') or 0):
+                diff.content_changed.append(note_id)
+            else:
+                continue
+            # Recorded like an edit, so a replaced note's previous text stays restorable.
+            self.put_note(note, edited=existing is not None)
+        return diff
+
+    @traced("Storage.list_metadata")
+    def list_metadata(self) -> List[Dict[str, Any]]:
+        """Every note without its content; cheap on backends with lazy content."""
+        return [{k: v for k, v in n.items() if k != 'content'} for n in self._notes.values()]
+
+    def put_note(self, note_data: Dict[str, Any], edited: bool = False):
+        """
+        Stage a note for the next flush.
+
+        edited marks a change the user made to the content, which the revision
+        history records; migrations and other rewrites leave it False.
+        """
+        note_id = note_data['id']
+        old = self._notes.get(note_id)
+        if old == note_data:
+            return
+        self._notes[note_id] = note_data
+        self._deleted.discard(note_id)
+        if old is not None and note_id not in self._dirty and self._same_except_layout(old, note_data):
+            self._layout_dirty.add(note_id)
+        else:
+            self._dirty.add(note_id)
+            self._layout_dirty.discard(note_id)
+            if edited:
+                # The backend still holds the previous body until this flush.
+                self.history.note_edited(note_id, lambda: old and (
+                    old['content'] if 'content' in old else self.backend.load_content(note_id)))
+
+    @staticmethod
+    def _same_except_layout(old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+        # An unchanged body is usually the very same str object, so this is cheap.
+        keys = (old.keys() | new.keys()).difference(LayoutJournal.KEYS)
+        return all(old.get(key) == new.get(key) for key in keys)
+
+    def remove_note(self, note_id: str):
+        if note_id not in self._notes:
+            return
+        del self._notes[note_id]
+        self._dirty.discard(note_id)
+        self._layout_dirty.discard(note_id)
+        self._deleted.add(note_id)
+        self.index.remove(note_id)
+
+    def is_dirty(self) -> bool:
+        return bool(self._dirty or self._deleted or self._layout_dirty)
+
+    @traced("Storage.flush")
+    def flush(self):
+        """Write pending changes, if any."""
+        if not self.is_dirty():
+            return
+        changed, deleted, layout_changed = self._dirty, self._deleted, self._layout_dirty
+        self._dirty, self._deleted, self._layout_dirty = set(), set(), set()
+        if self.writer is not None:
+            self.writer.submit(WriteBatch.capture(self._notes, changed, deleted, layout_changed))
+        else:
+            self.backend.write(self._notes, changed, deleted, layout_changed)
+            self.history.record_batch(self._notes, changed, deleted)
+
+    # Collection API
+    @traced("Storage.load_notes")
     def load_notes(self) -> List[Dict[str, Any]]:
-        try:
-            with open(self.FILE_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return []
+        return [self.get_note(note_id) for note_id in list(self._notes)]
 
+    @traced("Storage.save_all")
     def save_all(self, notes_data: List[Dict[str, Any]]):
         """
         Save all notes to the file.
         notes_data: List of dictionaries representing note states.
         """
-        with open(self.FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(notes_data, f, indent=4)
+        incoming = {n['id'] for n in notes_data}
+        for note_id in [i for i in self._notes if i not in incoming]:
+            self.remove_note(note_id)
+        for note in notes_data:
+            self.put_note(note)
+        self.flush()
+
+    def save_note(self, note_data: Dict[str, Any]):
+        """Insert or replace a single note."""
+        self.put_note(note_data)
+        self.flush()
 
     def add_note(self, note_data: Dict[str, Any]):
-        notes = self.load_notes()
-        notes.append(note_data)
-        self.save_all(notes)
+        self.put_note(note_data)
+        self.flush()
 
     def update_note(self, note_id: str, note_data: Dict[str, Any]):
-        notes = self.load_notes()
-        for i, note in enumerate(notes):
-            if note.get('id') == note_id:
-                notes[i] = note_data
-                break
-        self.save_all(notes)
+        if note_id in self._notes:
+            self.put_note(note_data)
+        self.flush()
 
     def delete_note(self, note_id: str):
-        notes = self.load_notes()
-        notes = [n for n in notes if n.get('id') != note_id]
-        self.save_all(notes)
+        self.remove_note(note_id)
+        self.flush()
+
+    def sync_search_index(self, limit: Optional[int] = None) -> int:
+        """
+        Index notes whose 'modified' stamp differs from the indexed one.
+
+        At most limit notes are indexed per call so callers can spread the
+        work over idle time; returns how many were indexed. The index is
+        saved once a call finds nothing left to do.
+        """
+        updated = 0
+        for note_id in [i for i in self.index.ids() if i not in self._notes]:
+            self.index.remove(note_id)
+        for note_id, note in list(self._notes.items()):
+            if limit is not None and updated >= limit:
+                return updated
+            modified = note.get('modified')
+            if note_id in self.index and self.index.signature(note_id) == modified:
+                continue
+            text = content_format.to_plain_text(self.peek_content(note_id))
+            self.index.update(note_id, text, modified)
+            self._backfill_title(note_id, text)
+            updated += 1
+        self.index.save()
+        return updated
+
+    def migrate_content(self, limit: Optional[int] = None) -> int:
+        """
+        Convert notes still stored as Qt HTML to the canonical content format.
+
+        Checks at most limit notes per call and returns how many are left to
+        check. Notes saved without a 'title' get one on the way. Only
+        'content' and 'title' change, so search signatures stay valid.
+        """
+        if self._migration_queue is None:
+            self._migration_queue = list(self._notes)
+        checked = 0
+        while self._migration_queue and (limit is None or checked < limit):
+            note_id = self._migration_queue.pop()
+            checked += 1
+            if note_id not in self._notes:
+                continue
+            content = self.peek_content(note_id)
+            migrated = content_format.migrate(content)
+            if migrated != content:
+                self.put_note(dict(self._notes[note_id], content=migrated))
+            if self._notes[note_id].get('title') is None:
+                self._backfill_title(note_id, content_format.to_plain_text(migrated))
+        self.flush()
+        return len(self._migration_queue)
+
+    def _backfill_title(self, note_id: str, text: str):
+        """Give a note saved before titles were stored one from its plain text."""
+        note = self._notes[note_id]
+        if note.get('title') is None:
+            self.put_note(dict(note, title=content_format.title_from_text(text)))
+
+    def collect_blobs(self) -> int:
+        """Delete stored images that no note references any more."""
+        def note_refs():
+            for meta in self.list_metadata():
+                refs = meta.get('blobs')
+                if refs is None:
+                    # Saved before blob tracking; scan the body once.
+                    refs = BlobStore.references(self.get_note(meta['id']).get('content', ''))
+                yield refs
+        # Images of stored revisions stay restorable.
+        return self.blobs.collect(itertools.chain(note_refs(), self.history.references()))
+
+    def close(self):
+        """Flush and finish pending background work before the process exits."""
+        self.flush()
+        self.index.save()
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+        self.history.close()
+        self.backend.close()
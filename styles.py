@@ -1,3 +1,6 @@
+from PyQt6.QtWidgets import QApplication
+
+
 class Colors:
     PASTEL_YELLOW = "#FFF7D1"
     PASTEL_BLUE = "#E2F0FB"
@@ -8,39 +11,60 @@ class Colors:
     TOOLBAR_BG = "rgba(255, 255, 255, 0.5)"
     BORDER = "#CCCCCC"
 
+    # Value of the noteColor property for each palette entry
+    NOTE_COLOR_NAMES = {
+        PASTEL_YELLOW: "yellow",
+        PASTEL_BLUE: "blue",
+        PASTEL_GREEN: "green",
+        PASTEL_PINK: "pink",
+    }
+
 class Styles:
     NOTE_WINDOW = """
-        QMainWindow {{
+        QWidget#centralWidget {{
             background-color: {bg_color};
             border-radius: 10px;
             border: 1px solid {border_color};
         }}
-        QWidget#centralWidget {{
+    """
+
+    NOTE_COLOR = """
+        QWidget#centralWidget[noteColor="{name}"] {{
             background-color: {bg_color};
-            border-radius: 10px;
         }}
     """
     
     TOOLBAR = """
-        QFrame {{
+        QFrame#noteToolbar {{
             background-color: {toolbar_bg};
             border-top-left-radius: 10px;
             border-top-right-radius: 10px;
             border-bottom: 1px solid rgba(0,0,0,0.05);
         }}
-        QPushButton {{
+        QFrame#noteToolbar QPushButton {{
             background-color: transparent;
             border: none;
             border-radius: 4px;
             padding: 4px;
         }}
-        QPushButton:hover {{
+        QFrame#noteToolbar QPushButton:hover {{
+            background-color: rgba(0,0,0,0.1);
+        }}
+        QFrame#noteToolbar QPushButton[active="true"] {{
+            background-color: rgba(0,0,0,0.25);
+            border-radius: 4px;
+            font-weight: bold;
+        }}
+        QFrame#noteToolbar QPushButton#pinButton[active="true"] {{
+            font-weight: normal;
+        }}
+        QFrame#toolbarSeparator {{
             background-color: rgba(0,0,0,0.1);
         }}
     """
     
     EDITOR = """
-        QTextEdit {{
+        QTextEdit#noteEditor, QPlainTextEdit#noteEditor {{
             background-color: transparent;
             border: none;
             color: {text_color};
@@ -51,18 +75,80 @@ class Styles:
     """
     
     SCROLLBAR = """
-        QScrollBar:vertical {
+        QTextEdit#noteEditor QScrollBar:vertical,
+        QPlainTextEdit#noteEditor QScrollBar:vertical {
             border: none;
             background: transparent;
             width: 8px;
             margin: 0px 0px 0px 0px;
         }
-        QScrollBar::handle:vertical {
+        QTextEdit#noteEditor QScrollBar::handle:vertical,
+        QPlainTextEdit#noteEditor QScrollBar::handle:vertical {
             background: rgba(0,0,0,0.2);
             min-height: 20px;
             border-radius: 4px;
         }
-        QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
+        QTextEdit#noteEditor QScrollBar::add-line:vertical,
+        QTextEdit#noteEditor QScrollBar::sub-line:vertical,
+        QPlainTextEdit#noteEditor QScrollBar::add-line:vertical,
+        QPlainTextEdit#noteEditor QScrollBar::sub-line:vertical {
             height: 0px;
         }
     """
+
+    COLOR_MENU = """
+        QMenu#colorMenu {
+            background-color: white;
+            border: 1px solid #ccc;
+            border-radius: 4px;
+            padding: 4px;
+        }
+        QMenu#colorMenu::item {
+            padding: 8px 16px;
+            border-radius: 4px;
+        }
+        QMenu#colorMenu::item:selected {
+            background-color: rgba(0,0,0,0.1);
+        }
+    """
+
+    _installed = False
+
+    @classmethod
+    def application_stylesheet(cls):
+        """
+        One stylesheet for every note window, built once.
+
+        Per-window state is expressed through dynamic properties (noteColor on
+        the central widget, active on toolbar buttons) so toggling it only
+        needs a re-polish of one widget instead of re-parsing QSS.
+        """
+        parts = [cls.NOTE_WINDOW.format(bg_color=Colors.PASTEL_YELLOW,
+                                        border_color=Colors.BORDER)]
+        for color, name in Colors.NOTE_COLOR_NAMES.items():
+            parts.append(cls.NOTE_COLOR.format(name=name, bg_color=color))
+        parts.append(cls.TOOLBAR.format(toolbar_bg=Colors.TOOLBAR_BG))
+        parts.append(cls.EDITOR.format(text_color=Colors.TEXT_DARK))
+        parts.append(cls.SCROLLBAR)
+        parts.append(cls.COLOR_MENU)
+        return "\n".join(parts)
+
+    @classmethod
+    def ensure_installed(cls):
+        """Install the application stylesheet the first time a note window needs it."""
+        if cls._installed:
+            return
+        app = QApplication.instance()
+        app.setStyleSheet(app.styleSheet() + cls.application_stylesheet())
+        cls._installed = True
+
+
+def set_style_property(widget, name, value):
+    """Set a dynamic property used by the stylesheet; re-polish only if it changed."""
+    if widget.property(name) == value:
+        return False
+    widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
+    return True
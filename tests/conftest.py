@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    """A fresh note store in an empty directory."""
+    from storage import Storage
+    monkeypatch.chdir(tmp_path)
+    Storage._instance = None
+    yield tmp_path
+    if Storage._instance is not None:
+        Storage._instance.close()
+    Storage._instance = None
@@ -0,0 +1,24 @@
+from PyQt6.QtCore import QMimeData
+
+import content_format
+
+
+def test_list_toggled_off_stays_canonical(qapp, store_dir):
+    from note_window import NoteWindow
+    window = NoteWindow()
+    window.editor.insertPlainText("item")
+    window.toggle_list()
+    window.toggle_list()
+    assert window.editor.textCursor().currentList() is None
+    assert content_format.is_canonical(window.editor.serialize())
+
+
+def test_html_paste_stays_canonical(qapp):
+    from note_window import NoteEditor
+    editor = NoteEditor()
+    source = QMimeData()
+    source.setHtml('<p style="margin:10px">Hello <b>bold</b></p>'
+                   '<ul><li>one</li></ul><p style="text-indent:20px">tail</p>')
+    editor.insertFromMimeData(source)
+    assert editor.toPlainText() == "Hello bold\none\ntail"
+    assert content_format.is_canonical(editor.serialize())
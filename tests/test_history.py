@@ -0,0 +1,17 @@
+import os
+import time
+
+from history import NoteHistory
+
+
+def test_prune_keeps_history_of_live_notes(tmp_path):
+    history = NoteHistory(str(tmp_path), interval_s=0, max_days=30)
+    for note_id in ("live", "deleted"):
+        history.record(note_id, "text", 1, force=True)
+    history.flush()
+    old = time.time() - 31 * 24 * 3600
+    for note_id in ("live", "deleted"):
+        os.utime(history.path(note_id), (old, old))
+    assert history.prune({"live"}) == 1
+    assert os.path.exists(history.path("live"))
+    assert not os.path.exists(history.path("deleted"))
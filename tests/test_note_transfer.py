@@ -0,0 +1,63 @@
+import json
+import zipfile
+
+import pytest
+
+import note_transfer
+from blob_store import BlobStore
+from note_transfer import ArchiveError, read_archive
+
+
+def make_archive(path, records):
+    lines = [{'format': note_transfer.FORMAT, 'version': note_transfer.VERSION,
+              'notes': len(records)}] + records
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr(note_transfer.MANIFEST, "".join(json.dumps(line) + "\n" for line in lines))
+    return str(path)
+
+
+@pytest.fixture
+def blobs(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"))
+
+
+@pytest.mark.parametrize("field, value", [
+    ('id', "../../x"),
+    ('content', 5),
+    ('modified', "yesterday"),
+    ('geometry', "nope"),
+    ('geometry', [1, 2, 3]),
+    ('pinned', "yes"),
+])
+def test_invalid_field_is_rejected(tmp_path, blobs, field, value):
+    record = {'id': "note-1", 'content': "text", 'modified': 1.5,
+              'geometry': [0, 0, 300, 300], 'pinned': False}
+    record[field] = value
+    with pytest.raises(ArchiveError):
+        list(read_archive(make_archive(tmp_path / "x.zip", [record]), blobs))
+
+
+def test_record_must_be_an_object(tmp_path, blobs):
+    with pytest.raises(ArchiveError):
+        list(read_archive(make_archive(tmp_path / "x.zip", [[1, 2]]), blobs))
+
+
+def test_blobs_are_recomputed_from_content(tmp_path, blobs):
+    digest = "ab" * 32
+    record = {'id': "note-1", 'content': f'<img src="blob:{digest}">', 'blobs': "zz"}
+    notes = list(read_archive(make_archive(tmp_path / "x.zip", [record]), blobs))
+    assert notes[0]['blobs'] == [digest]
+
+
+def test_import_worker_reports_bad_records(qapp, tmp_path, blobs):
+    class Store:
+        pass
+    store = Store()
+    store.blobs = blobs
+    path = make_archive(tmp_path / "x.zip", [{'id': "note-1", 'content': "a", 'modified': "yesterday"}])
+    worker = note_transfer.ImportWorker(store, path)
+    failed, done = [], []
+    worker.failed.connect(failed.append)
+    worker.done.connect(done.append)
+    worker.run()
+    assert failed and not done
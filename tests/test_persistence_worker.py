@@ -0,0 +1,36 @@
+import threading
+
+from persistence_worker import PersistenceWorker
+from storage import WriteBatch
+
+
+class FlakyBackend:
+    """Fails its first write once released; later writes succeed."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.entered = threading.Event()
+        self.calls = 0
+        self.written = []
+
+    def write(self, notes, changed, deleted, layout_changed):
+        self.calls += 1
+        if self.calls == 1:
+            self.entered.set()
+            self.release.wait(5)
+            raise OSError("disk full")
+        self.written.append(set(changed))
+
+
+def test_failed_batch_is_written_with_the_queued_one_on_stop(qapp):
+    backend = FlakyBackend()
+    worker = PersistenceWorker(backend)
+    worker.start()
+    notes = {'a': {'id': 'a'}, 'b': {'id': 'b'}}
+    worker.submit(WriteBatch.capture(notes, {'a'}, ()))
+    assert backend.entered.wait(5)
+    # Queued while the first write is failing
+    worker.submit(WriteBatch.capture(notes, {'b'}, ()))
+    backend.release.set()
+    worker.stop()
+    assert set().union(*backend.written) == {'a', 'b'}
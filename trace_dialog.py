@@ -0,0 +1,83 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget,
+                             QTableWidgetItem, QPushButton, QFileDialog, QLabel)
+from PyQt6.QtCore import Qt, QTimer
+
+from tracing import tracer
+
+
+class TraceStatsDialog(QDialog):
+    """Live p50/p99 table of the tracer's spans, refreshed once a second."""
+    COLUMNS = ("Span", "Count", "p50 ms", "p99 ms", "Max ms")
+    MAX_COUNTER_ROWS = 15
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Trace Stats")
+        self.resize(560, 420)
+
+        layout = QVBoxLayout(self)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        self.counters_label = QLabel()
+        self.counters_label.setWordWrap(True)
+        layout.addWidget(self.counters_label)
+
+        buttons = QHBoxLayout()
+        export_btn = QPushButton("Export Trace…")
+        export_btn.clicked.connect(self.export_trace)
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.reset)
+        buttons.addWidget(export_btn)
+        buttons.addWidget(reset_btn)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        self.status_label.setText("Tracing is on" if tracer.enabled else
+                                  "Tracing is off — enable it from the tray menu")
+        stats = sorted(tracer.stats().items(), key=lambda item: item[1]['p99'], reverse=True)
+        self.table.setRowCount(len(stats))
+        for row, (name, values) in enumerate(stats):
+            cells = (name, str(values['count']), f"{values['p50']:.2f}",
+                     f"{values['p99']:.2f}", f"{values['max']:.2f}")
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.table.resizeColumnToContents(0)
+
+        busiest = sorted(tracer.counters().items(),
+                         key=lambda item: sum(item[1].values()), reverse=True)
+        self.counters_label.setText("\n".join(
+            f"{scope}: " + ", ".join(f"{event} {n}" for event, n in sorted(events.items()))
+            for scope, events in busiest[:self.MAX_COUNTER_ROWS]))
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Trace", "floatnote-trace.json", "Trace JSON (*.json)")
+        if path:
+            tracer.export_chrome_trace(path)
+
+    def reset(self):
+        tracer.reset()
+        self.refresh()
@@ -0,0 +1,133 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Tracer:
+    """
+    Opt-in timing spans and per-window event counters for hot paths.
+
+    Disabled by default; FLOATNOTE_TRACE=1 or the tray toggle enables it.
+    While disabled, span() returns a shared no-op context manager, so
+    instrumented code pays little more than an attribute check. Spans are
+    kept in a bounded ring buffer and can be exported as Chrome trace-event
+    JSON (chrome://tracing, Perfetto).
+    """
+    MAX_EVENTS = 100000
+    MAX_SAMPLES = 2000
+
+    def __init__(self):
+        self.enabled = os.environ.get("FLOATNOTE_TRACE", "") not in ("", "0")
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._events = deque(maxlen=self.MAX_EVENTS)
+            self._samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.MAX_SAMPLES))
+            self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+            self._thread_names: Dict[int, str] = {}
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = enabled
+
+    # Recording
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, args)
+
+    @contextmanager
+    def _span(self, name: str, args: Dict[str, Any]):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._record(name, start, end, args)
+
+    def _record(self, name: str, start: float, end: float, args: Dict[str, Any]):
+        thread = threading.current_thread()
+        with self._lock:
+            self._thread_names[thread.ident] = thread.name
+            self._events.append((name, start - self._origin, end - start, thread.ident, args))
+            self._samples[name].append((end - start) * 1000)
+
+    def count(self, scope: str, event: str, n: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[scope][event] += n
+
+    # Reporting
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-span count and p50/p99/max latency in milliseconds."""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+        result = {}
+        for name, values in samples.items():
+            if not values:
+                continue
+            result[name] = {
+                'count': len(values),
+                'p50': values[int((len(values) - 1) * 0.50)],
+                'p99': values[int((len(values) - 1) * 0.99)],
+                'max': values[-1],
+            }
+        return result
+
+    def counters(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {scope: dict(events) for scope, events in self._counters.items()}
+
+    def export_chrome_trace(self, path: str):
+        """Write the recorded spans and counters in Chrome trace-event format."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                  'args': {'name': name}} for tid, name in thread_names.items()]
+        for name, start, duration, tid, args in events:
+            trace.append({'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                          'ts': start * 1e6, 'dur': duration * 1e6, 'args': args})
+        now = (time.perf_counter() - self._origin) * 1e6
+        for scope, events_by_name in self.counters().items():
+            trace.append({'name': scope, 'ph': 'C', 'pid': pid, 'ts': now,
+                          'args': events_by_name})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+_NULL_SPAN = _NullSpan()
+
+tracer = Tracer()
+
+
+def traced(name: Optional[str] = None):
+    """Decorator recording a span around each call while tracing is enabled."""
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate